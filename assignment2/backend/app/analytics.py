@@ -0,0 +1,106 @@
+import asyncio
+import codecs
+import os
+from collections import Counter
+
+from .config import TOP_WORDS_N, UPLOAD_CHUNK_SIZE
+
+
+class TextStats:
+    """
+    Word count, word frequencies and character histogram over a stream of
+    UTF-8 chunks.
+
+    Words follow str.split(); a word cut by a chunk boundary is carried over
+    to the next chunk so it is counted once, whole.
+    """
+
+    def __init__(self):
+        self.word_count = 0
+        self.words = Counter()
+        self.chars = Counter()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._carry = ""
+
+    def feed(self, data: bytes):
+        """
+        Add the next chunk.
+
+        Args:
+            data (bytes): The next chunk of the file.
+        """
+        self._add_text(self._decoder.decode(data))
+
+    def close(self):
+        """Flush the decoder and the last word."""
+        self._add_text(self._decoder.decode(b"", final=True))
+        if self._carry:
+            self.word_count += 1
+            self.words[self._carry] += 1
+            self._carry = ""
+
+    def result(self, top_n: int = TOP_WORDS_N) -> dict:
+        """
+        The stats collected so far.
+
+        Args:
+            top_n (int): Number of most frequent words to keep.
+
+        Returns:
+            dict: word_count, top_words ([[word, count], ...]) and char_histogram.
+        """
+        return {
+            "word_count": self.word_count,
+            "top_words": [
+                [word, count] for word, count in self.words.most_common(top_n)
+            ],
+            "char_histogram": dict(self.chars),
+        }
+
+    def _add_text(self, text: str):
+        if not text:
+            return
+        self.chars.update(text)
+        text = self._carry + text
+        words = text.split()
+        # keep an unfinished trailing word for the next chunk
+        self._carry = words.pop() if words and not text[-1].isspace() else ""
+        self.word_count += len(words)
+        self.words.update(words)
+
+
+def _read_and_feed(file, stats: TextStats, chunk_size: int) -> int:
+    chunk = file.read(chunk_size)
+    stats.feed(chunk)
+    return len(chunk)
+
+
+async def analyze_file(
+    file_path: str,
+    top_n: int = TOP_WORDS_N,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    on_progress=None,
+) -> dict:
+    """
+    Compute the text stats of a file in one streaming pass.
+
+    Args:
+        file_path (str): The file to analyze.
+        top_n (int): Number of most frequent words to keep.
+        chunk_size (int): Bytes read per step.
+        on_progress: Optional async callback taking the fraction done (0.0 - 1.0).
+
+    Returns:
+        dict: word_count, top_words and char_histogram.
+    """
+    total = os.path.getsize(file_path) or 1
+    done = 0
+    stats = TextStats()
+    with open(file_path, "rb") as file:
+        # reading and counting run off the event loop
+        while read := await asyncio.to_thread(_read_and_feed, file, stats, chunk_size):
+            done += read
+            if on_progress:
+                await on_progress(done / total)
+    stats.close()
+    return stats.result(top_n)
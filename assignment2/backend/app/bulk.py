@@ -0,0 +1,161 @@
+import codecs
+import csv
+import io
+import json
+
+from pydantic import ValidationError
+
+# content types accepted by POST /users/bulk
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+# columns written by GET /users/export (never the password hash)
+EXPORT_FIELDS = [
+    "id",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "address",
+    "file_word_count",
+    "original_filename",
+]
+
+
+# ======== READERS =========
+async def iter_lines(stream):
+    """
+    Split a byte stream into text lines without buffering the whole body.
+
+    Args:
+        stream: Async iterator of UTF-8 bytes chunks (e.g. request.stream()).
+
+    Yields:
+        str: Each line, without its line ending.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.removesuffix("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.removesuffix("\r")
+
+
+async def iter_ndjson_rows(stream):
+    """
+    Parse NDJSON, one user object per line. Blank lines are skipped.
+
+    Args:
+        stream: Async iterator of bytes chunks.
+
+    Yields:
+        tuple[int, dict, str]: Row number, the row (None on error), the error.
+    """
+    row_number = 0
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, row, None
+
+
+async def iter_csv_rows(stream):
+    """
+    Parse CSV with a header row. Empty cells become None.
+
+    Args:
+        stream: Async iterator of bytes chunks.
+
+    Yields:
+        tuple[int, dict, str]: Row number, the row (None on error), the error.
+    """
+    header = None
+    pending = []
+    quotes = 0
+    row_number = 0
+    async for line in iter_lines(stream):
+        pending.append(line)
+        quotes += line.count('"')
+        # an odd number of quotes means a quoted cell continues on the next line
+        if quotes % 2:
+            continue
+        record = next(csv.reader(["\n".join(pending)]), [])
+        pending = []
+        quotes = 0
+        if not record:
+            continue
+        if header is None:
+            header = [name.strip() for name in record]
+            continue
+        row_number += 1
+        if len(record) != len(header):
+            yield (
+                row_number,
+                None,
+                f"Expected {len(header)} columns, got {len(record)}",
+            )
+            continue
+        yield row_number, {k: v or None for k, v in zip(header, record)}, None
+    if pending:
+        yield row_number + 1, None, "Unterminated quoted cell"
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """
+    One line summary of a pydantic validation error.
+
+    Args:
+        error (ValidationError): The error raised by schemas.UserCreate.
+
+    Returns:
+        str: e.g. "email: value is not a valid email address".
+    """
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+# ======== WRITERS =========
+def to_ndjson(rows: list[dict]) -> str:
+    """
+    Serialize rows as NDJSON.
+
+    Args:
+        rows (list[dict]): Rows keyed by EXPORT_FIELDS.
+
+    Returns:
+        str: One JSON object per line.
+    """
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def to_csv(rows: list[dict], header: bool = False) -> str:
+    """
+    Serialize rows as CSV.
+
+    Args:
+        rows (list[dict]): Rows keyed by EXPORT_FIELDS.
+        header (bool): Write the header row first.
+
+    Returns:
+        str: The CSV text.
+    """
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
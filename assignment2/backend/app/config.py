@@ -0,0 +1,128 @@
+import os
+
+from dotenv import load_dotenv
+
+# load env
+load_dotenv()
+
+# ======== PASSWORD HASHING =========
+# number of worker processes running Argon2, defaults to the available cores
+HASH_WORKERS: int = int(os.getenv("HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+# max hash/verify calls waiting or running in the pool before new ones get a 503
+HASH_MAX_QUEUE: int = int(os.getenv("HASH_MAX_QUEUE", "0")) or HASH_WORKERS * 4
+
+# pool workers bulk imports may keep busy at once, the others stay free for logins
+HASH_BULK_WORKERS: int = int(os.getenv("HASH_BULK_WORKERS", "0")) or max(
+    1, HASH_WORKERS // 2
+)
+
+# seconds clients are told to wait before retrying a shed request
+HASH_RETRY_AFTER: int = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+# ======== AUTH TOKENS =========
+# HMAC key of the access tokens, must be the same on every worker; when empty a
+# random key is used and tokens only work on the process that issued them
+TOKEN_SECRET: str = os.getenv("TOKEN_SECRET", "")
+# seconds an access token is valid, refresh tokens renew it without a password
+ACCESS_TOKEN_TTL: int = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL: int = int(os.getenv("REFRESH_TOKEN_TTL", str(14 * 24 * 3600)))
+# per-process cache of verified access tokens, 0 disables it
+TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL: float = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+# bearer token of the admin/service routes acting on every user (bulk import and
+# export); when empty those routes are disabled
+ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+# ======== DATABASE =========
+# sqlite:// and postgresql:// URLs are switched to their async drivers
+# (aiosqlite / asyncpg) by database.py
+DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/users.db")
+
+# connection pool tuning, ignored for in-memory SQLite
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# SQLite tuning: "production" = WAL + pragmas below, a read-only reader pool and a
+# single writer connection that group-commits; "default" = stock SQLite settings
+SQLITE_PROFILE: str = os.getenv("SQLITE_PROFILE", "production")
+# synchronous=NORMAL is durable in WAL mode except for the last commits on power loss
+SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KIB: int = int(os.getenv("SQLITE_CACHE_KIB", str(64 * 1024)))
+# ms a connection waits for a lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+# max write statements committed together by the write lane
+WRITE_BATCH_MAX: int = int(os.getenv("WRITE_BATCH_MAX", "100"))
+
+# ======== STARTUP =========
+# create missing tables/indexes when a worker starts; set to false in production
+# and run `python -m app.migrate` once per deploy instead
+MIGRATE_ON_STARTUP: bool = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# open the DB pools and start the Argon2 workers before serving, so the first
+# requests of a new worker do not pay for it
+WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# ======== USER CACHE =========
+# per-process read-through cache of user rows, 0 disables it
+USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# seconds an entry may be served before it is re-read (bounds staleness across workers)
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "30"))
+
+# ======== FILE UPLOADS =========
+# uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# uploads larger than this are aborted with 413
+MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+# ======== USER LISTING =========
+# default and max page size of GET /users/
+USER_PAGE_SIZE: int = int(os.getenv("USER_PAGE_SIZE", "50"))
+USER_PAGE_MAX: int = int(os.getenv("USER_PAGE_MAX", "500"))
+
+# ======== FILE DOWNLOADS =========
+# gzip/brotli variants are written after upload for files at least this big
+PRECOMPRESS_MIN_BYTES: int = int(os.getenv("PRECOMPRESS_MIN_BYTES", "1024"))
+# behind nginx: internal location aliasing uploads/, downloads are then sent by
+# nginx (sendfile, ranges, gzip_static) through X-Accel-Redirect; empty disables
+DOWNLOAD_ACCEL_PREFIX: str = os.getenv("DOWNLOAD_ACCEL_PREFIX", "")
+
+# ======== BACKGROUND JOBS =========
+# concurrent job workers per process
+JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+# attempts before a job is marked failed, retries back off exponentially
+JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY: float = float(os.getenv("JOB_RETRY_DELAY", "1"))
+# running jobs not updated for this long are assumed dead and re-queued on startup
+JOB_STALE_SECONDS: float = float(os.getenv("JOB_STALE_SECONDS", "300"))
+# number of most frequent words kept per file
+TOP_WORDS_N: int = int(os.getenv("TOP_WORDS_N", "10"))
+
+# ======== BULK IMPORT / EXPORT =========
+# rows validated, hashed and inserted per transaction
+BULK_BATCH_SIZE: int = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+# ======== METRICS / PROFILING =========
+# Prometheus text metrics at GET /metrics (route latency, SQL per request, hashing)
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# requests slower than this (ms) are profiled to PROFILE_DIR, 0 disables the profiler
+PROFILE_SLOW_MS: float = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
@@ -1,68 +1,386 @@
-import os
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from . import bulk, models, schemas, storage, tokens
+from .cache import LRUTTLCache
+from .config import REFRESH_TOKEN_TTL, USER_CACHE_SIZE, USER_CACHE_TTL
+from .hashing import password_hasher
+from .write_lane import write_lane
+
+# Read-through cache of user rows, keyed by ("username", ...) and ("id", ...)
+user_cache = LRUTTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+# ======== CACHE HELPERS =========
+def _cache_user(user: models.User):
+    # cache a plain copy of the columns, never the session-bound object
+    row = {
+        column.key: getattr(user, column.key)
+        for column in models.User.__mapper__.column_attrs
+    }
+    user_cache.set(("username", user.username), row)
+    user_cache.set(("id", user.id), row)
+
+
+def _user_from_row(row: dict) -> models.User:
+    # rebuild a detached User (from the cache or a RETURNING row)
+    user = models.User(**row)
+    make_transient_to_detached(user)
+    return user
+
+
+def _invalidate_user(user: models.User):
+    user_cache.delete(("username", user.username), ("id", user.id))
+
+
+# ======== BLOB HELPERS =========
+async def _acquire_blob(db: AsyncSession, saved: storage.SavedUpload):
+    """
+    Add a reference to the blob holding an upload, creating it if it is new.
+
+    Args:
+        db (AsyncSession): The database session.
+        saved (SavedUpload): The streamed upload.
 
-from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
+    Returns:
+        tuple[str, int]: The blob path and its cached word count (None until
+        the blob has been analyzed).
+    """
+    path = storage.blob_path(saved.sha256)
+    # dialect imported on use, the postgresql one is not needed on SQLite
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # single atomic upsert, concurrent uploads of the same content cannot race
+    stmt = (
+        insert(models.FileBlob)
+        .values(
+            sha256=saved.sha256,
+            file_path=path,
+            size=saved.size,
+            ref_count=1,
+        )
+        .on_conflict_do_update(
+            index_elements=[models.FileBlob.sha256],
+            set_={"ref_count": models.FileBlob.ref_count + 1},
+        )
+        .returning(models.FileBlob.word_count)
+    )
+    word_count = (await db.execute(stmt)).scalar_one()
+    storage.commit_blob(saved)
+    return path, word_count
 
-from . import models, schemas
 
-# Initialize password hasher using Argon2 - recommended
-password_hash = PasswordHash.recommended()
+async def _release_blob(db: AsyncSession, file_path: str):
+    """
+    Drop a reference to a blob, deleting its row when it was the last one.
+
+    Args:
+        db (AsyncSession): The database session.
+        file_path (str): The User.file_path being released.
+
+    Returns:
+        str: The file to remove once the transaction commits, otherwise None.
+    """
+    result = await db.execute(
+        update(models.FileBlob)
+        .where(models.FileBlob.file_path == file_path)
+        .values(ref_count=models.FileBlob.ref_count - 1)
+        .returning(models.FileBlob.ref_count)
+        .execution_options(synchronize_session=False)
+    )
+    ref_count = result.scalar_one_or_none()
+    if ref_count is None:
+        # file stored before the blob store, owned by this user only
+        return file_path
+    if ref_count > 0:
+        return None
+    await db.execute(
+        delete(models.FileBlob)
+        .where(models.FileBlob.file_path == file_path)
+        .execution_options(synchronize_session=False)
+    )
+    return file_path
+
+
+async def _swap_user_file(db: AsyncSession, user_id: int, **values):
+    """
+    Set a user's file columns and return the file_path they replace.
+
+    The current file_path is read with SELECT ... FOR UPDATE in the writer
+    transaction (the row stays locked on PostgreSQL, SQLite has a single
+    writer), never taken from a cached User, so two concurrent uploads
+    cannot both release the same previous file.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The user to update.
+        **values: The new file_path, original_filename and file_word_count.
+
+    Returns:
+        tuple[str, User]: The replaced file_path (None if there was none) and
+        the updated user, or (None, None) if the user no longer exists.
+    """
+    old_path = (
+        await db.execute(
+            select(models.User.file_path)
+            .where(models.User.id == user_id)
+            .with_for_update()
+        )
+    ).one_or_none()
+    if old_path is None:
+        return None, None
+    rows = (
+        await db.execute(
+            update(models.User)
+            .where(models.User.id == user_id)
+            .values(**values)
+            .returning(*models.User.__table__.c)
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+    return old_path.file_path, _user_from_row(rows[0]._asdict())
 
 
 # ======== HELPER FUNCTIONS =========
-def authenticate_user(db: Session, username: str, password_plain: str):
+async def authenticate_user(db: AsyncSession, username: str, password_plain: str):
     """
     Authenticate a user by their username and password.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         username (str): The username of the user to authenticate.
         password_plain (str): The plain text password to verify.
 
     Returns:
         User: The authenticated user object if successful, otherwise None.
     """
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    # Verify password hash
-    if not password_hash.verify(password_plain, user.hashed_password):
+    # Verify password hash (runs in the hashing worker pool)
+    if not await password_hasher.verify(password_plain, user.hashed_password):
         return False
     return user
 
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """
     Retrieve a user by their username.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         username (str): The username of the user to retrieve.
 
     Returns:
         User: The user object if found, otherwise None.
     """
-    return db.query(models.User).filter(models.User.username == username).first()
+    row = user_cache.get(("username", username))
+    if row is not None:
+        return _user_from_row(row)
+
+    result = await db.execute(
+        select(models.User).where(models.User.username == username)
+    )
+    user = result.scalars().first()
+    if user:
+        _cache_user(user)
+    return user
+
+
+async def get_user(db: AsyncSession, user_id: int):
+    """
+    Retrieve a user by their ID.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The ID of the user to retrieve.
+
+    Returns:
+        User: The user object if found, otherwise None.
+    """
+    row = user_cache.get(("id", user_id))
+    if row is not None:
+        return _user_from_row(row)
+
+    user = await db.get(models.User, user_id)
+    if user:
+        _cache_user(user)
+    return user
 
 
-def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """
     Retrieve a user by their email.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         email (str): The email of the user to retrieve.
 
     Returns:
         User: The user object if found, otherwise None.
     """
-    return db.query(models.User).filter(models.User.email == email).first()
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+
+async def get_users_by_email_or_username(db: AsyncSession, email: str, username: str):
+    """
+    Retrieve the users holding an email or a username, in a single query.
+
+    Args:
+        db (AsyncSession): The database session.
+        email (str): The email to look for.
+        username (str): The username to look for.
+
+    Returns:
+        list[User]: The matching users (at most one per unique column).
+    """
+    result = await db.execute(
+        select(models.User).where(
+            or_(models.User.email == email, models.User.username == username)
+        )
+    )
+    return list(result.scalars().all())
+
+
+# ======== USER LISTING ==============
+# columns GET /users/ can search by prefix, each backed by an index ending in id
+SEARCH_FIELDS = ("username", "email", "last_name")
+
+
+def encode_cursor(key: str, values: list) -> str:
+    """
+    Opaque cursor pointing after the last row of a page.
+
+    Args:
+        key (str): The sort key ("id" or a SEARCH_FIELDS column).
+        values (list): The sort values of the last row.
+
+    Returns:
+        str: URL safe cursor.
+    """
+    raw = json.dumps([key, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str) -> list:
+    """
+    Read a cursor made by encode_cursor for the same sort key.
+
+    Args:
+        cursor (str): The cursor from the previous page.
+        key (str): The sort key of the current query.
+
+    Returns:
+        list: The sort values to continue after.
+
+    Raises:
+        ValueError: If the cursor is malformed or was made for another sort key.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    size = 2 if key == "id" else 3
+    if not isinstance(values, list) or len(values) != size or values[0] != key:
+        raise ValueError("Invalid cursor")
+    return values[1:]
+
+
+def _prefix_upper(prefix: str) -> str:
+    # smallest string above every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+async def list_users(
+    db: AsyncSession,
+    fields: list[str],
+    limit: int,
+    cursor: str = None,
+    prefix: str = None,
+    search_by: str = "username",
+):
+    """
+    One page of users, with keyset pagination and an optional prefix search.
+
+    Pages continue after the last (sort, id) of the previous page with an
+    index seek instead of an OFFSET scan, so any page costs the same as the
+    first one however big the table is. The prefix match is a range on the
+    same index (`col >= 'ab' AND col < 'ac'`), which unlike LIKE uses the
+    index on every backend.
+
+    Args:
+        db (AsyncSession): The database session.
+        fields (list[str]): Columns to return, only these are selected.
+        limit (int): Page size.
+        cursor (str): Cursor of the previous page, None for the first page.
+        prefix (str): Only return users whose `search_by` starts with this.
+        search_by (str): One of SEARCH_FIELDS.
+
+    Returns:
+        tuple[list[dict], str]: The rows and the next cursor (None on the
+        last page).
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    key = search_by if prefix else "id"
+    after = decode_cursor(cursor, key) if cursor else None
+    sort_columns = [models.User.id]
+    if prefix:
+        sort_columns.insert(0, getattr(models.User, search_by))
+
+    selected = list(dict.fromkeys([*fields, *(c.key for c in sort_columns)]))
+    stmt = select(*(getattr(models.User, field) for field in selected))
+
+    if not prefix:
+        if after:
+            stmt = stmt.where(models.User.id > after[0])
+        stmt = stmt.order_by(models.User.id).limit(limit + 1)
+    else:
+        column = sort_columns[0]
+        upper = _prefix_upper(prefix)
+        if after:
+            if not isinstance(after[0], str) or not after[0].startswith(prefix):
+                raise ValueError("Invalid cursor")
+            # (col, id) > (v, i) as two index seeks: SQLite only seeks on the
+            # first column of a row value and would scan every row equal to v.
+            # Each part gets a single lower bound, with `col >= prefix` as well
+            # SQLite may seek from the prefix and filter every row up to v.
+            same = stmt.where(column == after[0], models.User.id > after[1])
+            rest = stmt.where(column > after[0], column < upper)
+            page = union_all(
+                select(same.order_by(models.User.id).limit(limit + 1).subquery()),
+                select(rest.order_by(*sort_columns).limit(limit + 1).subquery()),
+            ).subquery()
+            stmt = select(page).order_by(page.c[column.key], page.c.id)
+        else:
+            stmt = stmt.where(column >= prefix, column < upper)
+            stmt = stmt.order_by(*sort_columns)
+        stmt = stmt.limit(limit + 1)
+
+    rows = (await db.execute(stmt)).mappings().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(key, [last[c.key] for c in sort_columns])
+    return [{field: row[field] for field in fields} for row in rows], next_cursor
 
 
 # ======== USER CRUD ==============
-def create_user(db: Session, user: schemas.UserCreate):
-    # hash the password
-    hashed_pw = password_hash.hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # hash the password (runs in the hashing worker pool)
+    hashed_pw = await password_hasher.hash(user.password)
 
     # create DB Object
     db_user = models.User(
@@ -76,17 +394,19 @@ def create_user(db: Session, user: schemas.UserCreate):
 
     # save to db
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    _invalidate_user(db_user)
     return db_user
 
 
-def update_user(db: Session, db_user: models.User, updates: schemas.UserUpdate):
+async def update_user(
+    db: AsyncSession, db_user: models.User, updates: schemas.UserUpdate
+):
     """
     Update a user's information.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         db_user (User): The user object to update.
         updates (UserUpdate): The updated user information.
 
@@ -96,100 +416,508 @@ def update_user(db: Session, db_user: models.User, updates: schemas.UserUpdate):
     update_data = updates.model_dump(exclude_unset=True)
 
     # If updating password, hash it first
-    if "password" in update_data:
-        update_data["hashed_password"] = password_hash.hash(update_data.pop("password"))
-
-    for key, value in update_data.items():
-        setattr(db_user, key, value)
-
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    password_changed = "password" in update_data
+    if password_changed:
+        update_data["hashed_password"] = await password_hasher.hash(
+            update_data.pop("password")
+        )
+
+    if not update_data:
+        return db_user
+
+    # single UPDATE through the write lane, group-committed with other writes
+    rows = await write_lane.execute(
+        update(models.User)
+        .where(models.User.id == db_user.id)
+        .values(**update_data)
+        .returning(*models.User.__table__.c)
+    )
+    _invalidate_user(db_user)
+    if password_changed:
+        # sessions opened with the old password cannot be renewed anymore
+        await revoke_user_refresh_tokens(db_user.id)
+    return _user_from_row(rows[0]._asdict()) if rows else None
 
 
-def delete_user(db: Session, username: str):
+async def delete_user(db: AsyncSession, username: str):
     """
     Delete a user by their username.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         username (str): The username of the user to delete.
 
     Returns:
         bool: True if the user was deleted successfully, otherwise False.
     """
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user:
         return False
 
-    # 1. Delete physical file if exists
-    if user.file_path and os.path.exists(user.file_path):
-        os.remove(user.file_path)
+    # 1. Delete DB record and the user's sessions, reading the file_path
+    # being deleted in the same statement (the cached one may be stale)
+    await db.execute(
+        delete(models.RefreshToken).where(models.RefreshToken.user_id == user.id)
+    )
+    row = (
+        await db.execute(
+            delete(models.User)
+            .where(models.User.id == user.id)
+            .returning(models.User.file_path)
+            .execution_options(synchronize_session=False)
+        )
+    ).one_or_none()
+    if row is None:
+        await db.rollback()
+        _invalidate_user(user)
+        return False
 
-    # 2. Delete DB record
-    db.delete(user)
-    db.commit()
+    # 2. Release the user's file, the blob is kept while others reference it
+    stale_path = await _release_blob(db, row.file_path) if row.file_path else None
+    await db.commit()
+    _invalidate_user(user)
+
+    # 3. Delete physical file once nothing references it
+    if stale_path:
+        storage.remove_blob(stale_path)
     return True
 
 
+# ======== REFRESH TOKEN CRUD ==============
+async def create_refresh_token(user_id: int) -> str:
+    """
+    Open a session: store a new refresh token for a user.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        str: The refresh token, only its hash is stored.
+    """
+    token, token_hash = tokens.new_refresh_token()
+    now = datetime.now(timezone.utc)
+    await write_lane.execute(
+        insert(models.RefreshToken).values(
+            user_id=user_id,
+            token_hash=token_hash,
+            created_at=now,
+            expires_at=now + timedelta(seconds=REFRESH_TOKEN_TTL),
+        )
+    )
+    return token
+
+
+async def rotate_refresh_token(token: str):
+    """
+    Exchange a refresh token for a new one. The old token is revoked in the
+    same statement that checks it, so it can only be used once.
+
+    Args:
+        token (str): The refresh token sent by the client.
+
+    Returns:
+        tuple[int, str]: The user ID and the new refresh token, or None if
+        the token is unknown, expired or revoked.
+    """
+    now = datetime.now(timezone.utc)
+    rows = await write_lane.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == tokens.hash_refresh_token(token),
+            models.RefreshToken.revoked_at.is_(None),
+            models.RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(models.RefreshToken.user_id)
+    )
+    if not rows:
+        return None
+    user_id = rows[0].user_id
+    return user_id, await create_refresh_token(user_id)
+
+
+async def revoke_refresh_token(token: str) -> bool:
+    """
+    Close a session (logout).
+
+    Args:
+        token (str): The refresh token sent by the client.
+
+    Returns:
+        bool: True if an active token was revoked.
+    """
+    count = await write_lane.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == tokens.hash_refresh_token(token),
+            models.RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    return count > 0
+
+
+async def revoke_user_refresh_tokens(user_id: int):
+    """
+    Close every session of a user.
+
+    Args:
+        user_id (int): The ID of the user.
+    """
+    await write_lane.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.user_id == user_id,
+            models.RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+
+
+async def purge_refresh_tokens(db: AsyncSession):
+    """
+    Delete expired and revoked refresh tokens.
+
+    Args:
+        db (AsyncSession): The database session.
+    """
+    await db.execute(
+        delete(models.RefreshToken).where(
+            or_(
+                models.RefreshToken.expires_at <= datetime.now(timezone.utc),
+                models.RefreshToken.revoked_at.is_not(None),
+            )
+        )
+    )
+    await db.commit()
+
+
+# ======== BULK USER CRUD ==============
+async def bulk_create_users(db: AsyncSession, users: list[schemas.UserCreate]):
+    """
+    Insert a batch of validated users in one transaction.
+
+    Duplicates (inside the batch or against existing rows) are found with a
+    single query, the passwords are hashed in parallel, and the remaining
+    rows go in with one executemany. If the batch still hits a constraint
+    (e.g. a concurrent signup), it is retried row by row to isolate the
+    offending rows.
+
+    Args:
+        db (AsyncSession): The database session.
+        users (list[UserCreate]): The users to insert.
+
+    Returns:
+        list[str]: One entry per user, None if inserted, otherwise the error.
+    """
+    result = await db.execute(
+        select(models.User.username, models.User.email).where(
+            or_(
+                models.User.username.in_({u.username for u in users}),
+                models.User.email.in_({u.email for u in users}),
+            )
+        )
+    )
+    taken_usernames, taken_emails = set(), set()
+    for username, email in result.all():
+        taken_usernames.add(username)
+        taken_emails.add(email)
+
+    errors = []
+    for user in users:
+        if user.email in taken_emails:
+            errors.append("Email already registered")
+        elif user.username in taken_usernames:
+            errors.append("Username taken")
+        else:
+            errors.append(None)
+        taken_usernames.add(user.username)
+        taken_emails.add(user.email)
+
+    accepted = [user for user, error in zip(users, errors) if error is None]
+    if not accepted:
+        return errors
+
+    hashes = await password_hasher.hash_many([user.password for user in accepted])
+    rows = [
+        {
+            "username": user.username,
+            "email": user.email,
+            "hashed_password": hashed_pw,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "address": user.address,
+        }
+        for user, hashed_pw in zip(accepted, hashes)
+    ]
+
+    try:
+        await db.execute(insert(models.User), rows)
+        await db.commit()
+        return errors
+    except IntegrityError:
+        await db.rollback()
+
+    # slow path: one transaction per row to report which ones conflict
+    row_iter = iter(rows)
+    for index, error in enumerate(errors):
+        if error is not None:
+            continue
+        try:
+            await db.execute(insert(models.User), [next(row_iter)])
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            errors[index] = "Username or email already registered"
+    return errors
+
+
+async def stream_users(db: AsyncSession, batch_size: int):
+    """
+    Stream every user in ID order without loading the table into memory.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int): Rows fetched per round trip.
+
+    Yields:
+        list[dict]: Batches of rows keyed by bulk.EXPORT_FIELDS.
+    """
+    columns = [getattr(models.User, field) for field in bulk.EXPORT_FIELDS]
+    result = await db.stream(
+        select(*columns)
+        .order_by(models.User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for partition in result.mappings().partitions():
+        yield [dict(row) for row in partition]
+
+
 # ======== FILE CRUD ==============
-def update_user_file(db: Session, user_id: int, file_path: str, original_name: str):
+async def update_user_file(
+    db: AsyncSession,
+    db_user: models.User,
+    saved: storage.SavedUpload,
+    original_name: str,
+):
     """
-    Update the file path and original filename for a user.
+    Point a user at the blob holding their upload.
+
+    Identical content is stored once: a duplicate upload reuses the existing
+    blob and its word count, and the temp file is dropped. New content has
+    no word count until its analyze_file job has run.
 
     Args:
-        db (Session): The database session.
-        user_id (int): The ID of the user to update.
-        file_path (str): The new file path.
+        db (AsyncSession): The database session.
+        db_user (User): The user object to update.
+        saved (SavedUpload): The streamed upload.
         original_name (str): The new original filename.
 
     Returns:
-        User: The updated user object.
+        User: The updated user object, None if the user was deleted meanwhile.
     """
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    try:
+        file_path, word_count = await _acquire_blob(db, saved)
+    except BaseException:
+        storage.discard(saved)
+        raise
+
+    old_path, user = await _swap_user_file(
+        db,
+        db_user.id,
+        file_path=file_path,
+        original_filename=original_name,
+        file_word_count=word_count,
+    )
+    # Release the previous file (or the new one if the user is gone), removed
+    # below if it was its last reference
+    released = file_path if user is None else old_path
+    stale_path = await _release_blob(db, released) if released else None
 
-    # If a file already exists, delete the old physical file first
-    if user.file_path and os.path.exists(user.file_path):
-        os.remove(user.file_path)
+    await db.commit()
+    _invalidate_user(db_user)
 
-    user.file_path = file_path
-    user.original_filename = original_name
+    if stale_path and (user is None or stale_path != file_path):
+        storage.remove_blob(stale_path)
+    return user
 
-    # get word count in .txt file
-    if file_path.endswith(".txt"):
-        with open(file_path, "r") as f:
-            content = f.read()
-            user.file_word_count = len(content.split())
-    else:
-        user.file_word_count = None
 
-    db.commit()
-    db.refresh(user)
+async def delete_user_file(db: AsyncSession, db_user: models.User):
+    """
+    Delete the file path and original filename for a user.
+
+    Args:
+        db (AsyncSession): The database session.
+        db_user (User): The user object to update.
+
+    Returns:
+        User: The updated user object, None if the user was deleted meanwhile.
+    """
+    # clear DB columns, then release the blob reference they held
+    old_path, user = await _swap_user_file(
+        db, db_user.id, file_path=None, original_filename=None, file_word_count=None
+    )
+    stale_path = await _release_blob(db, old_path) if old_path else None
+    await db.commit()
+    _invalidate_user(db_user)
+
+    # Delete physical file once nothing references it
+    if stale_path:
+        storage.remove_blob(stale_path)
     return user
 
 
-def delete_user_file(db: Session, user_id: int):
+# ======== BLOB STATS ==============
+async def get_blob(db: AsyncSession, sha256: str):
     """
-    Delete the file path and original filename for a user.
+    Retrieve a stored blob by its content hash.
 
     Args:
-        db (Session): The database session.
-        user_id (int): The ID of the user to update.
+        db (AsyncSession): The database session.
+        sha256 (str): The content hash.
 
     Returns:
-        User: The updated user object.
+        FileBlob: The blob if found, otherwise None.
     """
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    return await db.get(models.FileBlob, sha256)
 
-    # Delete physical file
-    if user.file_path and os.path.exists(user.file_path):
-        os.remove(user.file_path)
 
-    # clear DB columns
-    user.file_path = None
-    user.original_filename = None
-    user.file_word_count = None
-    db.commit()
-    db.refresh(user)
-    return user
+async def save_blob_stats(db: AsyncSession, blob: models.FileBlob, stats: dict):
+    """
+    Store the text stats of a blob and copy its word count to every user
+    referencing it.
+
+    Args:
+        db (AsyncSession): The database session.
+        blob (FileBlob): The analyzed blob.
+        stats (dict): word_count, top_words and char_histogram.
+    """
+    # plain UPDATE: the blob may have been released since it was loaded
+    result = await db.execute(
+        update(models.FileBlob)
+        .where(models.FileBlob.sha256 == blob.sha256)
+        .values(
+            word_count=stats["word_count"],
+            top_words=stats["top_words"],
+            char_histogram=stats["char_histogram"],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        return
+
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.file_path == blob.file_path)
+        .values(file_word_count=stats["word_count"])
+        .returning(models.User.id, models.User.username)
+        .execution_options(synchronize_session=False)
+    )
+    users = result.all()
+    await db.commit()
+    for user in users:
+        _invalidate_user(user)
+
+
+# ======== JOB CRUD ==============
+async def create_job(
+    db: AsyncSession, kind: str, blob_sha256: str, user_id: int = None
+):
+    """
+    Persist a new pending job.
+
+    Args:
+        db (AsyncSession): The database session.
+        kind (str): The job handler name.
+        blob_sha256 (str): The blob the job works on.
+        user_id (int): The user the job runs for, who may read its result.
+
+    Returns:
+        Job: The created job.
+    """
+    job = models.Job(
+        kind=kind, blob_sha256=blob_sha256, user_id=user_id, status="pending"
+    )
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: int):
+    """
+    Retrieve a job by its ID.
+
+    Args:
+        db (AsyncSession): The database session.
+        job_id (int): The ID of the job.
+
+    Returns:
+        Job: The job if found, otherwise None.
+    """
+    return await db.get(models.Job, job_id)
+
+
+async def claim_job(db: AsyncSession, job_id: int):
+    """
+    Atomically move a pending job to running, so only one worker runs it.
+
+    Args:
+        db (AsyncSession): The database session.
+        job_id (int): The ID of the job.
+
+    Returns:
+        Job: The claimed job, or None if it is not pending anymore.
+    """
+    result = await db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == "pending")
+        .values(status="running", attempts=models.Job.attempts + 1, error=None)
+        .returning(models.Job)
+        .execution_options(synchronize_session=False)
+    )
+    job = result.scalars().first()
+    await db.commit()
+    return job
+
+
+async def set_job_state(job_id: int, **values):
+    """
+    Update the status/progress/error/result columns of a job, through the
+    write lane (progress updates of concurrent jobs share commits).
+
+    Args:
+        job_id (int): The ID of the job.
+        **values: Column values to set.
+    """
+    await write_lane.execute(
+        update(models.Job).where(models.Job.id == job_id).values(**values)
+    )
+
+
+async def requeue_unfinished_jobs(db: AsyncSession, stale_seconds: float):
+    """
+    Reset running jobs that stopped updating back to pending, and list
+    every pending job.
+
+    Args:
+        db (AsyncSession): The database session.
+        stale_seconds (float): How long a running job may go without an update.
+
+    Returns:
+        list[int]: IDs of the pending jobs, oldest first.
+    """
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=stale_seconds)
+    await db.execute(
+        update(models.Job)
+        .where(models.Job.status == "running", models.Job.updated_at < stale_before)
+        .values(status="pending")
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    result = await db.execute(
+        select(models.Job.id)
+        .where(models.Job.status == "pending")
+        .order_by(models.Job.id)
+    )
+    return list(result.scalars().all())
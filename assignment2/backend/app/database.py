@@ -1,40 +1,216 @@
 import os
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
 
-# load env
-load_dotenv()
+from .config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_SIZE,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_KIB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_PROFILE,
+    SQLITE_SYNCHRONOUS,
+)
 
-# data folder
-os.makedirs("data", exist_ok=True)
-
-# database url
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/users.db")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set")
 
-# database engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# async drivers for plain database urls
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str):
+    """
+    Switch a plain database url to its async driver.
+
+    Args:
+        url (str): The database url, e.g. sqlite:///./data/users.db.
+
+    Returns:
+        URL: The url using aiosqlite/asyncpg, unchanged if a driver is set.
+    """
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url
+
+
+def engine_options(url) -> dict:
+    """
+    Pool options for the engine, in-memory SQLite has a single static connection.
+
+    Args:
+        url (URL): The database url.
+
+    Returns:
+        dict: Keyword arguments for create_async_engine.
+    """
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options["pool_size"] = DB_POOL_SIZE
+    options["max_overflow"] = DB_MAX_OVERFLOW
+    return options
+
+
+def is_sqlite_file(url) -> bool:
+    """
+    Whether the url points at an on-disk SQLite database.
+
+    Args:
+        url (URL): The database url.
+
+    Returns:
+        bool: True for sqlite files, False for in-memory SQLite and other backends.
+    """
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def ensure_sqlite_dir(url=None):
+    """
+    Create the folder of an on-disk SQLite database (e.g. ./data), SQLite does
+    not create it. Run at startup and by the migration step, not at import.
+
+    Args:
+        url (URL): The database url, default: the app database.
+    """
+    url = url if url is not None else ASYNC_DATABASE_URL
+    if is_sqlite_file(url):
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+
+
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    """
+    Pragmas of the SQLite production profile, run on every new connection.
+
+    Args:
+        read_only (bool): Also refuse writes on this connection.
+
+    Returns:
+        list[str]: The PRAGMA statements.
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _apply_pragmas(engine, pragmas: list[str]):
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+SQLITE_TUNED = is_sqlite_file(ASYNC_DATABASE_URL) and SQLITE_PROFILE == "production"
+
+if SQLITE_TUNED:
+    # SQLite allows one writer at a time: a single writer connection queues
+    # writes in the pool instead of failing with "database is locked", while
+    # WAL lets the reader pool run alongside it
+    engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_size=1,
+        max_overflow=0,
+    )
+    read_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)
+    )
+    _apply_pragmas(engine, sqlite_pragmas())
+    _apply_pragmas(read_engine, sqlite_pragmas(read_only=True))
+else:
+    # database engine, reads and writes share the pool
+    engine = create_async_engine(
+        ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)
+    )
+    read_engine = engine
+
+
+class RoutingSession(Session):
+    """Session sending flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE
+    to the writer, other reads to the reader pool."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # ORM bulk inserts ask for a connection by mapper only (no clause)
+        if self._flushing or clause is None or clause.is_dml:
+            return engine.sync_engine
+        # a read-modify-write must read in the writer transaction
+        if getattr(clause, "_for_update_arg", None) is not None:
+            return engine.sync_engine
+        return read_engine.sync_engine
+
 
 # database session, create new db session for every new request
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# objects stay loaded after commit so responses never lazy load outside the session
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 # database model base class
 Base = declarative_base()
 
 
+def init_schema(connection):
+    """
+    Create missing tables, and missing columns and indexes of existing tables.
+
+    create_all only adds columns and indexes together with their table, so
+    ones added to a model later would never reach an existing database.
+    Only nullable columns can be added this way, existing rows get NULL.
+
+    Args:
+        connection (Connection): A sync connection (use with run_sync).
+    """
+    Base.metadata.create_all(connection)
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
 # external dependency injection to get new db session for every new request
-def get_db():
+async def get_db():
     """
     Dependency injection to get new db session for every new request.
 
     Returns:
-        SessionLocal: A new database session.
+        AsyncSession: A new database session.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
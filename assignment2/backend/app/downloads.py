@@ -0,0 +1,143 @@
+import asyncio
+import os
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from . import storage
+from .config import DOWNLOAD_ACCEL_PREFIX
+
+# clients may cache downloads but must revalidate, a user can replace their file
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_for(path: str, stat_result: os.stat_result) -> str:
+    """
+    Strong ETag of a stored file.
+
+    Blobs are named by the SHA-256 of their content, which is used as is.
+    Files stored before the blob store fall back to mtime and size.
+
+    Args:
+        path (str): The stored file.
+        stat_result (os.stat_result): Its stat.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    name = os.path.basename(path).removesuffix(".txt")
+    if os.path.dirname(os.path.dirname(path)) == storage.BLOB_DIR and len(name) == 64:
+        return f'"{name}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match check, with the weak comparison RFC 9110 asks for.
+
+    Args:
+        if_none_match (str): The If-None-Match header.
+        etag (str): The current ETag.
+
+    Returns:
+        bool: True if the client copy is current (answer 304).
+    """
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in tags
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Content codings a client accepts, ignoring the ones with q=0.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding header.
+
+    Returns:
+        set[str]: e.g. {"gzip", "br"}.
+    """
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip().removeprefix("q=").strip() if params else "1"
+        try:
+            if float(q) > 0:
+                accepted.add(coding.strip().lower())
+        except ValueError:
+            continue
+    return accepted
+
+
+async def _stat(path: str):
+    try:
+        return await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        return None
+
+
+async def file_response(
+    request: Request, path: str, filename: str, media_type: str = "text/plain"
+):
+    """
+    Build the download response of a stored file.
+
+    - If-None-Match matching the ETag: 304 without a body.
+    - Range / If-Range: handled by FileResponse (206, multipart ranges).
+    - Accept-Encoding: the br/gzip variant written at upload time is sent
+      as is (whole-file requests only, ranges are served from the original).
+    - DOWNLOAD_ACCEL_PREFIX set: nginx sends the file via X-Accel-Redirect.
+
+    Args:
+        request (Request): The download request.
+        path (str): The stored file.
+        filename (str): Name offered to the client.
+        media_type (str): Content type of the original file.
+
+    Returns:
+        Response: The response, or None if the file does not exist.
+    """
+    stat_result = await _stat(path)
+    if stat_result is None:
+        return None
+    etag = etag_for(path, stat_result)
+    headers = {
+        "cache-control": CACHE_CONTROL,
+        "vary": "Accept-Encoding",
+    }
+
+    if DOWNLOAD_ACCEL_PREFIX:
+        # nginx does the conditional/range handling (and gzip_static) itself
+        relative = os.path.relpath(path, storage.UPLOAD_DIR)
+        headers["x-accel-redirect"] = f"{DOWNLOAD_ACCEL_PREFIX.rstrip('/')}/{relative}"
+        headers["content-disposition"] = f'attachment; filename="{filename}"'
+        return Response(headers=headers, media_type=media_type)
+
+    if "range" not in request.headers:
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding in storage.VARIANT_SUFFIXES:
+            if encoding not in accepted:
+                continue
+            variant = storage.variant_path(path, encoding)
+            variant_stat = await _stat(variant)
+            if variant_stat is not None:
+                path, stat_result = variant, variant_stat
+                etag = f'{etag[:-1]}-{encoding}"'
+                headers["content-encoding"] = encoding
+                break
+    headers["etag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # stat_result is reused, FileResponse does not stat the file again; it
+    # streams with http.response.pathsend (sendfile) on servers supporting it
+    return FileResponse(
+        path=path,
+        filename=filename,
+        media_type=media_type,
+        stat_result=stat_result,
+        headers=headers,
+    )
@@ -0,0 +1,229 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics
+from .config import HASH_BULK_WORKERS, HASH_MAX_QUEUE, HASH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# The pool starts after the database drivers' threads (aiosqlite runs one per
+# connection), and forking a multithreaded process can copy locks held by
+# those threads. Workers are forked from a forkserver instead, a clean
+# single-threaded process that only imports this module.
+_mp_context = multiprocessing.get_context("forkserver")
+_mp_context.set_forkserver_preload([__name__])
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full and the call is shed."""
+
+
+# ======== WORKER FUNCTIONS =========
+# run in the pool processes, so they must stay module level (picklable)
+@functools.cache
+def _hasher():
+    # Argon2 hasher used inside the worker processes - recommended. Created on
+    # first use, the app process itself never hashes and skips importing pwdlib
+    from pwdlib import PasswordHash
+
+    return PasswordHash.recommended()
+
+
+def _warm_worker():
+    _hasher()
+
+
+def _hash_in_worker(password: str):
+    started = time.perf_counter()
+    hashed = _hasher().hash(password)
+    return hashed, time.perf_counter() - started
+
+
+def _verify_in_worker(password: str, hashed: str):
+    started = time.perf_counter()
+    ok = _hasher().verify(password, hashed)
+    return ok, time.perf_counter() - started
+
+
+# ======== HASHING SERVICE =========
+class PasswordHasher:
+    """
+    Runs Argon2 hash/verify calls in a bounded process pool.
+
+    The event loop only awaits the pool future, so a hash never blocks other
+    requests. Calls beyond `max_queue` (waiting + running) are rejected with
+    HashingOverloaded instead of queueing, so latency stays bounded under a
+    login storm. Every call records its hash time (inside the worker) and its
+    queue wait (time spent before a worker picked it up).
+
+    Bulk imports are not shed and do not count against `max_queue`, they
+    wait for one of their own `bulk_workers` slots instead.
+    """
+
+    def __init__(
+        self,
+        workers: int = HASH_WORKERS,
+        max_queue: int = HASH_MAX_QUEUE,
+        bulk_workers: int = HASH_BULK_WORKERS,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.bulk_workers = min(bulk_workers, workers)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._bulk_pending = 0
+        # shared by every running import, not per hash_many call
+        self._bulk_slots = asyncio.Semaphore(self.bulk_workers)
+        self._stats = {
+            "calls": 0,
+            "shed": 0,
+            "hash_seconds_total": 0.0,
+            "wait_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # pool is created lazily so importing the app does not fork workers
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=_mp_context
+                    )
+        return self._pool
+
+    async def _run(self, op: str, fn, *args, bulk: bool = False):
+        with self._lock:
+            if bulk:
+                self._bulk_pending += 1
+            elif self._pending >= self.max_queue:
+                self._stats["shed"] += 1
+                raise HashingOverloaded(f"{self._pending} hashing calls in flight")
+            else:
+                self._pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            future = self._get_pool().submit(fn, *args)
+            result, hash_seconds = await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                if bulk:
+                    self._bulk_pending -= 1
+                else:
+                    self._pending -= 1
+        wait_seconds = max(time.perf_counter() - submitted - hash_seconds, 0.0)
+
+        self._record(op, hash_seconds, wait_seconds)
+        return result
+
+    def _record(self, op: str, hash_seconds: float, wait_seconds: float):
+        with self._lock:
+            stats = self._stats
+            stats["calls"] += 1
+            stats["hash_seconds_total"] += hash_seconds
+            stats["wait_seconds_total"] += wait_seconds
+            stats["hash_seconds_max"] = max(stats["hash_seconds_max"], hash_seconds)
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], wait_seconds)
+        metrics.HASH_SECONDS.observe(hash_seconds, op=op)
+        metrics.HASH_WAIT_SECONDS.observe(wait_seconds, op=op)
+        logger.debug(
+            "%s took %.1fms (queue wait %.1fms)",
+            op,
+            hash_seconds * 1000,
+            wait_seconds * 1000,
+        )
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password in the worker pool.
+
+        Args:
+            password (str): The plain text password.
+
+        Returns:
+            str: The Argon2 hash.
+        """
+        return await self._run("hash", _hash_in_worker, password)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Hash a batch of passwords in parallel, for bulk imports.
+
+        Batch calls wait instead of being shed, but all imports together keep
+        at most `bulk_workers` pool workers busy, so logins always find the
+        other workers free.
+
+        Args:
+            passwords (list[str]): The plain text passwords.
+
+        Returns:
+            list[str]: The Argon2 hashes, in the same order.
+        """
+
+        async def hash_one(password: str) -> str:
+            async with self._bulk_slots:
+                return await self._run("hash", _hash_in_worker, password, bulk=True)
+
+        return list(await asyncio.gather(*(hash_one(p) for p in passwords)))
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """
+        Verify a password against a hash in the worker pool.
+
+        Args:
+            password (str): The plain text password.
+            hashed (str): The stored Argon2 hash.
+
+        Returns:
+            bool: True if the password matches, otherwise False.
+        """
+        return await self._run("verify", _verify_in_worker, password, hashed)
+
+    async def warm_up(self):
+        """
+        Start the worker processes and load Argon2 in them, so the first
+        logins after a (re)start do not pay for it.
+        """
+        pool = self._get_pool()
+        await asyncio.gather(
+            *(
+                asyncio.wrap_future(pool.submit(_warm_worker))
+                for _ in range(self.workers)
+            )
+        )
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the hashing counters.
+
+        Returns:
+            dict: Call/shed counts, hash and queue wait timings, in-flight
+            calls (interactive and bulk), pool sizing.
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["in_flight"] = self._pending
+            snapshot["bulk_in_flight"] = self._bulk_pending
+        snapshot["workers"] = self.workers
+        snapshot["max_queue"] = self.max_queue
+        snapshot["bulk_workers"] = self.bulk_workers
+        return snapshot
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# shared hasher for the whole app
+password_hasher = PasswordHasher()
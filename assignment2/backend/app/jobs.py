@@ -0,0 +1,177 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import analytics, crud, models, storage
+from .config import JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY, JOB_STALE_SECONDS, JOB_WORKERS
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# progress is written to the jobs table at most every 5%
+PROGRESS_STEP = 0.05
+
+
+# ======== JOB HANDLERS =========
+async def analyze_file_job(db: AsyncSession, job: models.Job, report_progress):
+    """
+    Compute word count, top words and character histogram of an uploaded blob.
+
+    Args:
+        db (AsyncSession): The database session.
+        job (Job): The running job.
+        report_progress: Async callback taking the fraction done.
+
+    Returns:
+        dict: The stats, or None if the blob was deleted before the job ran.
+    """
+    blob = await crud.get_blob(db, job.blob_sha256)
+    if blob is None:
+        return None
+    if blob.word_count is not None:
+        # already analyzed by an earlier job for the same content
+        return {
+            "word_count": blob.word_count,
+            "top_words": blob.top_words,
+            "char_histogram": blob.char_histogram,
+        }
+    stats = await analytics.analyze_file(blob.file_path, on_progress=report_progress)
+    await crud.save_blob_stats(db, blob, stats)
+    return stats
+
+
+async def compress_file_job(db: AsyncSession, job: models.Job, report_progress):
+    """
+    Write the gzip/brotli variants of an uploaded blob for downloads.
+
+    Args:
+        db (AsyncSession): The database session.
+        job (Job): The running job.
+        report_progress: Async callback taking the fraction done (unused).
+
+    Returns:
+        dict: The available encodings, or None if the blob was deleted.
+    """
+    blob = await crud.get_blob(db, job.blob_sha256)
+    if blob is None:
+        return None
+    encodings = await asyncio.to_thread(storage.precompress, blob.file_path)
+    return {"encodings": encodings}
+
+
+HANDLERS = {
+    "analyze_file": analyze_file_job,
+    "compress_file": compress_file_job,
+}
+
+
+# ======== JOB QUEUE =========
+class JobQueue:
+    """
+    In-process async job queue backed by the jobs table.
+
+    Jobs are persisted before they are queued, claimed atomically by one
+    worker, retried with exponential backoff on failure, and picked up again
+    on startup if the process died before finishing them.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_delay: float = JOB_RETRY_DELAY,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        """Start the workers and queue the jobs left unfinished by a previous run."""
+        self._queue = asyncio.Queue()
+        async with SessionLocal() as db:
+            for job_id in await crud.requeue_unfinished_jobs(db, JOB_STALE_SECONDS):
+                self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers, unfinished jobs stay pending/running in the table."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def enqueue(
+        self, db: AsyncSession, kind: str, blob_sha256: str, user_id: int = None
+    ):
+        """
+        Persist a job and hand it to the workers.
+
+        Args:
+            db (AsyncSession): The database session.
+            kind (str): The job handler name.
+            blob_sha256 (str): The blob the job works on.
+            user_id (int): The user the job runs for, see crud.create_job.
+
+        Returns:
+            Job: The pending job.
+        """
+        job = await crud.create_job(db, kind, blob_sha256, user_id)
+        # without running workers the job waits in the table for the next start
+        if self._queue is not None:
+            self._queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+            # the database layer can swallow a cancel while waiting for the
+            # writer connection, stop anyway instead of hanging stop()
+            if asyncio.current_task().cancelling():
+                raise asyncio.CancelledError
+
+    async def _run(self, job_id: int):
+        async with SessionLocal() as db:
+            job = await crud.claim_job(db, job_id)
+            if job is None:
+                return
+            attempts = job.attempts
+            last_progress = 0.0
+
+            async def report_progress(progress: float):
+                nonlocal last_progress
+                if progress - last_progress >= PROGRESS_STEP:
+                    last_progress = progress
+                    await crud.set_job_state(job_id, progress=progress)
+
+            try:
+                result = await HANDLERS[job.kind](db, job, report_progress)
+            except Exception as exc:
+                await db.rollback()
+                logger.warning("job %s attempt %s failed: %s", job_id, attempts, exc)
+                if attempts < self.max_attempts:
+                    await crud.set_job_state(job_id, status="pending", error=str(exc))
+                    delay = self.retry_delay * 2 ** (attempts - 1)
+                    asyncio.get_running_loop().call_later(delay, self._retry, job_id)
+                else:
+                    await crud.set_job_state(job_id, status="failed", error=str(exc))
+                return
+
+            await crud.set_job_state(job_id, status="done", progress=1.0, result=result)
+
+    def _retry(self, job_id: int):
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+
+# shared queue for the whole app
+job_queue = JobQueue()
@@ -1,13 +1,65 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+
+from . import crud, metrics, storage
+from .config import (
+    HASH_RETRY_AFTER,
+    METRICS_ENABLED,
+    MIGRATE_ON_STARTUP,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_SLOW_MS,
+    WARMUP_ON_STARTUP,
+)
+from .database import SQLITE_TUNED, engine, ensure_sqlite_dir, read_engine
+from .hashing import HashingOverloaded, password_hasher
+from .jobs import job_queue
+from .routers import jobs, users
+from .tokens import token_cache
+from .write_lane import write_lane
+
+
+async def _warm_up():
+    # open a connection in each pool (running the SQLite pragmas) and load
+    # Argon2 in the hashing workers
+    for pool in [engine] if read_engine is engine else [engine, read_engine]:
+        async with pool.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await password_hasher.warm_up()
 
-from .database import Base, engine
-from .routers import users
 
-# Create Database Tables on Startup
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_sqlite_dir()
+    storage.ensure_dirs()
+    # Create Database Tables (and any new index) on Startup, unless the
+    # deploy runs `python -m app.migrate` once for all workers
+    if MIGRATE_ON_STARTUP:
+        from .migrate import migrate
 
-app = FastAPI(title="User Info Store")
+        await migrate()
+    # SQLite production profile: group-commit small writes on the writer connection
+    if SQLITE_TUNED:
+        await write_lane.start()
+    # start the background job workers
+    await job_queue.start()
+    if WARMUP_ON_STARTUP:
+        await _warm_up()
+    yield
+    await job_queue.stop()
+    await write_lane.stop()
+    # stop the Argon2 worker processes
+    password_hasher.shutdown()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
+app = FastAPI(title="User Info Store", lifespan=lifespan)
 
 # Configure CORS to allow frontend requests
 app.add_middleware(
@@ -25,9 +77,92 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, in-flight requests and SQL work, exposed at /metrics
+if METRICS_ENABLED:
+    metrics.instrument_engine(engine, "writer")
+    if read_engine is not engine:
+        metrics.instrument_engine(read_engine, "reader")
+    profiler = None
+    if PROFILE_SLOW_MS > 0:
+        from .profiler import SlowRequestProfiler
+
+        profiler = SlowRequestProfiler(
+            threshold=PROFILE_SLOW_MS / 1000,
+            interval=PROFILE_INTERVAL_MS / 1000,
+            out_dir=PROFILE_DIR,
+        )
+    app.add_middleware(metrics.MetricsMiddleware, profiler=profiler)
+
+
+def _collect_app_stats() -> dict:
+    hashing = password_hasher.stats()
+    cache = crud.user_cache.stats()
+    verified = token_cache.stats()
+    return {
+        "password_hash_in_flight": (
+            "gauge",
+            "Hash/verify calls queued or running.",
+            hashing["in_flight"],
+        ),
+        "password_hash_bulk_in_flight": (
+            "gauge",
+            "Bulk import hash calls running (capped at HASH_BULK_WORKERS).",
+            hashing["bulk_in_flight"],
+        ),
+        "password_hash_shed_total": (
+            "counter",
+            "Hash/verify calls shed with 503.",
+            hashing["shed"],
+        ),
+        "user_cache_size": ("gauge", "Users in the per-process cache.", cache["size"]),
+        "user_cache_hits_total": ("counter", "User cache hits.", cache["hits"]),
+        "user_cache_misses_total": ("counter", "User cache misses.", cache["misses"]),
+        "token_cache_hits_total": (
+            "counter",
+            "Access tokens served from the verification cache.",
+            verified["hits"],
+        ),
+        "token_cache_misses_total": (
+            "counter",
+            "Access tokens verified with an HMAC.",
+            verified["misses"],
+        ),
+        "write_lane_batches_total": (
+            "counter",
+            "Group commits run by the write lane.",
+            write_lane.batches,
+        ),
+        "write_lane_statements_total": (
+            "counter",
+            "Statements committed by the write lane.",
+            write_lane.statements,
+        ),
+    }
+
+
+metrics.register_collector(_collect_app_stats)
+
 app.include_router(users.router)
+app.include_router(jobs.router)
+
+
+# Shed load when the password hashing pool is saturated
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER)},
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "System Operational"}
@@ -0,0 +1,291 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+# latency buckets in seconds, from a cached read to a slow upload
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ======== METRIC TYPES =========
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: str = "") -> str:
+        parts = [
+            f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)
+        ]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines += self._render_value(key, value)
+        return lines
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, rendered like prometheus_client does."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets=()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket counts (+Inf last), sum
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        counts, total = value[0][:], value[1]
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            labels = self._format_labels(key, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = self._format_labels(key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ======== REGISTRY =========
+_metrics = []
+# callables run at scrape time, returning {name: (type, help, value)}
+_collectors = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """
+    Add a callable sampled at scrape time (pool sizes, cache counters, ...).
+
+    Args:
+        collect: Callable returning {metric name: (type, help text, value)},
+            type being "gauge" or "counter".
+    """
+    _collectors.append(collect)
+
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The /metrics body.
+    """
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for collect in _collectors:
+        for name, (kind, help_text, value) in collect().items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = _register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency by route.",
+        ("method", "route", "status"),
+        LATENCY_BUCKETS,
+    )
+)
+REQUESTS_IN_FLIGHT = _register(
+    Gauge("http_requests_in_flight", "Requests being served.", ("method",))
+)
+REQUEST_QUERIES = _register(
+    Histogram(
+        "http_request_db_queries",
+        "SQL statements run per request, by route.",
+        ("method", "route"),
+        QUERY_COUNT_BUCKETS,
+    )
+)
+REQUEST_QUERY_SECONDS = _register(
+    Histogram(
+        "http_request_db_seconds",
+        "Time spent in SQL statements per request, by route.",
+        ("method", "route"),
+        LATENCY_BUCKETS,
+    )
+)
+QUERY_SECONDS = _register(
+    Histogram(
+        "db_query_duration_seconds",
+        "SQL statement latency, by engine and statement type.",
+        ("engine", "statement"),
+        LATENCY_BUCKETS,
+    )
+)
+HASH_SECONDS = _register(
+    Histogram(
+        "password_hash_duration_seconds",
+        "Argon2 hash/verify time inside the worker.",
+        ("op",),
+        LATENCY_BUCKETS,
+    )
+)
+HASH_WAIT_SECONDS = _register(
+    Histogram(
+        "password_hash_queue_wait_seconds",
+        "Time hash/verify calls waited for a free worker.",
+        ("op",),
+        LATENCY_BUCKETS,
+    )
+)
+
+
+# ======== PER REQUEST QUERY STATS =========
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+# set by the middleware, read by the engine events of the same request
+request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """
+    Time every statement of an (async) engine and add it to the current
+    request's stats.
+
+    Args:
+        engine (AsyncEngine): The engine to instrument.
+        name (str): Engine label, e.g. "writer" or "reader".
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, params, context, many):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        QUERY_SECONDS.observe(elapsed, engine=name, statement=kind)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+
+# ======== MIDDLEWARE =========
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, in-flight requests and SQL work
+    per route (the route template, e.g. /users/{username}, not the raw path).
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        REQUESTS_IN_FLIGHT.inc(method=method)
+        if self.profiler is not None:
+            self.profiler.begin()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec(method=method)
+            request_stats.reset(token)
+            # set by the router once matched, unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=status)
+            REQUEST_QUERIES.observe(stats.queries, method=method, route=route)
+            REQUEST_QUERY_SECONDS.observe(
+                stats.query_seconds, method=method, route=route
+            )
+            if self.profiler is not None:
+                self.profiler.end(f"{method} {route}", elapsed)
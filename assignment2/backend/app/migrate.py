@@ -0,0 +1,49 @@
+"""
+Schema step, run once per deploy instead of on every worker start:
+
+    uv run python -m app.migrate
+
+Workers then start with MIGRATE_ON_STARTUP=false.
+"""
+
+import asyncio
+import logging
+
+from . import crud, storage
+from .database import (
+    SessionLocal,
+    engine,
+    ensure_sqlite_dir,
+    init_schema,
+    read_engine,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate():
+    """
+    Create the folders, missing tables and indexes, and drop expired or
+    revoked refresh tokens.
+    """
+    ensure_sqlite_dir()
+    storage.ensure_dirs()
+    async with engine.begin() as conn:
+        await conn.run_sync(init_schema)
+    async with SessionLocal() as db:
+        await crud.purge_refresh_tokens(db)
+
+
+async def _main():
+    try:
+        await migrate()
+    finally:
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+    logger.info("schema is up to date")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(_main())
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, Column, DateTime, Float, Index, Integer, String
 
 from .database import Base
 
@@ -20,6 +22,69 @@ class User(Base):
     address = Column(String, nullable=True)
 
     # file upload. txt only
-    file_path = Column(String, nullable=True)  # [username]+[file_name].txt
+    file_path = Column(String, nullable=True)  # uploads/blobs/[sha256[:2]]/[sha256].txt
     original_filename = Column(String, nullable=True)
     file_word_count = Column(Integer, nullable=True)
+
+    # keyset pagination of last name searches walks (last_name, id) in order,
+    # username/email are unique so their own indexes already give a total order
+    __table_args__ = (Index("ix_users_last_name_id", "last_name", "id"),)
+
+
+class FileBlob(Base):
+    __tablename__ = "file_blobs"
+
+    # one row per unique upload content, shared by every user that uploaded it
+    sha256 = Column(String(64), primary_key=True)
+    file_path = Column(String, unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    # text stats, filled in by the analyze_file background job
+    word_count = Column(Integer, nullable=True)
+    top_words = Column(JSON, nullable=True)  # [[word, count], ...]
+    char_histogram = Column(JSON, nullable=True)  # {char: count}
+
+    # number of users whose User.file_path points at this blob
+    ref_count = Column(Integer, nullable=False, default=0)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # what to run and on which blob
+    kind = Column(String, nullable=False)
+    blob_sha256 = Column(String(64), index=True, nullable=True)
+    # the user who uploaded the blob, only they may read the job
+    user_id = Column(Integer, index=True, nullable=True)
+
+    # pending -> running -> done | failed (running -> pending again on retry)
+    status = Column(String, index=True, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    progress = Column(Float, nullable=False, default=0.0)  # 0.0 - 1.0
+    error = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, default=_utcnow, onupdate=_utcnow
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True, nullable=False)
+
+    # SHA-256 of the token, the token itself is only known to the client
+    token_hash = Column(String(64), unique=True, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # set on logout, rotation or password change, a revoked token cannot be used
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    location = f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}"
+    return f"{code.co_qualname} ({location})"
+
+
+def _await_chain(coro) -> list:
+    """Frames of a task's coroutine chain, outermost first, plus what it awaits."""
+    chain = []
+    obj = coro
+    while obj is not None:
+        frame = (
+            getattr(obj, "cr_frame", None)
+            or getattr(obj, "gi_frame", None)
+            or getattr(obj, "ag_frame", None)
+        )
+        if frame is None:
+            # a Future, e.g. the hashing pool or a DB driver thread
+            chain.append(f"<{type(obj).__name__}>")
+            break
+        chain.append(frame)
+        obj = (
+            getattr(obj, "cr_await", None)
+            or getattr(obj, "gi_yieldfrom", None)
+            or getattr(obj, "ag_await", None)
+        )
+    return chain
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in wall-clock sampling profiler for slow requests.
+
+    A daemon thread samples every in-flight request each `interval` seconds:
+    the event loop thread's stack when the request is the one running, its
+    await chain otherwise (so time spent waiting on the DB or the hashing
+    pool shows up too). Requests slower than `threshold` get their samples
+    written to `out_dir` as folded stacks, the input of flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self, threshold: float, interval: float, out_dir: str):
+        self.threshold = threshold
+        self.interval = interval
+        self.out_dir = out_dir
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop_thread_id = None
+
+    def begin(self):
+        """Start sampling the current request (called from its task)."""
+        if self._thread is None:
+            self._loop_thread_id = threading.get_ident()
+            self._thread = threading.Thread(
+                target=self._sample_forever, name="slow-request-profiler", daemon=True
+            )
+            self._thread.start()
+        with self._lock:
+            self._active[asyncio.current_task()] = Counter()
+
+    def end(self, name: str, elapsed: float):
+        """
+        Stop sampling the current request, dumping its samples if it was slow.
+
+        Args:
+            name (str): Request label, e.g. "PATCH /users/{username}".
+            elapsed (float): Request duration in seconds.
+        """
+        with self._lock:
+            samples = self._active.pop(asyncio.current_task(), None)
+        if samples and elapsed >= self.threshold:
+            self._dump(name, elapsed, samples)
+
+    def _sample_forever(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._sample()
+            except Exception:
+                logger.exception("profiler sample failed")
+
+    def _sample(self):
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+        loop_stack = []
+        while loop_frame is not None:
+            loop_stack.append(loop_frame)
+            loop_frame = loop_frame.f_back
+        loop_stack.reverse()
+        positions = {id(frame): i for i, frame in enumerate(loop_stack)}
+
+        with self._lock:
+            active = list(self._active.items())
+        for task, samples in active:
+            chain = _await_chain(task.get_coro())
+            frames = [f for f in chain if not isinstance(f, str)]
+            if frames and id(frames[-1]) in positions and id(frames[0]) in positions:
+                # running right now: the thread stack also has the sync calls
+                stack = loop_stack[positions[id(frames[0])] :]
+            else:
+                stack = chain
+            folded = ";".join(f if isinstance(f, str) else _label(f) for f in stack)
+            samples[folded] += 1
+
+    def _dump(self, name: str, elapsed: float, samples: Counter):
+        os.makedirs(self.out_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(
+            self.out_dir, f"{stamp}-{slug}-{elapsed * 1000:.0f}ms.folded"
+        )
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(
+            "slow request %s (%.0fms) profiled to %s", name, elapsed * 1000, path
+        )
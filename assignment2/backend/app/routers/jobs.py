@@ -0,0 +1,40 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import crud, schemas
+from ..database import get_db
+from .users import authorized_user
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+# --- Job Status ---
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+async def get_job(
+    job_id: int,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get the status, progress and result of a background job.
+
+    Job IDs are sequential, so only the user the job runs for may read it,
+    with the same credentials as their other routes.
+
+    Args:
+        job_id (int): The ID of the job.
+        authorization (str): The Authorization header.
+        db (AsyncSession): The database session.
+
+    Returns:
+        schemas.JobResponse: The job.
+    """
+    job = await crud.get_job(db, job_id)
+    # jobs queued before owners were stored have none and stay unreadable
+    owner = await crud.get_user(db, job.user_id) if job and job.user_id else None
+    if not owner:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await authorized_user(owner.username, authorization, db)
+    return job
@@ -1,121 +1,435 @@
-import os
+import base64
 import re
-import shutil
-import uuid
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import bulk, crud, downloads, models, schemas, storage, tokens
+from ..config import BULK_BATCH_SIZE, USER_PAGE_MAX, USER_PAGE_SIZE
+from ..database import SessionLocal, get_db
+from ..jobs import job_queue
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+router = APIRouter(prefix="/users", tags=["users"])
 
-from .. import crud, schemas
-from ..database import get_db
+# search_by values accepted by GET /users/
+SEARCH_BY_PATTERN = f"^({'|'.join(crud.SEARCH_FIELDS)})$"
 
-router = APIRouter(prefix="/users", tags=["users"])
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# --- Auth ---
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+async def _token_response(
+    user: models.User, refresh_token: str = None
+) -> schemas.TokenResponse:
+    # a new refresh token opens a session, rotation passes the one it made
+    if refresh_token is None:
+        refresh_token = await crud.create_refresh_token(user.id)
+    access_token, expires_in = tokens.issue_access_token(user.id, user.username)
+    return schemas.TokenResponse(
+        **schemas.UserResponse.model_validate(user).model_dump(),
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=expires_in,
+    )
+
+
+async def authorized_user(
+    username: str,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Dependency returning the user a route acts on, once the caller has shown
+    they are that user.
+
+    Bearer access tokens cost an HMAC check (nothing when the token is in
+    tokens.token_cache) and a cached user lookup. HTTP Basic credentials are
+    still accepted for scripts, but each call pays a full Argon2 verify.
+
+    Args:
+        username (str): The username from the path.
+        authorization (str): The Authorization header.
+        db (AsyncSession): The database session.
+
+    Returns:
+        User: The authenticated user.
+    """
+    scheme, _, credentials = (authorization or "").partition(" ")
+    scheme = scheme.lower()
+
+    if scheme == "bearer":
+        try:
+            claims = tokens.verify_access_token(credentials)
+        except tokens.InvalidToken as e:
+            raise _unauthorized(str(e))
+        if claims["name"] != username:
+            raise HTTPException(status_code=403, detail="Not allowed")
+        user = await crud.get_user_by_username(db, username)
+        # the account was deleted (and the name maybe taken again) since
+        if not user or str(user.id) != claims["sub"]:
+            raise _unauthorized("Invalid token")
+        return user
+
+    if scheme == "basic":
+        try:
+            decoded = base64.b64decode(credentials, validate=True).decode()
+        except ValueError:
+            raise _unauthorized("Malformed credentials")
+        login, _, password = decoded.partition(":")
+        if login != username:
+            raise HTTPException(status_code=403, detail="Not allowed")
+        user = await crud.authenticate_user(db, login, password)
+        if not user:
+            raise _unauthorized("Invalid credentials")
+        return user
+
+    raise _unauthorized("Not authenticated")
+
+
+async def admin_caller(authorization: Optional[str] = Header(None)):
+    """
+    Dependency of the routes acting on every user (listing, bulk import and
+    export).
+
+    A user's own access token is not enough there: the caller must send the
+    admin/service credential, ADMIN_TOKEN, as a Bearer token. Without an
+    ADMIN_TOKEN configured the routes are disabled.
+
+    Args:
+        authorization (str): The Authorization header.
+    """
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer":
+        raise _unauthorized("Not authenticated")
+    if not tokens.is_admin_token(credentials):
+        raise HTTPException(status_code=403, detail="Not allowed")
 
 
 # --- Create ---
-@router.post("/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+@router.post("/", response_model=schemas.TokenResponse)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """
-    Create a new user.
+    Create a new user and open their first session.
 
     Args:
         user (schemas.UserCreate): The user data to create.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
-        schemas.UserResponse: The created user.
+        schemas.TokenResponse: The created user and their tokens.
     """
-    if crud.get_user_by_email(db, email=user.email):
+    existing = await crud.get_users_by_email_or_username(
+        db, email=user.email, username=user.username
+    )
+    if any(u.email == user.email for u in existing):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if crud.get_user_by_username(db, username=user.username):
+    if existing:
         raise HTTPException(status_code=400, detail="Username taken")
-    return crud.create_user(db=db, user=user)
+    db_user = await crud.create_user(db=db, user=user)
+    return await _token_response(db_user)
+
+
+# --- List / Search ---
+@router.get("/", response_model=schemas.UserPage, dependencies=[Depends(admin_caller)])
+async def list_users(
+    limit: int = Query(USER_PAGE_SIZE, ge=1, le=USER_PAGE_MAX),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(None, min_length=1),
+    search_by: str = Query("username", pattern=SEARCH_BY_PATTERN),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List users in pages, optionally filtered by a prefix (admin token
+    required).
+
+    Args:
+        limit (int): Page size.
+        cursor (str): The next_cursor of the previous page.
+        q (str): Prefix to match against the `search_by` column.
+        search_by (str): "username" (default), "email" or "last_name".
+        fields (str): Comma separated fields to return, default: all of
+            UserResponse.
+        db (AsyncSession): The database session.
+
+    Returns:
+        schemas.UserPage: The users and the cursor of the next page.
+    """
+    selected = bulk.EXPORT_FIELDS
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        selected = list(dict.fromkeys(selected))
+        unknown = set(selected) - set(bulk.EXPORT_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+
+    try:
+        items, next_cursor = await crud.list_users(
+            db, selected, limit, cursor=cursor, prefix=q, search_by=search_by
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return schemas.UserPage(items=items, next_cursor=next_cursor)
+
+
+# --- Bulk Import ---
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkImportResponse,
+    dependencies=[Depends(admin_caller)],
+)
+async def bulk_import(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Create many users from an NDJSON or CSV body (admin token required).
+
+    The body is parsed as it arrives and inserted in batches of
+    BULK_BATCH_SIZE, so memory stays flat whatever the upload size. Invalid
+    or duplicate rows are reported and skipped, the others are kept.
+
+    Args:
+        request (Request): Body in application/x-ndjson or text/csv (with a
+            header row), one user per line with the UserCreate fields.
+        db (AsyncSession): The database session.
+
+    Returns:
+        schemas.BulkImportResponse: Inserted/failed counts and the row errors.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in bulk.NDJSON_TYPES:
+        rows = bulk.iter_ndjson_rows(request.stream())
+    elif content_type in bulk.CSV_TYPES:
+        rows = bulk.iter_csv_rows(request.stream())
+    else:
+        raise HTTPException(
+            status_code=415, detail="Body must be application/x-ndjson or text/csv"
+        )
+
+    inserted = 0
+    errors = []
+    batch = []
+
+    async def flush():
+        nonlocal inserted
+        results = await crud.bulk_create_users(db, [user for _, user in batch])
+        for (row_number, _), error in zip(batch, results):
+            if error is None:
+                inserted += 1
+            else:
+                errors.append(schemas.BulkRowError(row=row_number, error=error))
+        batch.clear()
+
+    try:
+        async for row_number, data, error in rows:
+            if error is not None:
+                errors.append(schemas.BulkRowError(row=row_number, error=error))
+                continue
+            try:
+                batch.append((row_number, schemas.UserCreate.model_validate(data)))
+            except ValidationError as e:
+                errors.append(
+                    schemas.BulkRowError(
+                        row=row_number, error=bulk.format_validation_error(e)
+                    )
+                )
+            if len(batch) >= BULK_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 text")
+
+    errors.sort(key=lambda e: e.row)
+    return schemas.BulkImportResponse(
+        inserted=inserted, failed=len(errors), errors=errors
+    )
+
+
+# --- Bulk Export ---
+@router.get("/export", dependencies=[Depends(admin_caller)])
+async def export_users(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """
+    Stream every user as NDJSON or CSV, no password hashes (admin token
+    required).
+
+    Args:
+        format (str): "ndjson" (default) or "csv".
+
+    Returns:
+        StreamingResponse: The users, fetched and written in batches.
+    """
+
+    async def body():
+        # own session: the response outlives the request dependencies
+        async with SessionLocal() as db:
+            first = True
+            async for rows in crud.stream_users(db, BULK_BATCH_SIZE):
+                if format == "csv":
+                    yield bulk.to_csv(rows, header=first)
+                else:
+                    yield bulk.to_ndjson(rows)
+                first = False
+            if first and format == "csv":
+                yield bulk.to_csv([], header=True)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
 
 
 # --- Login ---
-@router.post("/login", response_model=schemas.UserResponse)
-def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+@router.post("/login", response_model=schemas.TokenResponse)
+async def login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     """
-    Authenticate a user.
+    Authenticate a user and open a session.
+
+    This is the only call verifying the password, the routes acting on the
+    user then take the access token.
 
     Args:
         credentials (schemas.UserLogin): The user credentials.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
-        schemas.UserResponse: The authenticated user.
+        schemas.TokenResponse: The authenticated user and their tokens.
     """
-    user = crud.authenticate_user(db, credentials.username, credentials.password)
+    user = await crud.authenticate_user(db, credentials.username, credentials.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return user
+    return await _token_response(user)
+
+
+# --- Refresh Access Token ---
+@router.post("/refresh", response_model=schemas.TokenResponse)
+async def refresh(body: schemas.RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Renew an access token without the password.
+
+    The refresh token is single use: the response carries its replacement.
+
+    Args:
+        body (schemas.RefreshRequest): The refresh token.
+        db (AsyncSession): The database session.
+
+    Returns:
+        schemas.TokenResponse: The user and their new tokens.
+    """
+    rotated = await crud.rotate_refresh_token(body.refresh_token)
+    if not rotated:
+        raise _unauthorized("Invalid refresh token")
+    user_id, refresh_token = rotated
+    user = await crud.get_user(db, user_id)
+    if not user:
+        raise _unauthorized("Invalid refresh token")
+    return await _token_response(user, refresh_token)
+
+
+# --- Logout ---
+@router.post("/logout")
+async def logout(body: schemas.RefreshRequest):
+    """
+    Revoke a refresh token. The access token stays valid until it expires
+    (ACCESS_TOKEN_TTL).
+
+    Args:
+        body (schemas.RefreshRequest): The refresh token.
+
+    Returns:
+        dict: A message indicating the success of the operation.
+    """
+    await crud.revoke_refresh_token(body.refresh_token)
+    return {"message": "Logged out"}
 
 
 # --- Update Info (PATCH) ---
 @router.patch("/{username}", response_model=schemas.UserResponse)
-def update_user_info(
-    username: str, updates: schemas.UserUpdate, db: Session = Depends(get_db)
+async def update_user_info(
+    updates: schemas.UserUpdate,
+    db_user: models.User = Depends(authorized_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Update a user's information.
 
+    Changing the password revokes the user's refresh tokens.
+
     Args:
-        username (str): The username of the user to update.
         updates (schemas.UserUpdate): The updated user information.
-        db (Session): The database session.
+        db_user (User): The authenticated user from the path.
+        db (AsyncSession): The database session.
 
     Returns:
         schemas.UserResponse: The updated user.
     """
-    db_user = crud.get_user_by_username(db, username)
-    if not db_user:
+    updated_user = await crud.update_user(db, db_user, updates)
+    if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
-
-    return crud.update_user(db, db_user, updates)
+    return updated_user
 
 
 # --- Delete User ---
 @router.delete("/{username}")
-def delete_user(username: str, db: Session = Depends(get_db)):
+async def delete_user(
+    username: str,
+    user: models.User = Depends(authorized_user),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Delete a user and their data.
+    Delete a user, their data and their sessions.
 
     Args:
         username (str): The username of the user to delete.
-        db (Session): The database session.
+        user (User): The authenticated user from the path.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A message indicating the success of the operation.
     """
-    success = crud.delete_user(db, username)
+    success = await crud.delete_user(db, username)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": f"User {username} and their data deleted successfully"}
 
 
 # --- Upload File ---
-@router.post("/{username}/file", response_model=schemas.UserResponse)
-def upload_file(
-    username: str, file: UploadFile = File(...), db: Session = Depends(get_db)
+@router.post("/{username}/file", response_model=schemas.FileUploadResponse)
+async def upload_file(
+    file: UploadFile = File(...),
+    user: models.User = Depends(authorized_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Upload a file for a user.
 
     Args:
-        username (str): The username of the user.
         file (UploadFile): The file to upload.
-        db (Session): The database session.
+        user (User): The authenticated user from the path.
+        db (AsyncSession): The database session.
 
     Returns:
-        dict: A message indicating the success of the operation.
+        schemas.FileUploadResponse: The updated user, with the id of the job
+        computing the file stats when the content is new.
     """
-    user = crud.get_user_by_username(db, username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     if not file.filename:
         raise HTTPException(status_code=400, detail="File name cannot be empty")
 
@@ -130,65 +444,82 @@ def upload_file(
             detail="Filename can only contain letters, numbers, underscores (_), and hyphens (-)",
         )
 
-    unique_filename = f"{uuid.uuid4()}.txt"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-
+    # stream to disk in chunks, hashing and counting words in the same pass
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        saved = await storage.save_upload(file)
+    except storage.UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 text")
     except Exception:
         raise HTTPException(status_code=500, detail="Could not save file")
 
-    updated_user = crud.update_user_file(db, user.id, file_path, file.filename)
-    return updated_user
+    # identical content is stored once and shared between users
+    updated_user = await crud.update_user_file(db, user, saved, file.filename)
+    if updated_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    response = schemas.FileUploadResponse.model_validate(updated_user)
+
+    # new content: compute its stats in the background, poll GET /jobs/{job_id}
+    # and precompress it for downloads
+    if updated_user.file_word_count is None:
+        job = await job_queue.enqueue(db, "analyze_file", saved.sha256, user.id)
+        response.job_id = job.id
+        await job_queue.enqueue(db, "compress_file", saved.sha256, user.id)
+    return response
 
 
 # --- Download File ---
 @router.get("/{username}/file")
-def download_file(username: str, db: Session = Depends(get_db)):
+async def download_file(
+    username: str, request: Request, db: AsyncSession = Depends(get_db)
+):
     """
     Download a file for a user.
 
+    Supports conditional GET (ETag / If-None-Match), Range / If-Range and
+    precompressed gzip/brotli variants (Accept-Encoding).
+
     Args:
         username (str): The username of the user.
-        db (Session): The database session.
+        request (Request): The request, for its conditional/range headers.
+        db (AsyncSession): The database session.
 
     Returns:
-        FileResponse: The file to download.
+        Response: The file, 206 for a range, 304 if the client copy is current.
     """
-    user = crud.get_user_by_username(db, username)
+    user = await crud.get_user_by_username(db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not user.file_path or not os.path.exists(user.file_path):
+    if not user.file_path:
         raise HTTPException(status_code=404, detail="No file found")
 
-    return FileResponse(
-        path=user.file_path,
-        filename=user.original_filename,
-        media_type="text/plain",
+    response = await downloads.file_response(
+        request, user.file_path, user.original_filename
     )
+    if response is None:
+        raise HTTPException(status_code=404, detail="No file found")
+    return response
 
 
 # --- Delete File Only ---
 @router.delete("/{username}/file")
-def delete_file(username: str, db: Session = Depends(get_db)):
+async def delete_file(
+    user: models.User = Depends(authorized_user), db: AsyncSession = Depends(get_db)
+):
     """
     Delete a file for a user.
 
     Args:
-        username (str): The username of the user.
-        db (Session): The database session.
+        user (User): The authenticated user from the path.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A message indicating the success of the operation.
     """
-    user = crud.get_user_by_username(db, username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     if not user.file_path:
         raise HTTPException(status_code=404, detail="User has no file to delete")
 
-    crud.delete_user_file(db, user.id)
+    await crud.delete_user_file(db, user)
     return {"message": "File deleted successfully"}
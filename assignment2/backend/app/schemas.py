@@ -1,5 +1,6 @@
 import re
-from typing import Optional
+from datetime import datetime
+from typing import Any, Optional
 
 from pydantic import BaseModel, EmailStr, field_validator
 
@@ -77,3 +78,57 @@ class UserResponse(UserBase):
 
     class Config:
         from_attributes = True
+
+
+# INPUT: What the client sends to renew its access token or to logout
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+# OUTPUT: Login/signup/refresh result, the user plus the session tokens.
+# Send `Authorization: Bearer <access_token>` to the routes changing the user
+class TokenResponse(UserResponse):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+
+# OUTPUT: One page of GET /users/, items only hold the requested fields
+class UserPage(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+# OUTPUT: Upload result, job_id is set while the file stats are being computed
+class FileUploadResponse(UserResponse):
+    job_id: Optional[int] = None
+
+
+# OUTPUT: Background job status
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    attempts: int
+    error: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# OUTPUT: A row rejected by POST /users/bulk
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+
+# OUTPUT: Bulk import summary, rows are numbered from 1 (CSV header excluded)
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: list[BulkRowError] = []
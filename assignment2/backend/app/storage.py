@@ -0,0 +1,240 @@
+import asyncio
+import codecs
+import gzip
+import hashlib
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+
+from .config import MAX_UPLOAD_BYTES, PRECOMPRESS_MIN_BYTES, UPLOAD_CHUNK_SIZE
+
+try:
+    import brotli
+except ImportError:  # optional, install the "compression" extra for .br variants
+    brotli = None
+
+# content-addressed blobs live under uploads/blobs, uploads in progress under uploads/tmp
+UPLOAD_DIR = "uploads"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+
+# precompressed variants stored next to a blob, by Content-Encoding (preferred first)
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# variants saving less than this fraction of the size are not kept
+MIN_COMPRESSION_SAVING = 0.1
+
+
+def ensure_dirs():
+    """Create the upload folders, run at startup rather than at import."""
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    os.makedirs(TMP_DIR, exist_ok=True)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload goes past the configured size limit."""
+
+
+@dataclass
+class SavedUpload:
+    temp_path: str
+    sha256: str
+    size: int
+
+
+def _write_chunk(buffer, digest, decoder, chunk: bytes):
+    buffer.write(chunk)
+    digest.update(chunk)
+    # only checks the text is valid UTF-8, stats are computed by a background job
+    decoder.decode(chunk)
+
+
+async def save_upload(
+    upload: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SavedUpload:
+    """
+    Stream an upload to a temp file in fixed-size chunks, hashing it and
+    checking it is UTF-8 in the same pass.
+
+    Memory stays at one chunk whatever the file size. The temp file is
+    removed if the upload is too large or is not valid UTF-8. Pass the
+    result to commit_blob (new content) or discard (duplicate content).
+
+    Args:
+        upload (UploadFile): The uploaded file.
+        max_bytes (int): Size limit, UploadTooLarge is raised past it.
+        chunk_size (int): Bytes read and written per step.
+
+    Returns:
+        SavedUpload: The temp file path, SHA-256 and size.
+    """
+    temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    size = 0
+    try:
+        with open(temp_path, "wb") as buffer:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"upload is larger than {max_bytes} bytes")
+                # disk write, hashing and decoding run off the event loop
+                await asyncio.to_thread(_write_chunk, buffer, digest, decoder, chunk)
+        decoder.decode(b"", final=True)
+    except BaseException:
+        remove_file(temp_path)
+        raise
+    return SavedUpload(
+        temp_path=temp_path,
+        sha256=digest.hexdigest(),
+        size=size,
+    )
+
+
+def blob_path(sha256: str) -> str:
+    """
+    Path of the blob holding some content.
+
+    Args:
+        sha256 (str): The content hash.
+
+    Returns:
+        str: uploads/blobs/[sha256[:2]]/[sha256].txt
+    """
+    return os.path.join(BLOB_DIR, sha256[:2], f"{sha256}.txt")
+
+
+def commit_blob(saved: SavedUpload) -> str:
+    """
+    Move an upload into the blob store, dropping it if the blob already exists.
+
+    Args:
+        saved (SavedUpload): The streamed upload.
+
+    Returns:
+        str: The blob path.
+    """
+    path = blob_path(saved.sha256)
+    if os.path.exists(path):
+        discard(saved)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(saved.temp_path, path)
+    return path
+
+
+def discard(saved: SavedUpload):
+    """
+    Remove the temp file of an upload that will not be stored.
+
+    Args:
+        saved (SavedUpload): The streamed upload.
+    """
+    remove_file(saved.temp_path)
+
+
+def variant_path(path: str, encoding: str) -> str:
+    """
+    Path of the precompressed variant of a file.
+
+    Args:
+        path (str): The file.
+        encoding (str): "br" or "gzip".
+
+    Returns:
+        str: e.g. uploads/blobs/ab/ab...cd.txt.gz
+    """
+    return path + VARIANT_SUFFIXES[encoding]
+
+
+def variant_encodings() -> list[str]:
+    """
+    Encodings precompress can write, brotli only if the module is installed.
+
+    Returns:
+        list[str]: The encodings, preferred first.
+    """
+    return [e for e in VARIANT_SUFFIXES if e != "br" or brotli is not None]
+
+
+def _compress(src, dst, encoding: str, chunk_size: int):
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical content
+        with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=9, mtime=0) as gz:
+            shutil.copyfileobj(src, gz, chunk_size)
+        return
+    compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=11)
+    while chunk := src.read(chunk_size):
+        dst.write(compressor.process(chunk))
+    dst.write(compressor.finish())
+
+
+def precompress(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> list[str]:
+    """
+    Write the gzip/brotli variants of a blob, so downloads can send them as is.
+
+    Blocking, run it in a thread. Existing variants are kept, and a variant is
+    dropped when it does not save at least MIN_COMPRESSION_SAVING.
+
+    Args:
+        path (str): The blob to compress.
+        chunk_size (int): Bytes read per step.
+
+    Returns:
+        list[str]: The encodings available for the blob.
+    """
+    size = os.path.getsize(path)
+    if size < PRECOMPRESS_MIN_BYTES:
+        return []
+    available = []
+    for encoding in variant_encodings():
+        target = variant_path(path, encoding)
+        if os.path.exists(target):
+            available.append(encoding)
+            continue
+        temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4()}.part")
+        try:
+            with open(path, "rb") as src, open(temp_path, "wb") as dst:
+                _compress(src, dst, encoding, chunk_size)
+            if os.path.getsize(temp_path) > size * (1 - MIN_COMPRESSION_SAVING):
+                continue
+            os.replace(temp_path, target)
+        finally:
+            remove_file(temp_path)
+        available.append(encoding)
+    if not os.path.exists(path):
+        # the blob was released while compressing
+        remove_blob(path)
+        return []
+    return available
+
+
+def remove_blob(path: str):
+    """
+    Remove a stored file and its precompressed variants.
+
+    Args:
+        path (str): The file to remove.
+    """
+    remove_file(path)
+    for encoding in VARIANT_SUFFIXES:
+        remove_file(variant_path(path, encoding))
+
+
+def remove_file(path: str):
+    """
+    Remove a file, ignoring it if it is already gone.
+
+    Args:
+        path (str): The file to remove.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+
+from .cache import LRUTTLCache
+from .config import (
+    ACCESS_TOKEN_TTL,
+    ADMIN_TOKEN,
+    TOKEN_CACHE_SIZE,
+    TOKEN_CACHE_TTL,
+    TOKEN_SECRET,
+)
+
+logger = logging.getLogger(__name__)
+
+if TOKEN_SECRET:
+    _secret = TOKEN_SECRET.encode()
+else:
+    # tokens then only verify in the process that issued them
+    _secret = secrets.token_bytes(32)
+    logger.warning("TOKEN_SECRET is not set, using a random per-process key")
+
+# the only header this app issues, anything else (e.g. alg=none) is rejected
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').decode().rstrip("=")
+
+# Verified access token claims, keyed by the token itself
+token_cache = LRUTTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+
+class InvalidToken(Exception):
+    """Raised when an access token is malformed, forged or expired."""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(signing_input: str) -> str:
+    digest = hmac.new(_secret, signing_input.encode(), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+# ======== ACCESS TOKENS =========
+def issue_access_token(user_id: int, username: str) -> tuple[str, int]:
+    """
+    Sign a short-lived access token (HS256 JWT).
+
+    Args:
+        user_id (int): The user's ID, the `sub` claim.
+        username (str): The user's username, the `name` claim.
+
+    Returns:
+        tuple[str, int]: The token and its lifetime in seconds.
+    """
+    now = int(time.time())
+    claims = {
+        "sub": str(user_id),
+        "name": username,
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_TTL,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{_HEADER}.{payload}"
+    return f"{signing_input}.{_sign(signing_input)}", ACCESS_TOKEN_TTL
+
+
+def verify_access_token(token: str) -> dict:
+    """
+    Check an access token and return its claims.
+
+    A token seen before is answered from token_cache, so repeated calls
+    only cost a dict lookup and an expiry check.
+
+    Args:
+        token (str): The bearer token.
+
+    Returns:
+        dict: The claims (sub, name, iat, exp).
+
+    Raises:
+        InvalidToken: If the token is malformed, badly signed or expired.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        header, _, rest = token.partition(".")
+        payload, _, signature = rest.partition(".")
+        if header != _HEADER or not payload or not signature:
+            raise InvalidToken("Malformed token")
+        if not hmac.compare_digest(signature, _sign(f"{header}.{payload}")):
+            raise InvalidToken("Bad signature")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError as e:
+            raise InvalidToken("Malformed token") from e
+        token_cache.set(token, claims)
+    if claims["exp"] <= time.time():
+        token_cache.delete(token)
+        raise InvalidToken("Token expired")
+    return claims
+
+
+# ======== ADMIN TOKEN =========
+def is_admin_token(token: str) -> bool:
+    """
+    Check a bearer token against ADMIN_TOKEN, in constant time.
+
+    Args:
+        token (str): The bearer token.
+
+    Returns:
+        bool: True if it is the admin token (never when none is configured).
+    """
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(
+        token.encode(), ADMIN_TOKEN.encode()
+    )
+
+
+# ======== REFRESH TOKENS =========
+def new_refresh_token() -> tuple[str, str]:
+    """
+    Random opaque refresh token.
+
+    Returns:
+        tuple[str, str]: The token for the client and the hash to store.
+    """
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Digest stored in place of a refresh token, so a leaked table is useless.
+
+    Args:
+        token (str): The refresh token.
+
+    Returns:
+        str: Its SHA-256 hex digest.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+from .config import WRITE_BATCH_MAX
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+
+async def _execute(conn, stmt):
+    result = await conn.execute(stmt)
+    return result.all() if result.returns_rows else result.rowcount
+
+
+class WriteLane:
+    """
+    Single task running queued write statements with group commit.
+
+    Every statement queued while the previous batch was committing goes into
+    the next transaction, so N concurrent small writes cost one commit
+    instead of N, and never compete for SQLite's write lock. If a statement
+    fails, the batch is rolled back and replayed one statement per
+    transaction so only that statement reports the error.
+
+    Do not await the lane while a session holds uncommitted writes: the
+    lane needs the same (single) writer connection.
+    """
+
+    def __init__(self, max_batch: int = WRITE_BATCH_MAX):
+        self.max_batch = max_batch
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.statements = 0
+
+    async def start(self):
+        """Start the writer task."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Stop the writer task, statements still queued are failed."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        queue, self._queue, self._task = self._queue, None, None
+        while queue is not None and not queue.empty():
+            _, future = queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("write lane stopped"))
+
+    async def execute(self, stmt):
+        """
+        Run a write statement in the next group commit.
+
+        Without a running lane (other backends, scripts) the statement runs
+        in its own transaction.
+
+        Args:
+            stmt: INSERT/UPDATE/DELETE statement, RETURNING is supported.
+
+        Returns:
+            The RETURNING rows as a list, otherwise the affected row count.
+        """
+        if self._queue is None:
+            async with engine.begin() as conn:
+                return await _execute(conn, stmt)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((stmt, future))
+        return await future
+
+    async def _writer(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit(batch)
+            except Exception:
+                await self._replay(batch)
+            self.batches += 1
+            self.statements += len(batch)
+
+    async def _commit(self, batch):
+        async with engine.begin() as conn:
+            results = [await _execute(conn, stmt) for stmt, _ in batch]
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _replay(self, batch):
+        # slow path: one transaction per statement to isolate the failure
+        for stmt, future in batch:
+            try:
+                async with engine.begin() as conn:
+                    result = await _execute(conn, stmt)
+            except Exception as exc:
+                logger.debug("write lane statement failed: %s", exc)
+                if not future.done():
+                    future.set_exception(exc)
+                continue
+            if not future.done():
+                future.set_result(result)
+
+
+# shared lane for the whole app, only started for the SQLite production profile
+write_lane = WriteLane()
@@ -0,0 +1,166 @@
+"""
+Requests/sec of the sync (threadpool) vs async (AsyncSession) users routes.
+
+Starts each app under uvicorn against the same temporary SQLite database and
+drives it with N concurrent HTTP clients.
+
+Usage:
+    uv run python -m benchmarks.bench_async_db --clients 50 200 1000 --seconds 10
+    uv run python -m benchmarks.bench_async_db --workload write
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+APPS = {
+    "sync": "benchmarks.sync_app:app",
+    "async": "app.main:app",
+}
+USERS = 100
+
+# the servers and the benchmark sign access tokens with the same key
+os.environ.setdefault("TOKEN_SECRET", "benchmark-secret")
+
+
+def seed(db_path: str, tmp_dir: str):
+    """Create the schema and USERS users, each with a small uploaded file."""
+    from app import models
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    file_path = os.path.join(tmp_dir, "Limerick.txt")
+    with open("tests/Limerick.txt", "rb") as src, open(file_path, "wb") as dst:
+        dst.write(src.read())
+    rows = [
+        {
+            "username": f"bench_{i}",
+            "email": f"bench_{i}@example.com",
+            "hashed_password": "not-a-real-hash",
+            "file_path": file_path,
+            "original_filename": "Limerick.txt",
+            "file_word_count": 32,
+        }
+        for i in range(USERS)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), rows)
+    engine.dispose()
+
+
+def auth_headers(index: int) -> dict:
+    """Authorization header of the seeded user bench_{index} (ID index + 1)."""
+    from app import tokens
+
+    token, _ = tokens.issue_access_token(index + 1, f"bench_{index}")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def start_server(target: str, port: int, env: dict, cwd: str = None):
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            target,
+            "--port",
+            str(port),
+            "--no-access-log",
+        ],
+        env=env,
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # wait until the server accepts connections
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/users/bench_0/file", timeout=1)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"{target} did not start")
+
+
+async def drive(base_url: str, clients: int, seconds: float, workload: str):
+    done = errors = 0
+    headers = [auth_headers(i) for i in range(USERS)]
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            nonlocal done, errors
+            while time.perf_counter() < deadline:
+                index = random.randrange(USERS)
+                username = f"bench_{index}"
+                try:
+                    if workload == "read":
+                        response = await client.get(f"/users/{username}/file")
+                    else:
+                        response = await client.patch(
+                            f"/users/{username}",
+                            json={"address": f"{random.random()}"},
+                            headers=headers[index],
+                        )
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    done += 1
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return done / seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workload", choices=["read", "write"], default="read")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_async_db_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    os.environ.update(env)
+    seed(db_path, tmp_dir)
+
+    print(f"workload={args.workload} seconds={args.seconds}")
+    print(f"{'path':<6} {'clients':>8} {'req/s':>10} {'errors':>8}")
+    for name, target in APPS.items():
+        proc = start_server(target, args.port, env)
+        try:
+            for clients in args.clients:
+                rps, errors = asyncio.run(
+                    drive(
+                        f"http://127.0.0.1:{args.port}",
+                        clients,
+                        args.seconds,
+                        args.workload,
+                    )
+                )
+                print(f"{name:<6} {clients:>8} {rps:>10.1f} {errors:>8}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Latency of authenticated calls: password on every call vs access tokens.
+
+"basic" sends the username/password with each request (HTTP Basic), so every
+call pays an Argon2 verify, as when the frontend re-sent credentials.
+"bearer" sends the access token returned by login, checked with an HMAC and
+then served from the token cache; "bearer-nocache" is the same with the
+cache disabled. Each scheme runs the app under uvicorn against the same
+temporary database and drives PATCH /users/{username} with N clients.
+
+Usage:
+    uv run python -m benchmarks.bench_auth --clients 1 16 64 --seconds 10
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from .bench_async_db import start_server
+
+USERS = 20
+PASSWORD = "bench-password"
+SCHEMES = {
+    "basic": {},
+    "bearer-nocache": {"TOKEN_CACHE_SIZE": "0"},
+    "bearer": {},
+}
+
+
+def signup(base_url: str) -> dict:
+    """Create the benchmark users, returning their access tokens."""
+    access_tokens = {}
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for i in range(USERS):
+            username = f"bench_{i}"
+            response = client.post(
+                "/users/",
+                json={
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "password": PASSWORD,
+                },
+            )
+            response.raise_for_status()
+            access_tokens[username] = response.json()["access_token"]
+    return access_tokens
+
+
+def headers_for(scheme: str, access_tokens: dict) -> dict:
+    headers = {}
+    for username, token in access_tokens.items():
+        if scheme == "basic":
+            basic = base64.b64encode(f"{username}:{PASSWORD}".encode()).decode()
+            headers[username] = {"Authorization": f"Basic {basic}"}
+        else:
+            headers[username] = {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+async def drive(base_url: str, headers: dict, clients: int, seconds: float):
+    latencies = []
+    errors = 0
+    usernames = list(headers)
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                username = random.choice(usernames)
+                started = time.perf_counter()
+                try:
+                    response = await client.patch(
+                        f"/users/{username}",
+                        json={"address": f"{random.random()}"},
+                        headers=headers[username],
+                    )
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    # 503 when the hashing pool sheds, back off like Retry-After
+                    errors += 1
+                    await asyncio.sleep(0.05)
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return latencies, errors
+
+
+def percentile(values: list, q: float) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_auth_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    base_url = f"http://127.0.0.1:{args.port}"
+    base_env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        # tokens from the signup server must verify on the next ones
+        TOKEN_SECRET=os.environ.get("TOKEN_SECRET", "benchmark-secret"),
+    )
+    access_tokens = None
+
+    print(f"seconds={args.seconds} users={USERS}")
+    print(
+        f"{'scheme':<15} {'clients':>8} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>8}"
+    )
+    for scheme, overrides in SCHEMES.items():
+        proc = start_server("app.main:app", args.port, dict(base_env, **overrides))
+        try:
+            if access_tokens is None:
+                access_tokens = signup(base_url)
+            headers = headers_for(scheme, access_tokens)
+            for clients in args.clients:
+                latencies, errors = asyncio.run(
+                    drive(base_url, headers, clients, args.seconds)
+                )
+                print(
+                    f"{scheme:<15} {clients:>8} {len(latencies) / args.seconds:>10.1f} "
+                    f"{percentile(latencies, 50) * 1000:>8.2f} "
+                    f"{percentile(latencies, 95) * 1000:>8.2f} "
+                    f"{percentile(latencies, 99) * 1000:>8.2f} {errors:>8}"
+                )
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
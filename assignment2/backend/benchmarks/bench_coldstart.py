@@ -0,0 +1,178 @@
+"""
+Cold start of a worker: import-time report and time-to-first-response.
+
+First prints where `import app.main` spends its time (python -X importtime),
+by top-level package and for the app's own modules. Then starts fresh
+uvicorn workers against an already migrated SQLite database and measures,
+for each startup mode, the time until the first response (GET /) and the
+latency of the first login and first listing the new worker serves:
+
+    migrate-on-start   MIGRATE_ON_STARTUP=true  WARMUP_ON_STARTUP=false
+    migrated           MIGRATE_ON_STARTUP=false WARMUP_ON_STARTUP=false
+    migrated+warmup    MIGRATE_ON_STARTUP=false WARMUP_ON_STARTUP=true
+
+Usage:
+    uv run python -m benchmarks.bench_coldstart --runs 5
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+MODES = {
+    "migrate-on-start": {"MIGRATE_ON_STARTUP": "true", "WARMUP_ON_STARTUP": "false"},
+    "migrated": {"MIGRATE_ON_STARTUP": "false", "WARMUP_ON_STARTUP": "false"},
+    "migrated+warmup": {"MIGRATE_ON_STARTUP": "false", "WARMUP_ON_STARTUP": "true"},
+}
+USERNAME = "bench_user"
+PASSWORD = "bench-password"
+
+
+def import_report(env: dict, top: int):
+    """Print the import time of app.main by package and by app module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    by_package = defaultdict(int)
+    app_modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # column header
+        module = name.strip()
+        if not name.startswith("  "):
+            # top-level import, nested ones are indented further
+            total += int(cumulative_us)
+        by_package[module.split(".")[0]] += int(self_us)
+        if module.split(".")[0] == "app":
+            app_modules.append((int(cumulative_us), int(self_us), module))
+
+    print(f"import app.main: {total / 1000:.0f} ms")
+    print(f"\n{'package':<24} {'self ms':>8}")
+    for package, self_us in sorted(by_package.items(), key=lambda x: -x[1])[:top]:
+        print(f"{package:<24} {self_us / 1000:>8.1f}")
+    print(f"\n{'app module':<24} {'cumul ms':>8} {'self ms':>8}")
+    for cumulative_us, self_us, module in sorted(app_modules, reverse=True):
+        print(f"{module:<24} {cumulative_us / 1000:>8.1f} {self_us / 1000:>8.1f}")
+
+
+def seed(env: dict, db_path: str):
+    """Run the migration step, then add the login user."""
+    from pwdlib import PasswordHash
+    from sqlalchemy import create_engine, text
+
+    subprocess.run([sys.executable, "-m", "app.migrate"], env=env, check=True)
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO users (username, email, hashed_password) "
+                "VALUES (:username, :email, :hashed_password)"
+            ),
+            {
+                "username": USERNAME,
+                "email": f"{USERNAME}@example.com",
+                "hashed_password": PasswordHash.recommended().hash(PASSWORD),
+            },
+        )
+    engine.dispose()
+
+
+def cold_start(env: dict, port: int) -> tuple[float, float, float]:
+    """Start a worker and time its first responses, in seconds."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                httpx.get(f"{base_url}/", timeout=5)
+                break
+            except httpx.TransportError:
+                if proc.poll() is not None:
+                    raise RuntimeError("worker exited during startup")
+                time.sleep(0.005)
+        ready = time.perf_counter() - started
+
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            before = time.perf_counter()
+            client.post(
+                "/users/login", json={"username": USERNAME, "password": PASSWORD}
+            ).raise_for_status()
+            login = time.perf_counter() - before
+
+            before = time.perf_counter()
+            client.get(
+                "/users/",
+                params={"limit": 20},
+                headers={"Authorization": f"Bearer {env['ADMIN_TOKEN']}"},
+            ).raise_for_status()
+            listing = time.perf_counter() - before
+    finally:
+        proc.terminate()
+        proc.wait()
+    return ready, login, listing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_coldstart_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        TOKEN_SECRET=os.environ.get("TOKEN_SECRET", "benchmark-secret"),
+        ADMIN_TOKEN=os.environ.get("ADMIN_TOKEN", "benchmark-admin"),
+    )
+    try:
+        import_report(env, args.top)
+        seed(env, db_path)
+
+        print(f"\nmedian of {args.runs} runs")
+        print(
+            f"{'mode':<18} {'first response ms':>18} {'first login ms':>15} "
+            f"{'first list ms':>14} {'until login ms':>15}"
+        )
+        for mode, overrides in MODES.items():
+            runs = [
+                cold_start(dict(env, **overrides), args.port) for _ in range(args.runs)
+            ]
+            ready, login, listing = (
+                statistics.median(values) * 1000 for values in zip(*runs)
+            )
+            until_login = statistics.median(r + lg for r, lg, _ in runs) * 1000
+            print(
+                f"{mode:<18} {ready:>18.0f} {login:>15.1f} {listing:>14.1f} "
+                f"{until_login:>15.0f}"
+            )
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Page latency of GET /users/ (crud.list_users) as the users table grows.
+
+Grows one temporary SQLite database through each size and times the first
+page, a page deep into the table, and a deep page of a last name prefix
+search, all with keyset cursors. The OFFSET column is the same deep page
+read with LIMIT/OFFSET, for comparison.
+
+Usage:
+    uv run python -m benchmarks.bench_listing --rows 10000 100000 1000000 10000000
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+LAST_NAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson"]
+SEED_BATCH = 50_000
+
+
+def seed(engine, start: int, stop: int):
+    """Insert users start..stop-1, last names cycle through LAST_NAMES."""
+    from app import models
+
+    for low in range(start, stop, SEED_BATCH):
+        rows = [
+            {
+                "id": i + 1,
+                "username": f"user{i:09d}",
+                "email": f"user{i:09d}@example.com",
+                "hashed_password": "not-a-real-hash",
+                "last_name": LAST_NAMES[i % len(LAST_NAMES)],
+            }
+            for i in range(low, min(low + SEED_BATCH, stop))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(models.User), rows)
+
+
+async def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def measure(db_url: str, rows: int, limit: int, repeat: int):
+    from app import crud, models
+
+    engine = create_async_engine(db_url)
+    fields = ["id", "username", "email"]
+    # last Smith in the table, minus two pages
+    deep_smith = rows - (rows - 1) % len(LAST_NAMES) - 2 * limit * len(LAST_NAMES)
+    deep_smith = max(deep_smith, 1)
+    deep_id = max(rows - 2 * limit, 0)
+
+    async with AsyncSession(engine) as db:
+
+        async def first_page():
+            await crud.list_users(db, fields, limit)
+
+        async def deep_page():
+            cursor = crud.encode_cursor("id", [deep_id])
+            await crud.list_users(db, fields, limit, cursor=cursor)
+
+        async def deep_search():
+            cursor = crud.encode_cursor("last_name", ["Smith", deep_smith])
+            await crud.list_users(
+                db, fields, limit, cursor=cursor, prefix="Sm", search_by="last_name"
+            )
+
+        async def offset_page():
+            columns = [getattr(models.User, field) for field in fields]
+            stmt = select(*columns).order_by(models.User.id)
+            await db.execute(stmt.offset(deep_id).limit(limit))
+
+        results = [
+            await median_ms(fn, repeat)
+            for fn in (first_page, deep_page, deep_search, offset_page)
+        ]
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from app import models  # noqa: F401 (registers the tables)
+    from app.database import init_schema
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_listing_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        init_schema(conn)
+
+    print(f"limit={args.limit} median of {args.repeat} (ms)")
+    print(f"{'rows':>10} {'first':>8} {'deep':>8} {'search':>8} {'OFFSET':>8}")
+    seeded = 0
+    try:
+        for rows in sorted(args.rows):
+            seed(engine, seeded, rows)
+            seeded = rows
+            first, deep, search, offset = asyncio.run(
+                measure(f"sqlite+aiosqlite:///{db_path}", rows, args.limit, args.repeat)
+            )
+            print(
+                f"{rows:>10} {first:>8.2f} {deep:>8.2f} {search:>8.2f} {offset:>8.2f}"
+            )
+    finally:
+        engine.dispose()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Login throughput benchmark: inline Argon2 vs the hashing worker pool.
+
+Usage:
+    uv run python -m benchmarks.bench_login --clients 32 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# point the app at a throwaway database before it is imported
+_tmp_dir = tempfile.mkdtemp(prefix="bench_login_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp_dir}/bench.db"
+
+from pwdlib import PasswordHash
+
+from app import crud, schemas
+from app.database import Base, SessionLocal, engine
+from app.hashing import HashingOverloaded, password_hasher
+
+USERNAME = "bench_user"
+PASSWORD = "bench-password"
+inline_hash = PasswordHash.recommended()
+
+
+async def login_inline():
+    """Old code path: verify inline on a request thread (sync route)."""
+    async with SessionLocal() as db:
+        user = await crud.get_user_by_username(db, USERNAME)
+    return await asyncio.to_thread(inline_hash.verify, PASSWORD, user.hashed_password)
+
+
+async def login_pool():
+    """New code path: crud.authenticate_user verifies in the worker pool."""
+    async with SessionLocal() as db:
+        return await crud.authenticate_user(db, USERNAME, PASSWORD)
+
+
+async def run(name: str, login, clients: int, seconds: float):
+    latencies = []
+    shed = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal shed
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await login()
+            except HashingOverloaded:
+                # back off like a client honouring Retry-After
+                shed += 1
+                await asyncio.sleep(0.05)
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+
+    cores = os.cpu_count() or 1
+    throughput = len(latencies) / seconds
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(
+        f"{name:<8} logins/s={throughput:8.1f}  per core={throughput / cores:6.1f}  "
+        f"p50={statistics.median(latencies or [0]) * 1000:7.1f}ms  "
+        f"p95={p95 * 1000:7.1f}ms  shed={shed}"
+    )
+
+
+async def main(clients: int, seconds: float):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        await crud.create_user(
+            db,
+            schemas.UserCreate(
+                username=USERNAME, email="bench@example.com", password=PASSWORD
+            ),
+        )
+
+    print(f"cores={os.cpu_count()} clients={clients} seconds={seconds}")
+    await run("inline", login_inline, clients, seconds)
+    await run("pool", login_pool, clients, seconds)
+    print(password_hasher.stats())
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.seconds))
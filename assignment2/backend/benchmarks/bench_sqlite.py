@@ -0,0 +1,124 @@
+"""
+Concurrent read/write throughput of the SQLite profiles (SQLITE_PROFILE).
+
+"default" is stock SQLite (rollback journal, one shared pool), "production"
+is WAL + pragmas, a read-only reader pool and the group-committing write
+lane. Each profile runs the app under uvicorn against a fresh copy of the
+same database; clients mix prefix searches (GET /users/) and profile updates
+(PATCH /users/{username}).
+
+Usage:
+    uv run python -m benchmarks.bench_sqlite --clients 50 200 --write-ratio 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from .bench_async_db import USERS, auth_headers, seed, start_server
+
+PROFILES = ["default", "production"]
+# GET /users/ needs the admin token, the servers inherit it from os.environ
+os.environ.setdefault("ADMIN_TOKEN", "benchmark-admin")
+ADMIN_HEADERS = {"Authorization": f"Bearer {os.environ['ADMIN_TOKEN']}"}
+
+
+async def drive(base_url: str, clients: int, seconds: float, write_ratio: float):
+    reads = writes = errors = 0
+    headers = [auth_headers(i) for i in range(USERS)]
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker():
+            nonlocal reads, writes, errors
+            while time.perf_counter() < deadline:
+                write = random.random() < write_ratio
+                try:
+                    if write:
+                        index = random.randrange(USERS)
+                        response = await client.patch(
+                            f"/users/bench_{index}",
+                            json={"address": f"{random.random()}"},
+                            headers=headers[index],
+                        )
+                    else:
+                        response = await client.get(
+                            "/users/",
+                            params={"q": f"bench_{random.randrange(10)}", "limit": 20},
+                            headers=ADMIN_HEADERS,
+                        )
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                if response.status_code != 200:
+                    errors += 1
+                elif write:
+                    writes += 1
+                else:
+                    reads += 1
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return reads / seconds, writes / seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    seed_path = os.path.join(tmp_dir, "seed.db")
+    seed(seed_path, tmp_dir)
+
+    print(f"write_ratio={args.write_ratio} seconds={args.seconds}")
+    print(
+        f"{'profile':<11} {'clients':>8} {'reads/s':>10} {'writes/s':>10} {'errors':>8}"
+    )
+    try:
+        for profile in PROFILES:
+            db_path = os.path.join(tmp_dir, f"{profile}.db")
+            shutil.copy(seed_path, db_path)
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{db_path}",
+                SQLITE_PROFILE=profile,
+                # every request must reach the database
+                USER_CACHE_SIZE="0",
+            )
+            proc = start_server("app.main:app", args.port, env)
+            try:
+                for clients in args.clients:
+                    rps, wps, errors = asyncio.run(
+                        drive(
+                            f"http://127.0.0.1:{args.port}",
+                            clients,
+                            args.seconds,
+                            args.write_ratio,
+                        )
+                    )
+                    print(
+                        f"{profile:<11} {clients:>8} {rps:>10.1f} {wps:>10.1f} "
+                        f"{errors:>8}"
+                    )
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Peak memory of saving + word counting an upload: old two-pass path vs streaming.
+
+Each mode runs in its own process so peak RSS is measured in isolation.
+
+Usage:
+    uv run python -m benchmarks.bench_upload --size-mb 1024
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+LINE = b"There was an Old Man with a beard, who said it is just as I feared\n"
+
+
+def make_file(path: str, size_mb: int):
+    """Write a text file of about size_mb MiB."""
+    block = LINE * (1024 * 1024 // len(LINE))
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def old_path(src: str, dest: str) -> int:
+    """Pre-streaming upload: copyfileobj, then read it all back and split."""
+    with open(src, "rb") as upload, open(dest, "wb") as buffer:
+        shutil.copyfileobj(upload, buffer)
+    with open(dest, "r") as f:
+        content = f.read()
+        return len(content.split())
+
+
+def stream_path(src: str, dest: str) -> int:
+    """storage.save_upload + analytics.analyze_file: chunked write, then a
+    streaming stats pass (as done by the analyze_file job)."""
+    from starlette.datastructures import UploadFile
+
+    from app import analytics, storage
+
+    async def run():
+        storage.ensure_dirs()
+        with open(src, "rb") as upload:
+            saved = await storage.save_upload(
+                UploadFile(upload, filename="bench.txt"), max_bytes=1 << 62
+            )
+        try:
+            stats = await analytics.analyze_file(saved.temp_path)
+        finally:
+            storage.discard(saved)
+        return stats["word_count"]
+
+    return asyncio.run(run())
+
+
+def run_mode(mode: str, src: str):
+    dest = src + f".{mode}.out"
+    started = time.perf_counter()
+    words = old_path(src, dest) if mode == "old" else stream_path(src, dest)
+    elapsed = time.perf_counter() - started
+    # only the old path writes to dest, save_upload uses its own temp file
+    if os.path.exists(dest):
+        os.remove(dest)
+    # ru_maxrss is in KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<7} words={words}  time={elapsed:6.2f}s  peak_rss={peak_mb:8.1f}MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--mode", choices=["old", "stream"])
+    parser.add_argument("--file")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.file)
+        sys.exit(0)
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_upload_")
+    src = os.path.join(tmp_dir, "upload.txt")
+    make_file(src, args.size_mb)
+    print(f"file={args.size_mb}MiB")
+    try:
+        for mode in ("old", "stream"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_upload"]
+                + ["--mode", mode, "--file", src],
+                check=True,
+            )
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,363 @@
+"""
+Load test of the users API with a regression check against a baseline.
+
+Starts the app under uvicorn in a temporary folder (fresh SQLite database
+and uploads), then N clients run a weighted mix of signup, login, PATCH,
+upload, download and user delete, each on users it signed up itself. For
+every workload and concurrency level, throughput and p50/p95/p99 latency
+per operation are written to a JSON file.
+
+With --baseline the results are compared to an earlier results file: the
+run fails (exit code 1) when the throughput of an operation drops, or its
+p50/p95 latency grows, by more than --tolerance.
+
+Usage:
+    uv run python -m benchmarks.loadtest --clients 10 50 --seconds 20
+    uv run python -m benchmarks.loadtest --workload mixed write -o results.json
+    uv run python -m benchmarks.loadtest --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .bench_async_db import start_server
+
+# relative weight of each operation per workload
+WORKLOADS = {
+    "mixed": {
+        "signup": 5,
+        "login": 10,
+        "patch": 30,
+        "upload": 10,
+        "download": 35,
+        "delete": 5,
+    },
+    "read": {"login": 5, "patch": 15, "download": 80},
+    "write": {"signup": 10, "patch": 50, "upload": 30, "delete": 10},
+    "auth": {"signup": 30, "login": 70},
+}
+PASSWORD = "loadtest-password"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# half of the uploads share this content (dedupe path), the others are unique
+SHARED_TEXT = "There once was a canner exceedingly canny\n" * 64
+# operations with fewer samples (in either run) are too noisy to compare
+MIN_SAMPLES = 20
+WORDS = ["load", "test", "users", "api", "blob", "word", "count", "latency"]
+
+
+class Client:
+    """One simulated user session, acting on the users it signed up."""
+
+    def __init__(self, http: httpx.AsyncClient, name: str):
+        self.http = http
+        self.name = name
+        self.counter = itertools.count()
+        self.users = {}  # username -> {"token": ..., "has_file": bool}
+
+    def _headers(self, username: str) -> dict:
+        return {"Authorization": f"Bearer {self.users[username]['token']}"}
+
+    def _pick(self, with_file: bool = False):
+        usernames = [
+            u for u, state in self.users.items() if state["has_file"] or not with_file
+        ]
+        return random.choice(usernames) if usernames else None
+
+    async def signup(self):
+        username = f"{self.name}_{next(self.counter)}"
+        response = await self.http.post(
+            "/users/",
+            json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": PASSWORD,
+            },
+        )
+        if response.status_code == 200:
+            token = response.json()["access_token"]
+            self.users[username] = {"token": token, "has_file": False}
+        return response
+
+    async def login(self):
+        username = self._pick()
+        response = await self.http.post(
+            "/users/login", json={"username": username, "password": PASSWORD}
+        )
+        if response.status_code == 200:
+            self.users[username]["token"] = response.json()["access_token"]
+        return response
+
+    async def patch(self):
+        username = self._pick()
+        return await self.http.patch(
+            f"/users/{username}",
+            json={"address": f"{random.randrange(1000)} Load Street"},
+            headers=self._headers(username),
+        )
+
+    async def upload(self):
+        username = self._pick()
+        if random.random() < 0.5:
+            text = SHARED_TEXT
+        else:
+            text = " ".join(random.choices(WORDS, k=512))
+        response = await self.http.post(
+            f"/users/{username}/file",
+            files={"file": ("loadtest.txt", text.encode(), "text/plain")},
+            headers=self._headers(username),
+        )
+        if response.status_code == 200:
+            self.users[username]["has_file"] = True
+        return response
+
+    async def download(self):
+        username = self._pick(with_file=True)
+        if username is None:
+            return None
+        return await self.http.get(
+            f"/users/{username}/file", headers={"Accept-Encoding": "gzip"}
+        )
+
+    async def delete(self):
+        if len(self.users) < 2:
+            return None
+        username = self._pick()
+        response = await self.http.delete(
+            f"/users/{username}", headers=self._headers(username)
+        )
+        if response.status_code == 200:
+            del self.users[username]
+        return response
+
+
+def summarize(latencies: list, errors: dict, seconds: float) -> dict:
+    ordered = sorted(latencies)
+    cuts = statistics.quantiles(ordered, n=100) if len(ordered) > 1 else [0.0] * 99
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / seconds, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+async def run_workload(
+    base_url: str, workload: str, clients: int, seconds: float, warmup: float
+):
+    weights = WORKLOADS[workload]
+    ops, op_weights = list(weights), list(weights.values())
+    latencies = {op: [] for op in ops}
+    errors = {op: {} for op in ops}
+    run_id = f"{workload}{clients}x{random.randrange(1 << 30):x}"
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        sessions = [Client(http, f"{run_id}_{i}") for i in range(clients)]
+        # every client needs a user (with a file, to download) before the mix
+        await asyncio.gather(*(session.signup() for session in sessions))
+        if "download" in weights:
+            await asyncio.gather(
+                *(session.upload() for session in sessions if session.users)
+            )
+
+        started = time.perf_counter()
+        measure_from = started + warmup
+        deadline = measure_from + seconds
+
+        async def worker(session: Client):
+            while time.perf_counter() < deadline:
+                if not session.users:
+                    # the initial signup failed (e.g. shed), retry it unrecorded
+                    await session.signup()
+                    continue
+                op = random.choices(ops, op_weights)[0]
+                before = time.perf_counter()
+                try:
+                    response = await getattr(session, op)()
+                except httpx.TransportError:
+                    status = "transport"
+                else:
+                    if response is None:
+                        continue  # nothing to act on yet (no file, last user)
+                    status = response.status_code
+                elapsed = time.perf_counter() - before
+                if status == 503:
+                    # shed by the hashing pool, back off like Retry-After
+                    await asyncio.sleep(0.05)
+                if before < measure_from:
+                    continue
+                if status == 200:
+                    latencies[op].append(elapsed)
+                else:
+                    key = str(status)
+                    errors[op][key] = errors[op].get(key, 0) + 1
+
+        await asyncio.gather(*(worker(session) for session in sessions))
+
+    total = [latency for values in latencies.values() for latency in values]
+    total_errors = {}
+    for op_errors in errors.values():
+        for key, count in op_errors.items():
+            total_errors[key] = total_errors.get(key, 0) + count
+    return {
+        "workload": workload,
+        "clients": clients,
+        "seconds": seconds,
+        "total": summarize(total, total_errors, seconds),
+        "ops": {op: summarize(latencies[op], errors[op], seconds) for op in ops},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Regressions of `results` against `baseline`, matched by workload and
+    clients; runs missing from either side and operations with fewer than
+    MIN_SAMPLES requests are skipped.
+    """
+    regressions = []
+    base_runs = {(r["workload"], r["clients"]): r for r in baseline["runs"]}
+    for run in results["runs"]:
+        base = base_runs.get((run["workload"], run["clients"]))
+        if base is None:
+            continue
+        for op, stats in {"total": run["total"], **run["ops"]}.items():
+            base_stats = base["ops"].get(op) if op != "total" else base["total"]
+            if not base_stats or min(stats["count"], base_stats["count"]) < MIN_SAMPLES:
+                continue
+            label = f"{run['workload']}/{run['clients']} {op}"
+            if stats["throughput"] < base_stats["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{label}: throughput {stats['throughput']}/s "
+                    f"< baseline {base_stats['throughput']}/s"
+                )
+            for key in ("p50_ms", "p95_ms"):
+                if stats[key] > base_stats[key] * (1 + tolerance):
+                    regressions.append(
+                        f"{label}: {key} {stats[key]} > baseline {base_stats[key]}"
+                    )
+    return regressions
+
+
+def print_run(run: dict):
+    print(f"\nworkload={run['workload']} clients={run['clients']}")
+    print(
+        f"{'op':<9} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8}  errors"
+    )
+    for op, stats in {**run["ops"], "total": run["total"]}.items():
+        print(
+            f"{op:<9} {stats['count']:>7} {stats['throughput']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+            f"{stats['p99_ms']:>8.2f}  {stats['errors'] or ''}"
+        )
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--workload", nargs="+", choices=list(WORKLOADS), default=["mixed"]
+    )
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("-o", "--output", default="loadtest-results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed throughput drop / latency growth (0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="loadtest_")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'loadtest.db')}",
+        TOKEN_SECRET=os.environ.get("TOKEN_SECRET", "loadtest-secret"),
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])
+        ),
+    )
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "runs": [],
+    }
+
+    # the server runs from the temp folder so data/ and uploads/ land there
+    proc = start_server("app.main:app", args.port, env, cwd=tmp_dir)
+    try:
+        for workload in args.workload:
+            for clients in args.clients:
+                run = asyncio.run(
+                    run_workload(
+                        f"http://127.0.0.1:{args.port}",
+                        workload,
+                        clients,
+                        args.seconds,
+                        args.warmup,
+                    )
+                )
+                print_run(run)
+                results["runs"].append(run)
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(tmp_dir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"no regression against {args.baseline} (tolerance {args.tolerance})")
+
+
+if __name__ == "__main__":
+    main()
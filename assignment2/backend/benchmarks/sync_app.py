@@ -0,0 +1,63 @@
+"""
+Baseline sync path for bench_async_db: plain `def` routes on a sync Session.
+
+Mirrors the pre-async users router so the two paths run the same queries.
+"""
+
+import os
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import models, schemas
+from app.database import to_async_url
+
+# same database as the async app, through the sync sqlite/psycopg driver
+_url = to_async_url(os.environ["DATABASE_URL"])
+_url = _url.set(drivername=_url.get_backend_name())
+engine = create_engine(_url, connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+app = FastAPI(title="User Info Store (sync baseline)")
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_user_by_username(db: Session, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
+
+@app.patch("/users/{username}", response_model=schemas.UserResponse)
+def update_user_info(
+    username: str, updates: schemas.UserUpdate, db: Session = Depends(get_db)
+):
+    db_user = get_user_by_username(db, username)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    for key, value in updates.model_dump(exclude_unset=True).items():
+        setattr(db_user, key, value)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+@app.get("/users/{username}/file")
+def download_file(username: str, db: Session = Depends(get_db)):
+    user = get_user_by_username(db, username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not user.file_path or not os.path.exists(user.file_path):
+        raise HTTPException(status_code=404, detail="No file found")
+    return FileResponse(
+        path=user.file_path,
+        filename=user.original_filename,
+        media_type="text/plain",
+    )
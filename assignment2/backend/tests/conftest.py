@@ -0,0 +1,53 @@
+"""
+Shared fixtures of the backend tests.
+
+The app reads its settings when it is imported, so the test database and
+keys are set here, before any test module imports it.
+
+Run:
+    uv run pytest
+"""
+
+import os
+import shutil
+import tempfile
+
+import httpx
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TMP_DIR = tempfile.mkdtemp(prefix="backend_tests_")
+
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TMP_DIR}/test.db"
+os.environ["TOKEN_SECRET"] = "test-secret"
+os.environ["ADMIN_TOKEN"] = "test-admin"
+os.environ["HASH_WORKERS"] = "1"
+os.environ["WARMUP_ON_STARTUP"] = "false"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def fixture_path():
+    """Path of a file in tests/ (Limerick.txt, test_file.txt)."""
+    return lambda name: os.path.join(TESTS_DIR, name)
+
+
+@pytest.fixture
+async def client():
+    """HTTP client of the app, with its startup and shutdown run around it."""
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as http:
+            yield http
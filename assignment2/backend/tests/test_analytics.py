@@ -0,0 +1,70 @@
+from collections import Counter
+
+import pytest
+
+from app.analytics import TextStats, analyze_file
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _stats_in_chunks(data: bytes, chunk_size: int) -> TextStats:
+    stats = TextStats()
+    for start in range(0, len(data), chunk_size):
+        stats.feed(data[start : start + chunk_size])
+    stats.close()
+    return stats
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 20])
+def test_any_chunking_counts_like_split(fixture_path, chunk_size):
+    data = _read(fixture_path("Limerick.txt"))
+    text = data.decode()
+    stats = _stats_in_chunks(data, chunk_size)
+    assert stats.word_count == len(text.split())
+    assert stats.words == Counter(text.split())
+    assert stats.chars == Counter(text)
+
+
+def test_word_cut_by_a_chunk_is_counted_once():
+    stats = TextStats()
+    for chunk in (b"hel", b"lo wor", b"ld"):
+        stats.feed(chunk)
+    stats.close()
+    assert stats.word_count == 2
+    assert stats.words == Counter({"hello": 1, "world": 1})
+
+
+def test_multibyte_character_cut_by_a_chunk():
+    text = "naïve café — déjà vu"
+    stats = _stats_in_chunks(text.encode(), 1)
+    assert stats.words == Counter(text.split())
+    assert stats.chars == Counter(text)
+
+
+def test_whitespace_at_a_boundary_ends_the_word():
+    stats = TextStats()
+    for chunk in (b"one ", b"two\n", b"three"):
+        stats.feed(chunk)
+    stats.close()
+    assert stats.word_count == 3
+
+
+@pytest.mark.anyio
+async def test_analyze_file_reports_progress(fixture_path):
+    path = fixture_path("test_file.txt")
+    text = _read(path).decode()
+    progress = []
+
+    async def on_progress(fraction):
+        progress.append(fraction)
+
+    result = await analyze_file(path, top_n=3, chunk_size=16, on_progress=on_progress)
+    assert result["word_count"] == len(text.split())
+    assert result["top_words"] == [
+        [word, count] for word, count in Counter(text.split()).most_common(3)
+    ]
+    assert progress == sorted(progress)
+    assert progress[-1] == 1.0
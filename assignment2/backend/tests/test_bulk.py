@@ -0,0 +1,77 @@
+import pytest
+from pydantic import ValidationError
+
+from app import schemas
+from app.bulk import format_validation_error, iter_csv_rows, iter_ndjson_rows
+
+pytestmark = pytest.mark.anyio
+
+
+async def _stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _rows(parser, *chunks: bytes) -> list:
+    return [row async for row in parser(_stream(*chunks))]
+
+
+async def test_ndjson_rows_split_across_chunks():
+    body = '{"username": "zoë"}\r\n\n{"username": "bob"}'.encode()
+    # cut inside the "ë" and inside the second object
+    rows = await _rows(iter_ndjson_rows, body[:16], body[16:30], body[30:])
+    assert rows == [
+        (1, {"username": "zoë"}, None),
+        (2, {"username": "bob"}, None),
+    ]
+
+
+async def test_ndjson_errors_keep_their_row_number():
+    rows = await _rows(
+        iter_ndjson_rows, b'{"username": "a"}\n{broken\n[1, 2]\n{"username": "b"}\n'
+    )
+    assert [(number, error is None) for number, _, error in rows] == [
+        (1, True),
+        (2, False),
+        (3, False),
+        (4, True),
+    ]
+    assert rows[1][2].startswith("Invalid JSON")
+    assert rows[2][2] == "Expected a JSON object"
+
+
+async def test_csv_rows_with_empty_cells():
+    rows = await _rows(
+        iter_csv_rows, b"username,email,first_name\r\n", b"ann,ann@example.com,\r\n"
+    )
+    assert rows == [
+        (1, {"username": "ann", "email": "ann@example.com", "first_name": None}, None)
+    ]
+
+
+async def test_csv_quoted_cell_spanning_lines_and_chunks():
+    body = b'username,address\nann,"1 Main St\nFlat ""B"""\nbob,x\n'
+    rows = await _rows(iter_csv_rows, body[:30], body[30:])
+    assert rows == [
+        (1, {"username": "ann", "address": '1 Main St\nFlat "B"'}, None),
+        (2, {"username": "bob", "address": "x"}, None),
+    ]
+
+
+async def test_csv_errors():
+    rows = await _rows(
+        iter_csv_rows, b'username,email\nann\nbob,bob@example.com\ncid,"open\n'
+    )
+    assert rows == [
+        (1, None, "Expected 2 columns, got 1"),
+        (2, {"username": "bob", "email": "bob@example.com"}, None),
+        (3, None, "Unterminated quoted cell"),
+    ]
+
+
+def test_format_validation_error():
+    with pytest.raises(ValidationError) as caught:
+        schemas.UserCreate(username="ann", email="not-an-email", password="pw")
+    message = format_validation_error(caught.value)
+    assert message.startswith("email: ")
+    assert "\n" not in message
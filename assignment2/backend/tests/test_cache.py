@@ -0,0 +1,79 @@
+import pytest
+
+from app import cache
+from app.cache import LRUTTLCache
+
+
+class Clock:
+    """Stands in for time.monotonic, moved by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_entry_expires_after_ttl(clock):
+    lru = LRUTTLCache(maxsize=10, ttl=30)
+    lru.set("a", 1)
+    clock.now += 29.9
+    assert lru.get("a") == 1
+    clock.now += 0.1
+    assert lru.get("a") is None
+    assert lru.stats() | {"maxsize": None} == {
+        "size": 0,
+        "maxsize": None,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "expirations": 1,
+    }
+
+
+def test_set_again_restarts_the_ttl(clock):
+    lru = LRUTTLCache(maxsize=10, ttl=30)
+    lru.set("a", 1)
+    clock.now += 20
+    lru.set("a", 2)
+    clock.now += 20
+    assert lru.get("a") == 2
+
+
+def test_least_recently_used_is_evicted(clock):
+    lru = LRUTTLCache(maxsize=2, ttl=30)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    # reading "a" makes "b" the least recently used
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert lru.stats()["evictions"] == 1
+    assert lru.stats()["size"] == 2
+
+
+def test_zero_size_caches_nothing(clock):
+    lru = LRUTTLCache(maxsize=0, ttl=30)
+    lru.set("a", 1)
+    assert lru.get("a") is None
+    assert lru.stats()["size"] == 0
+
+
+def test_delete_and_clear(clock):
+    lru = LRUTTLCache(maxsize=10, ttl=30)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.delete("a", "missing")
+    assert lru.get("a") is None
+    assert lru.get("b") == 2
+    lru.clear()
+    assert lru.get("b") is None
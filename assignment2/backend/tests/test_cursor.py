@@ -0,0 +1,43 @@
+import pytest
+
+from app.crud import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize(
+    "key, values",
+    [
+        ("id", [42]),
+        ("username", ["alice", 7]),
+        ("email", ["a+b/c@example.com", 3]),
+        ("last_name", ["Ünal", 12]),
+    ],
+)
+def test_round_trip(key, values):
+    assert decode_cursor(encode_cursor(key, values), key) == values
+
+
+def test_url_safe_without_padding():
+    # ">>>" and "???" encode to "+" and "/" in standard base64
+    cursor = encode_cursor("username", [">>>???", 1])
+    assert not set(cursor) & set("+/=")
+
+
+def test_other_sort_key_is_rejected():
+    cursor = encode_cursor("username", ["alice", 7])
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, "email")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not a cursor!",
+        # base64 of "{}" and of '["id",1,2]' (one value too many)
+        "e30",
+        "WyJpZCIsMSwyXQ",
+    ],
+)
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, "id")
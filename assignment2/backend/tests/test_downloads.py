@@ -0,0 +1,50 @@
+import pytest
+
+from app.downloads import accepted_encodings, etag_matches
+
+ETAG = '"abc123"'
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        '"abc123"',
+        'W/"abc123"',
+        '"other", "abc123"',
+        ' "other" ,W/"abc123" ',
+        "*",
+    ],
+)
+def test_etag_matches(if_none_match):
+    assert etag_matches(if_none_match, ETAG)
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        '"other"',
+        # the quotes are part of the tag
+        "abc123",
+        '"abc123-gzip"',
+    ],
+)
+def test_etag_does_not_match(if_none_match):
+    assert not etag_matches(if_none_match, ETAG)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", {"gzip"}),
+        ("gzip, deflate, br", {"gzip", "deflate", "br"}),
+        ("br;q=1.0, gzip;q=0.5", {"br", "gzip"}),
+        ("GZIP", {"gzip"}),
+        # q=0 means "not acceptable"
+        ("br;q=0, gzip", {"gzip"}),
+        ("gzip; q=0.0", set()),
+        # a malformed weight is skipped, not fatal
+        ("br;q=high, gzip", {"gzip"}),
+    ],
+)
+def test_accepted_encodings(accept_encoding, expected):
+    assert accepted_encodings(accept_encoding) == expected
@@ -0,0 +1,77 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "first-password"
+
+
+async def _signup(client, username: str) -> dict:
+    response = await client.post(
+        "/users/",
+        json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": PASSWORD,
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+async def _refresh(client, refresh_token: str):
+    return await client.post("/users/refresh", json={"refresh_token": refresh_token})
+
+
+async def test_refresh_rotates_the_token(client):
+    first = await _signup(client, "rotate")
+    response = await _refresh(client, first["refresh_token"])
+    assert response.status_code == 200
+    second = response.json()
+    assert second["username"] == "rotate"
+    assert second["refresh_token"] != first["refresh_token"]
+    # the new access token is accepted by the user's routes
+    response = await client.patch(
+        "/users/rotate",
+        json={"address": "1 Main St"},
+        headers={"Authorization": f"Bearer {second['access_token']}"},
+    )
+    assert response.status_code == 200
+
+
+async def test_refresh_token_is_single_use(client):
+    first = await _signup(client, "reuse")
+    second = (await _refresh(client, first["refresh_token"])).json()
+    response = await _refresh(client, first["refresh_token"])
+    assert response.status_code == 401
+    # the replacement still works, once
+    assert (await _refresh(client, second["refresh_token"])).status_code == 200
+    assert (await _refresh(client, second["refresh_token"])).status_code == 401
+
+
+async def test_unknown_refresh_token(client):
+    assert (await _refresh(client, "not-a-token")).status_code == 401
+
+
+async def test_logout_revokes_the_refresh_token(client):
+    tokens = await _signup(client, "leaver")
+    response = await client.post(
+        "/users/logout", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+    assert (await _refresh(client, tokens["refresh_token"])).status_code == 401
+
+
+async def test_password_change_revokes_every_refresh_token(client):
+    first = await _signup(client, "changer")
+    login = await client.post(
+        "/users/login", json={"username": "changer", "password": PASSWORD}
+    )
+    second = login.json()
+    response = await client.patch(
+        "/users/changer",
+        json={"password": "second-password"},
+        headers={"Authorization": f"Bearer {second['access_token']}"},
+    )
+    assert response.status_code == 200
+    for tokens in (first, second):
+        assert (await _refresh(client, tokens["refresh_token"])).status_code == 401
@@ -337,10 +337,19 @@ export function UserDashboard({ user: initialUser }: UserDashboardProps) {
         setUploadSuccess(null);
 
         try {
-            const updatedUser = await api.uploadFile(
+            const { job_id, ...uploadedUser } = await api.uploadFile(
                 userData.username,
                 selectedFile,
             );
+            const updatedUser: UserResponse = { ...uploadedUser };
+            // New content: word count is computed by a background job
+            if (job_id !== null) {
+                const job = await api.waitForJob(job_id);
+                if (job.status === "failed" || !job.result) {
+                    throw new Error(job.error || "Failed to count words");
+                }
+                updatedUser.file_word_count = job.result.word_count;
+            }
             setUploadSuccess(
                 `File "${updatedUser.original_filename}" uploaded successfully! (${updatedUser.file_word_count} words)`,
             );
@@ -397,9 +406,12 @@ export function UserDashboard({ user: initialUser }: UserDashboardProps) {
         }
     };
 
-    const handleLogout = () => {
-        auth.clearUser();
-        window.location.href = "/signin-page";
+    const handleLogout = async () => {
+        try {
+            await api.logout();
+        } finally {
+            window.location.href = "/signin-page";
+        }
     };
 
     const handlePasswordReset = async () => {
@@ -36,6 +36,40 @@ export interface UserResponse {
     original_filename: string | null;
 }
 
+// Login/signup/refresh response: the user plus the session tokens
+export interface TokenResponse extends UserResponse {
+    access_token: string;
+    refresh_token: string;
+    token_type: string;
+    expires_in: number;
+}
+
+export interface SessionTokens {
+    access_token: string;
+    refresh_token: string;
+}
+
+// Upload response, job_id is set while the word count is being computed
+export interface FileUploadResponse extends UserResponse {
+    job_id: number | null;
+}
+
+export interface JobResponse {
+    id: number;
+    kind: string;
+    status: "pending" | "running" | "done" | "failed";
+    progress: number;
+    attempts: number;
+    error: string | null;
+    result: {
+        word_count: number;
+        top_words: [string, number][];
+        char_histogram: Record<string, number>;
+    } | null;
+    created_at: string;
+    updated_at: string;
+}
+
 export interface ApiError {
     detail: string | { msg: string }[] | Record<string, unknown>;
 }
@@ -71,9 +105,56 @@ async function handleResponse<T>(response: Response): Promise<T> {
     return response.json();
 }
 
+// Keep the tokens of a login/signup/refresh response, return the user
+function startSession(response: TokenResponse): UserResponse {
+    const { access_token, refresh_token, token_type, expires_in, ...user } =
+        response;
+    auth.setTokens({ access_token, refresh_token });
+    return user;
+}
+
+// Exchange the refresh token for new tokens, false if the session is over
+async function refreshSession(): Promise<boolean> {
+    const tokens = auth.getTokens();
+    if (!tokens) return false;
+    const response = await fetch(`${API_BASE_URL}/users/refresh`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ refresh_token: tokens.refresh_token }),
+    });
+    if (!response.ok) {
+        auth.clearTokens();
+        return false;
+    }
+    startSession(await response.json());
+    return true;
+}
+
+// fetch with the access token, renewed once if it has expired
+async function authFetch(
+    url: string,
+    init: RequestInit = {},
+): Promise<Response> {
+    const send = () =>
+        fetch(url, {
+            ...init,
+            headers: {
+                ...init.headers,
+                Authorization: `Bearer ${auth.getTokens()?.access_token ?? ""}`,
+            },
+        });
+    const response = await send();
+    if (response.status === 401 && (await refreshSession())) {
+        return send();
+    }
+    return response;
+}
+
 // User API functions
 export const api = {
-    // Create a new user (signup)
+    // Create a new user (signup), also opens a session
     async createUser(userData: UserCreate): Promise<UserResponse> {
         const response = await fetch(`${API_BASE_URL}/users/`, {
             method: "POST",
@@ -82,10 +163,10 @@ export const api = {
             },
             body: JSON.stringify(userData),
         });
-        return handleResponse<UserResponse>(response);
+        return startSession(await handleResponse<TokenResponse>(response));
     },
 
-    // Login user
+    // Login user, the only call sending the password
     async login(credentials: UserLogin): Promise<UserResponse> {
         const response = await fetch(`${API_BASE_URL}/users/login`, {
             method: "POST",
@@ -94,7 +175,21 @@ export const api = {
             },
             body: JSON.stringify(credentials),
         });
-        return handleResponse<UserResponse>(response);
+        return startSession(await handleResponse<TokenResponse>(response));
+    },
+
+    // Logout: revoke the refresh token and forget the session
+    async logout(): Promise<void> {
+        const tokens = auth.getTokens();
+        auth.clearUser();
+        if (!tokens) return;
+        await fetch(`${API_BASE_URL}/users/logout`, {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ refresh_token: tokens.refresh_token }),
+        });
     },
 
     // Update user info
@@ -102,7 +197,7 @@ export const api = {
         username: string,
         updates: UserUpdate,
     ): Promise<UserResponse> {
-        const response = await fetch(
+        const response = await authFetch(
             `${API_BASE_URL}/users/${encodeURIComponent(username)}`,
             {
                 method: "PATCH",
@@ -117,7 +212,7 @@ export const api = {
 
     // Delete user
     async deleteUser(username: string): Promise<{ message: string }> {
-        const response = await fetch(
+        const response = await authFetch(
             `${API_BASE_URL}/users/${encodeURIComponent(username)}`,
             {
                 method: "DELETE",
@@ -126,19 +221,39 @@ export const api = {
         return handleResponse<{ message: string }>(response);
     },
 
-    // Upload file for user - returns updated user with file_word_count
-    async uploadFile(username: string, file: File): Promise<UserResponse> {
+    // Upload file for user - file_word_count is filled in by the job in job_id
+    async uploadFile(
+        username: string,
+        file: File,
+    ): Promise<FileUploadResponse> {
         const formData = new FormData();
         formData.append("file", file);
 
-        const response = await fetch(
+        const response = await authFetch(
             `${API_BASE_URL}/users/${encodeURIComponent(username)}/file`,
             {
                 method: "POST",
                 body: formData,
             },
         );
-        return handleResponse<UserResponse>(response);
+        return handleResponse<FileUploadResponse>(response);
+    },
+
+    // Get background job status (only the uploader may read it)
+    async getJob(jobId: number): Promise<JobResponse> {
+        const response = await authFetch(`${API_BASE_URL}/jobs/${jobId}`);
+        return handleResponse<JobResponse>(response);
+    },
+
+    // Poll a background job until it is done or failed
+    async waitForJob(jobId: number, intervalMs = 500): Promise<JobResponse> {
+        for (;;) {
+            const job = await this.getJob(jobId);
+            if (job.status === "done" || job.status === "failed") {
+                return job;
+            }
+            await new Promise((resolve) => setTimeout(resolve, intervalMs));
+        }
     },
 
     // Download file for user
@@ -164,7 +279,7 @@ export const api = {
 
     // Delete file for user
     async deleteFile(username: string): Promise<{ message: string }> {
-        const response = await fetch(
+        const response = await authFetch(
             `${API_BASE_URL}/users/${encodeURIComponent(username)}/file`,
             {
                 method: "DELETE",
@@ -198,9 +313,29 @@ export const auth = {
         }
     },
 
-    // Clear user from localStorage (logout)
+    // Clear user and tokens from localStorage (logout)
     clearUser(): void {
         localStorage.removeItem("user");
+        this.clearTokens();
+    },
+
+    // Access/refresh tokens of the current session
+    setTokens(tokens: SessionTokens): void {
+        localStorage.setItem("tokens", JSON.stringify(tokens));
+    },
+
+    getTokens(): SessionTokens | null {
+        const tokensStr = localStorage.getItem("tokens");
+        if (!tokensStr) return null;
+        try {
+            return JSON.parse(tokensStr);
+        } catch {
+            return null;
+        }
+    },
+
+    clearTokens(): void {
+        localStorage.removeItem("tokens");
     },
 
     // Check if user is logged in
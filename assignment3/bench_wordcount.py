@@ -0,0 +1,175 @@
+"""
+Peak memory and time of counting words: old whole-file pipeline vs streaming.
+
+Builds corpora of the given sizes by repeating the data/ texts, then counts
+each one in a fresh process (so peak RSS is measured in isolation):
+
+    old      the original load_text + sanitize_text + handle_contraction +
+             top_words, kept here as they were before the streaming rewrite
+    stream   count_words, one buffered pass
+    mmap     count_words_mmap, one pass on bytes, top words decoded at the end
+    par-N    count_files, shards counted by N processes and merged in order
+
+All must agree on the word count and top words: each run writes its result
+to a file and the benchmark fails when one differs from the first. The old
+pipeline holds several copies of the whole text, so it is skipped above
+--old-max-mb.
+Peak RSS of the parallel modes is the main process plus the largest worker.
+
+Usage:
+    python bench_wordcount.py --size-mb 64 1024 4096
+    python bench_wordcount.py --size-mb 1024 --workers 1 2 4 8 --skip-old
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Optional
+
+import script
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SOURCES = ["IF.txt", "AlwaysRememberUsThisWay.txt"]
+
+
+def make_corpus(path: str, size_mb: int):
+    """Write a text file of about size_mb MiB from the data/ texts."""
+    text = ""
+    for name in SOURCES:
+        with open(os.path.join(DATA_DIR, name), "r") as f:
+            text += f.read() + "\n"
+    block = text * (1024 * 1024 // len(text) + 1)
+    with open(path, "w") as f:
+        for _ in range(size_mb):
+            f.write(block[: 1024 * 1024])
+
+
+# the pipeline script.py ran before count_words, a baseline that does not
+# change when script.py does
+ORIGINAL_SYMBOLS = [".", ",", "!", "?", "'", '"', "(", ")", ";", ":"]
+ORIGINAL_CONTRACTIONS = {
+    "n't": " not",
+    "'re": " are",
+    "'s": " is",
+    "'m": " am",
+    "'ve": " have",
+    "'ll": " will",
+    "'d": " would",
+}
+
+
+def old_path(path: str):
+    with open(path, "r") as file:
+        text = file.read()
+    for symbol in ORIGINAL_SYMBOLS:
+        text = text.replace(symbol, "")
+    text = text.lower()
+    count = len(text.split())
+    for contraction, replacement in ORIGINAL_CONTRACTIONS.items():
+        text = text.replace(contraction, replacement)
+    return count, Counter(text.split()).most_common(3)
+
+
+def stream_path(path: str):
+    count, counts = script.count_words(path, contractions=True)
+    return count, counts.most_common(3)
+
+
+def mmap_path(path: str):
+    return script.count_words_mmap(path, 3, contractions=True)
+
+
+def parallel_path(path: str, workers: int):
+    [(count, counts)] = script.count_files([path], contractions=True, workers=workers)
+    return count, counts.most_common(3)
+
+
+def run_mode(mode: str, path: str, workers: int, result_path: Optional[str] = None):
+    started = time.perf_counter()
+    if mode == "old":
+        count, top = old_path(path)
+    elif mode == "stream":
+        count, top = stream_path(path)
+    elif mode == "mmap":
+        count, top = mmap_path(path)
+    else:
+        count, top = parallel_path(path, workers)
+        mode = f"par-{workers}"
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    peak_mb += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(
+        f"{mode:<7} words={count} top={top}  time={elapsed:6.2f}s  "
+        f"{size_mb / elapsed:6.1f}MiB/s  peak_rss={peak_mb:8.1f}MiB"
+    )
+    if result_path:
+        with open(result_path, "w") as f:
+            json.dump({"mode": mode, "words": count, "top": top}, f)
+
+
+def check_agreement(result_paths: list):
+    """Exit with an error if a mode found other words than the first one."""
+    results = []
+    for result_path in result_paths:
+        with open(result_path, "r") as f:
+            results.append(json.load(f))
+    expected = results[0]
+    for result in results[1:]:
+        if (result["words"], result["top"]) != (expected["words"], expected["top"]):
+            sys.exit(
+                f"{result['mode']} disagrees with {expected['mode']}: "
+                f"words={result['words']} top={result['top']}, expected "
+                f"words={expected['words']} top={expected['top']}"
+            )
+    print(f"all {len(results)} modes agree")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, nargs="+", default=[64, 1024, 4096])
+    parser.add_argument("--old-max-mb", type=int, default=256)
+    parser.add_argument("--skip-old", action="store_true")
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count()])
+    parser.add_argument("--mode", choices=["old", "stream", "mmap", "parallel"])
+    parser.add_argument("--file")
+    parser.add_argument("--result", help="write the words and top words here")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.file, args.workers[0], args.result)
+        sys.exit(0)
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_wordcount_")
+    try:
+        for size_mb in args.size_mb:
+            path = os.path.join(tmp_dir, f"corpus_{size_mb}.txt")
+            make_corpus(path, size_mb)
+            print(f"\nfile={size_mb}MiB")
+            runs = [("stream", 1), ("mmap", 1)] + [
+                ("parallel", n) for n in args.workers
+            ]
+            if size_mb <= args.old_max_mb and not args.skip_old:
+                runs.insert(0, ("old", 1))
+            result_paths = []
+            for mode, workers in runs:
+                result_path = os.path.join(tmp_dir, f"{mode}-{workers}.json")
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__)]
+                    + ["--mode", mode, "--file", path, "--workers", str(workers)]
+                    + ["--result", result_path],
+                    check=True,
+                )
+                result_paths.append(result_path)
+            os.remove(path)
+            check_agreement(result_paths)
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -1,7 +1,67 @@
+import argparse
+import codecs
+import csv
+import glob
+import hashlib
+import json
+import locale
+import mmap
 import os
+import re
 import socket
+import sys
+import threading
+import time
 from collections import Counter
-from typing import List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from fnmatch import fnmatch
+from functools import reduce
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+# bytes read per buffer by count_words, memory stays flat with file size
+CHUNK_SIZE = 1024 * 1024
+# files larger than this are split into shards counted in parallel
+SHARD_SIZE = int(os.environ.get("SHARD_SIZE", str(32 * 1024 * 1024)))
+# seconds before the claim of a silent (dead) replica on a shard expires,
+# live replicas renew their claims every LEASE_TTL / 3
+LEASE_TTL = float(os.environ.get("LEASE_TTL", "60"))
+# seconds between two looks at the shared folder while waiting on replicas
+POLL_INTERVAL = 0.2
+# bumped when the counting changes, so older cache entries are recounted
+CACHE_VERSION = 1
+# columns of the batch output, host and ip_address only with --system-info
+BATCH_FIELDS = ["path", "bytes", "words", "top_words", "seconds", "error"]
+SYSTEM_FIELDS = ["host", "ip_address"]
+# rows per parquet row group, the batch output is flushed at every group
+PARQUET_BATCH_ROWS = 1000
+# small files are sent to the batch workers in groups of up to this many
+# bytes or files, so the pool is not busy with one task per tiny file
+TASK_BYTES = 1024 * 1024
+TASK_FILES = 64
+# shards are cut after one of these bytes (whitespace for str.split, and never
+# part of a multi-byte character in ASCII-compatible encodings like UTF-8)
+SHARD_BREAK_RE = re.compile(rb"[\t\n\x0b\x0c\r\x1c-\x1f ]")
+# symbols removed by sanitize_text, in one pass (str.translate is much slower
+# once the text holds any non-ASCII character, e.g. curly quotes)
+PUNCTUATION_RE = re.compile("[.,!?'\"();:]+")
+CONTRACTIONS = {
+    "n't": " not",
+    "'re": " are",
+    "'s": " is",
+    "'m": " am",
+    "'ve": " have",
+    "'ll": " will",
+    "'d": " would",
+}
+CONTRACTION_RE = re.compile("|".join(re.escape(c) for c in CONTRACTIONS))
+# bytes versions for count_words_mmap, where lower() and split() are ASCII only
+PUNCTUATION_BYTES = b".,!?'\"();:"
+CONTRACTIONS_BYTES = {c.encode(): r.encode() for c, r in CONTRACTIONS.items()}
+CONTRACTION_BYTES_RE = re.compile(b"|".join(map(re.escape, CONTRACTIONS_BYTES)))
+# words that str.lower/str.split may change: non-ASCII, or holding one of the
+# ASCII separators that str.split knows but bytes.split does not
+STR_ONLY_RE = re.compile(rb"[\x1c-\x1f\x80-\xff]")
 
 
 def word_count(text: str) -> int:
@@ -58,10 +118,7 @@ def sanitize_text(text: str) -> str:
     Returns:
         str: The sanitized text.
     """
-    symbols = [".", ",", "!", "?", "'", '"', "(", ")", ";", ":"]
-    for symbol in symbols:
-        text = text.replace(symbol, "")
-    return text.lower()
+    return PUNCTUATION_RE.sub("", text).lower()
 
 
 def handle_contraction(text: str) -> str:
@@ -74,20 +131,626 @@ def handle_contraction(text: str) -> str:
     Returns:
         str: The text with contractions handled.
     """
-    contractions = {
-        "n't": " not",
-        "'re": " are",
-        "'s": " is",
-        "'m": " am",
-        "'ve": " have",
-        "'ll": " will",
-        "'d": " would",
-    }
-    for contraction, replacement in contractions.items():
+    for contraction, replacement in CONTRACTIONS.items():
         text = text.replace(contraction, replacement)
     return text
 
 
+def read_chunks(
+    file_path: str, start: int = 0, end: int = None, chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Reads a byte range of a file as text, one decoded buffer at a time.
+
+    The file is decoded like open(file_path, "r") does, with the locale
+    encoding; a character cut between two buffers is kept for the next one.
+
+    Args:
+        file_path (str): The path to the file.
+        start (int): The byte offset to start from.
+        end (int): The byte offset to stop at, the end of the file if None.
+        chunk_size (int): The number of bytes read at a time.
+
+    Returns:
+        Iterator[str]: The decoded text, buffer by buffer.
+    """
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        position = start
+        while True:
+            size = chunk_size if end is None else min(chunk_size, end - position)
+            data = file.read(size) if size > 0 else b""
+            if not data:
+                yield decoder.decode(b"", final=True)
+                return
+            position += len(data)
+            yield decoder.decode(data)
+
+
+def _count_text(text: str, contractions: bool, counts: Counter) -> int:
+    # sanitize and split text cut at whitespace, returns the count before
+    # contractions are handled, as the report does
+    text = PUNCTUATION_RE.sub("", text).lower()
+    words = text.split()
+    count = len(words)
+    if contractions:
+        text, expanded = CONTRACTION_RE.subn(lambda m: CONTRACTIONS[m.group()], text)
+        if expanded:
+            words = text.split()
+    counts.update(words)
+    return count
+
+
+def count_chunks(
+    chunks: Iterator[str], contractions: bool = False
+) -> Tuple[int, Counter]:
+    """
+    Counts the words of a text given as consecutive buffers.
+
+    Same result as word_count(sanitize_text(text)) for the count and
+    Counter(text.split()) for the counts (after handle_contraction if
+    `contractions`), where text is all buffers joined. The last, possibly
+    cut, word of a buffer is carried over to the next one, so only text that
+    ends on whitespace is sanitized and split.
+
+    Args:
+        chunks (Iterator[str]): The text, buffer by buffer.
+        contractions (bool): Expand contractions before counting the words.
+
+    Returns:
+        Tuple[int, Counter]: The word count and the count of each word.
+    """
+    count = 0
+    counts = Counter()
+    carry = ""
+    for chunk in chunks:
+        text = carry + chunk
+        carry = ""
+        if text and not text[-1].isspace():
+            # the last word may be cut, keep it for the next buffer
+            parts = text.rsplit(None, 1)
+            carry = parts.pop()
+            text = parts[0] if parts else ""
+        count += _count_text(text, contractions, counts)
+    # the text may not end on whitespace
+    count += _count_text(carry, contractions, counts)
+    return count, counts
+
+
+def count_words(
+    file_path: str, contractions: bool = False, chunk_size: int = CHUNK_SIZE
+) -> Tuple[int, Counter]:
+    """
+    Streams a file once and counts its words, without loading it whole.
+
+    Args:
+        file_path (str): The path to the file.
+        contractions (bool): Expand contractions before counting the words.
+        chunk_size (int): The number of bytes read at a time.
+
+    Returns:
+        Tuple[int, Counter]: The word count and the count of each word, same
+            as word_count(sanitize_text(load_text(file_path))) and top_words.
+    """
+    return count_chunks(read_chunks(file_path, chunk_size=chunk_size), contractions)
+
+
+def _ascii_compatible() -> bool:
+    # whether the locale encoding can be cut at ASCII whitespace bytes
+    return " \n".encode(locale.getpreferredencoding(False)) == b" \n"
+
+
+def split_shards(file_path: str, shard_size: int = SHARD_SIZE) -> List[Tuple[int, int]]:
+    """
+    Splits a file into byte ranges of about `shard_size`, cut at whitespace.
+
+    Every range but the last ends right after a whitespace byte, so no word
+    (or multi-byte character) spans two shards. Encodings that are not
+    ASCII-compatible (e.g. UTF-16) are not split.
+
+    Args:
+        file_path (str): The path to the file.
+        shard_size (int): The target size of a shard in bytes.
+
+    Returns:
+        List[Tuple[int, int]]: The (start, end) byte offsets of the shards.
+    """
+    size = os.path.getsize(file_path)
+    if not _ascii_compatible():
+        return [(0, size)]
+    bounds = [0]
+    with open(file_path, "rb") as file:
+        while size - bounds[-1] > shard_size:
+            file.seek(bounds[-1] + shard_size)
+            cut = None
+            while cut is None:
+                position = file.tell()
+                data = file.read(CHUNK_SIZE)
+                if not data:
+                    break
+                match = SHARD_BREAK_RE.search(data)
+                if match:
+                    cut = position + match.end()
+            if cut is None or cut >= size:
+                break
+            bounds.append(cut)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def merge_counts(
+    left: Tuple[int, Counter], right: Tuple[int, Counter]
+) -> Tuple[int, Counter]:
+    """
+    Merges the counts of two consecutive pieces of text.
+
+    Words of `left` keep their order and new words of `right` follow, so
+    ties in most_common stay in first-seen order, as for the whole text.
+
+    Args:
+        left (Tuple[int, Counter]): The counts of the first piece.
+        right (Tuple[int, Counter]): The counts of the piece after it.
+
+    Returns:
+        Tuple[int, Counter]: The counts of both pieces.
+    """
+    left[1].update(right[1])
+    return left[0] + right[0], left[1]
+
+
+def _count_shard(
+    file_path: str, start: int, end: int, contractions: bool
+) -> Tuple[int, Counter]:
+    return count_chunks(read_chunks(file_path, start, end), contractions)
+
+
+def count_files(
+    file_paths: List[str],
+    contractions: Union[bool, List[bool]] = False,
+    workers: int = None,
+    shard_size: int = SHARD_SIZE,
+) -> List[Tuple[int, Counter]]:
+    """
+    Counts the words of many files in parallel, same result as count_words.
+
+    Files are split into shards at whitespace (see split_shards), the shards
+    of all files are counted in a process pool and the partial counts of
+    each file are merged here, in file order, while the later shards are
+    still being counted. Runs in this process when there is less than a
+    shard to count or one worker.
+
+    Args:
+        file_paths (List[str]): The paths to the files.
+        contractions (Union[bool, List[bool]]): Expand contractions, for all
+            files or one flag per file.
+        workers (int): The number of processes, the number of CPUs if None.
+        shard_size (int): The target size of a shard in bytes.
+
+    Returns:
+        List[Tuple[int, Counter]]: The word count and the count of each word,
+            in the order of `file_paths`.
+    """
+    if isinstance(contractions, bool):
+        contractions = [contractions] * len(file_paths)
+    workers = workers or os.cpu_count() or 1
+    shards = [split_shards(file_path, shard_size) for file_path in file_paths]
+    total_size = sum(ranges[-1][1] for ranges in shards)
+    if workers == 1 or total_size <= shard_size:
+        return [
+            count_words(file_path, expand)
+            for file_path, expand in zip(file_paths, contractions)
+        ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            [
+                pool.submit(_count_shard, file_path, start, end, expand)
+                for start, end in ranges
+            ]
+            for file_path, expand, ranges in zip(file_paths, contractions, shards)
+        ]
+        # merging here costs one Counter.update per shard, sending the
+        # partials back to the pool would pickle them again on every level
+        return [
+            reduce(merge_counts, (future.result() for future in file_futures))
+            for file_futures in futures
+        ]
+
+
+def _count_bytes(data: bytes, contractions: bool, counts: Counter) -> int:
+    # _count_text on bytes, data is cut at whitespace
+    data = data.translate(None, PUNCTUATION_BYTES).lower()
+    words = data.split()
+    count = len(words)
+    if contractions:
+        data, expanded = CONTRACTION_BYTES_RE.subn(
+            lambda m: CONTRACTIONS_BYTES[m.group()], data
+        )
+        if expanded:
+            words = data.split()
+    counts.update(words)
+    return count
+
+
+def count_words_mmap(
+    file_path: str, n: int, contractions: bool = False, chunk_size: int = CHUNK_SIZE
+) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Counts the words of a UTF-8 file on bytes, for large corpora.
+
+    The file is memory-mapped and each buffer (cut after whitespace) is
+    stripped, lowercased and split as bytes, which skips decoding and
+    re-encoding every character. Only the top `n` words are decoded, unless
+    a word holds non-ASCII bytes: the vocabulary (not the text) is then
+    redone on str so the result stays the same as count_words. Other locale
+    encodings fall back to count_words.
+
+    Args:
+        file_path (str): The path to the file.
+        n (int): The number of top words to return.
+        contractions (bool): Expand contractions before counting the words.
+        chunk_size (int): The number of bytes handled at a time.
+
+    Returns:
+        Tuple[int, List[Tuple[str, int]]]: The word count and the top n words.
+    """
+    encoding = codecs.lookup(locale.getpreferredencoding(False)).name
+    if encoding not in ("utf-8", "ascii"):
+        count, counts = count_words(file_path, contractions, chunk_size)
+        return count, counts.most_common(n)
+
+    count = 0
+    counts = Counter()
+    size = os.path.getsize(file_path)
+    # mmap cannot map an empty file
+    if size:
+        with (
+            open(file_path, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+        ):
+            # read ahead, and drop pages once counted so RSS stays flat
+            # (madvise is not available on every platform)
+            advise = getattr(mapped, "madvise", None)
+            if advise:
+                advise(mmap.MADV_SEQUENTIAL)
+            start = released = 0
+            while start < size:
+                end = min(start + chunk_size, size)
+                while end < size:
+                    # cut after the last whitespace so no word is split
+                    cut = max(
+                        mapped.rfind(space, start, end)
+                        for space in (b" ", b"\n", b"\t", b"\r")
+                    )
+                    if cut >= start:
+                        end = cut + 1
+                        break
+                    end = min(end + chunk_size, size)
+                count += _count_bytes(mapped[start:end], contractions, counts)
+                if advise:
+                    # whole pages only, a page dropped while still in use is
+                    # mapped again along with its neighbours
+                    done = end - end % mmap.PAGESIZE
+                    advise(mmap.MADV_DONTNEED, released, done - released)
+                    released = done
+                start = end
+
+    if not STR_ONLY_RE.search(b" ".join(counts)):
+        return count, [(word.decode(), times) for word, times in counts.most_common(n)]
+
+    # same words in the same first-seen order as on str, merged after lower()
+    words = Counter()
+    for word, times in counts.items():
+        parts = word.decode(encoding).lower().split()
+        count += (len(parts) - 1) * times
+        for part in parts:
+            words[part] += times
+    return count, words.most_common(n)
+
+
+def _hash_file(file_path: str, prefix_size: int = 0) -> Tuple[str, str]:
+    # sha256 of the first prefix_size bytes and of the whole file, one read
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        remaining = prefix_size
+        while remaining > 0:
+            data = file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+        prefix = digest.hexdigest()
+        for data in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(data)
+    return prefix, digest.hexdigest()
+
+
+def _last_break(file_path: str, size: int) -> int:
+    # offset right after the last whitespace byte (see SHARD_BREAK_RE), so the
+    # text after it is at most one word; 0 when there is none
+    with open(file_path, "rb") as file:
+        end = size
+        while end > 0:
+            start = max(end - CHUNK_SIZE, 0)
+            file.seek(start)
+            data = file.read(end - start)
+            cut = max(data.rfind(space) for space in b"\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ")
+            if cut >= 0:
+                return start + cut + 1
+            end = start
+    return 0
+
+
+def count_files_cached(
+    file_paths: List[str],
+    contractions: Union[bool, List[bool]],
+    cache_dir: str,
+    workers: int = None,
+    shard_size: int = SHARD_SIZE,
+) -> List[Tuple[int, Counter]]:
+    """
+    Counts the words of many files like count_files, through a cache.
+
+    The cache keeps one entry per file, contractions flag and encoding,
+    with the counts of the file up to its last whitespace byte (the rest is
+    at most one word, counted again on every run) and the size, mtime and
+    sha256 of the file. A file is not counted again when:
+
+    - its size and mtime are unchanged, or only its mtime changed but not
+      its content;
+    - it was only appended to (the hash of its old size still matches):
+      the counting then goes on from where the cached counts stop.
+
+    Other files are counted again, with count_files. Since the whole counts
+    are kept, the top words for any n come from the same entry.
+
+    Args:
+        file_paths (List[str]): The paths to the files.
+        contractions (Union[bool, List[bool]]): Expand contractions, for all
+            files or one flag per file.
+        cache_dir (str): The folder that holds the cache entries.
+        workers (int): The number of processes, the number of CPUs if None.
+        shard_size (int): The target size of a shard in bytes.
+
+    Returns:
+        List[Tuple[int, Counter]]: The word count and the count of each word,
+            in the order of `file_paths`.
+    """
+    if isinstance(contractions, bool):
+        contractions = [contractions] * len(file_paths)
+    os.makedirs(cache_dir, exist_ok=True)
+    # without ASCII whitespace cuts, entries hold the whole file (no appends)
+    splittable = _ascii_compatible()
+    encoding = codecs.lookup(locale.getpreferredencoding(False)).name
+    results = [None] * len(file_paths)
+    recount = []
+
+    for index, (file_path, expand) in enumerate(zip(file_paths, contractions)):
+        key = json.dumps([os.path.abspath(file_path), expand, encoding])
+        entry_path = os.path.join(
+            cache_dir, hashlib.sha256(key.encode()).hexdigest()[:16] + ".json"
+        )
+        stat = os.stat(file_path)
+        try:
+            with open(entry_path, "r") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or entry["version"] != CACHE_VERSION:
+            recount.append((index, entry_path, stat))
+            continue
+
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            changed = False
+        elif stat.st_size == entry["size"]:
+            changed = _hash_file(file_path)[1] != entry["sha256"]
+        elif stat.st_size > entry["size"] and splittable:
+            prefix, sha256 = _hash_file(file_path, entry["size"])
+            changed = prefix != entry["sha256"]
+            if not changed:
+                # appended to: count from the cut of the old content on
+                cut = _last_break(file_path, stat.st_size)
+                entry["count"], entry["counts"] = merge_counts(
+                    (entry["count"], Counter(entry["counts"])),
+                    _count_shard(file_path, entry["cut"], cut, expand),
+                )
+                entry.update(cut=cut, sha256=sha256)
+        else:
+            changed = True
+        if changed:
+            recount.append((index, entry_path, stat))
+            continue
+
+        if (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            _write_atomic(entry_path, json.dumps(entry))
+        results[index] = merge_counts(
+            (entry["count"], Counter(entry["counts"])),
+            _count_shard(file_path, entry["cut"], stat.st_size, expand),
+        )
+
+    counted = count_files(
+        [file_paths[index] for index, _, _ in recount],
+        [contractions[index] for index, _, _ in recount],
+        workers,
+        shard_size,
+    )
+    for (index, entry_path, stat), (count, counts) in zip(recount, counted):
+        file_path = file_paths[index]
+        results[index] = count, counts
+        sha256 = _hash_file(file_path)[1]
+        if os.stat(file_path).st_mtime_ns != stat.st_mtime_ns:
+            continue  # written to while counted, do not cache
+        cut = _last_break(file_path, stat.st_size) if splittable else stat.st_size
+        # the cached counts stop at the cut, the last word is counted each run
+        tail_count, tail_counts = _count_shard(
+            file_path, cut, stat.st_size, contractions[index]
+        )
+        entry = {
+            "version": CACHE_VERSION,
+            "path": os.path.abspath(file_path),
+            "contractions": contractions[index],
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "cut": cut,
+            "count": count - tail_count,
+            "counts": counts - tail_counts,
+        }
+        _write_atomic(entry_path, json.dumps(entry))
+    return results
+
+
+def _acquire_lease(prefix: str, owner: str, ttl: float) -> Optional[str]:
+    # leases are files prefix.0, prefix.1, ... created with O_EXCL, so only
+    # one replica gets each; the next one may be taken once the last one has
+    # not been renewed for ttl seconds
+    generation = 0
+    while True:
+        path = f"{prefix}.{generation}"
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if os.path.exists(f"{prefix}.{generation + 1}"):
+                generation += 1
+            elif time.time() - os.stat(path).st_mtime <= ttl:
+                return None
+            else:
+                generation += 1
+            continue
+        with os.fdopen(fd, "w") as file:
+            file.write(owner)
+        return path
+
+
+@contextmanager
+def _holding(lease: str, ttl: float):
+    # renew the lease in the background while the work runs
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(ttl / 3):
+            os.utime(lease)
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _write_atomic(path: str, text: str):
+    # readers on the shared folder never see a half written file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+def count_files_distributed(
+    file_paths: List[str],
+    contractions: Union[bool, List[bool]],
+    work_dir: str,
+    report: Callable[[List[Tuple[int, Counter]]], str],
+    shard_size: int = SHARD_SIZE,
+    lease_ttl: float = LEASE_TTL,
+) -> Tuple[str, bool]:
+    """
+    Counts the words of many files together with other replicas.
+
+    Every replica runs this with the same arguments and a `work_dir` they
+    share (e.g. a volume). The shards of the files (see split_shards) are
+    claimed through lease files, so each one is counted once, and the
+    partial counts are written to the folder. Once all are there, one
+    replica is elected (again through a lease) to merge them and build the
+    report; the others wait for it. A replica that dies loses its leases
+    after `lease_ttl` seconds, and another one takes over its work.
+
+    The folder holds one job per input (paths, sizes, mtimes, options), so
+    running again on the same files returns the report right away.
+
+    Args:
+        file_paths (List[str]): The paths to the files.
+        contractions (Union[bool, List[bool]]): Expand contractions, for all
+            files or one flag per file.
+        work_dir (str): The folder shared by the replicas.
+        report (Callable[[List[Tuple[int, Counter]]], str]): Builds the
+            report from the counts of each file, as count_files returns them.
+        shard_size (int): The target size of a shard in bytes.
+        lease_ttl (float): Seconds before a claim by a silent replica expires.
+
+    Returns:
+        Tuple[str, bool]: The report, and whether this replica built it.
+    """
+    if isinstance(contractions, bool):
+        contractions = [contractions] * len(file_paths)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    inputs = []
+    for file_path, expand in zip(file_paths, contractions):
+        stat = os.stat(file_path)
+        inputs.append([file_path, stat.st_size, stat.st_mtime_ns, expand])
+    job = hashlib.sha256(json.dumps([inputs, shard_size]).encode()).hexdigest()
+    job_dir = os.path.join(work_dir, job[:16])
+    os.makedirs(os.path.join(job_dir, "leases"), exist_ok=True)
+    os.makedirs(os.path.join(job_dir, "parts"), exist_ok=True)
+    result_path = os.path.join(job_dir, "result.txt")
+
+    shards = [split_shards(file_path, shard_size) for file_path in file_paths]
+    tasks = [
+        (f"{index}-{shard}", index, start, end)
+        for index, ranges in enumerate(shards)
+        for shard, (start, end) in enumerate(ranges)
+    ]
+
+    def part_path(name: str) -> str:
+        return os.path.join(job_dir, "parts", f"{name}.json")
+
+    while not os.path.exists(result_path):
+        pending = [task for task in tasks if not os.path.exists(part_path(task[0]))]
+        claimed = False
+        for name, index, start, end in pending:
+            lease = _acquire_lease(
+                os.path.join(job_dir, "leases", name), owner, lease_ttl
+            )
+            if lease is None or os.path.exists(part_path(name)):
+                continue
+            claimed = True
+            with _holding(lease, lease_ttl):
+                count, counts = _count_shard(
+                    file_paths[index], start, end, contractions[index]
+                )
+                # a JSON object keeps the first-seen order of the words
+                _write_atomic(
+                    part_path(name), json.dumps({"count": count, "counts": counts})
+                )
+
+        if not pending:
+            lease = _acquire_lease(
+                os.path.join(job_dir, "leases", "merge"), owner, lease_ttl
+            )
+            if lease is not None:
+                with _holding(lease, lease_ttl):
+                    results = []
+                    for index, ranges in enumerate(shards):
+                        partials = []
+                        for shard in range(len(ranges)):
+                            with open(part_path(f"{index}-{shard}"), "r") as file:
+                                part = json.load(file)
+                            partials.append((part["count"], Counter(part["counts"])))
+                        results.append(reduce(merge_counts, partials))
+                    text = report(results)
+                    _write_atomic(result_path, text)
+                return text, True
+        if not claimed:
+            time.sleep(POLL_INTERVAL)
+
+    with open(result_path, "r") as file:
+        return file.read(), False
+
+
 def construct_summary(
     IF_WORDS_COUNT: int,
     ARUTW_WORDS_COUNT: int,
@@ -152,47 +815,393 @@ def get_id_address() -> str:
     return IP
 
 
-if __name__ == "__main__":
-    DATA_PATH = "/home/data"
-    # local testing
-    # DATA_PATH = "data"
-
-    IF_FILE_PATH_1 = DATA_PATH + "/IF.txt"
-    ARUTW_FILE_PATH_2 = DATA_PATH + "/AlwaysRememberUsThisWay.txt"
+def build_summary(results: List[Tuple[int, Counter]]) -> str:
+    """
+    Builds the summary of the IF and ARUTW counts, top 3 words of each.
 
-    # 0. load and sanitize text
-    IF_TEXT = load_text(IF_FILE_PATH_1)
-    ARUTW_TEXT = load_text(ARUTW_FILE_PATH_2)
-    IF_TEXT = sanitize_text(IF_TEXT)
-    ARUTW_TEXT = sanitize_text(ARUTW_TEXT)
+    Args:
+        results (List[Tuple[int, Counter]]): The word count and the count of
+            each word of IF and ARUTW, as count_files returns them.
 
-    # 1. get words count from text files
-    IF_WORDS_COUNT = word_count(IF_TEXT)
-    ARUTW_WORDS_COUNT = word_count(ARUTW_TEXT)
+    Returns:
+        str: The summary of the results.
+    """
+    (IF_WORDS_COUNT, IF_COUNTS), (ARUTW_WORDS_COUNT, ARUTW_COUNTS) = results
 
     # 2. get top words from IF text file
-    IF_TOP_WORDS = top_words(IF_TEXT, 3)
+    IF_TOP_WORDS = IF_COUNTS.most_common(3)
 
-    # 3. handle contraction of ARUTW text file and get top words
-    ARUTW_TEXT = handle_contraction(ARUTW_TEXT)
-    ARUTW_TOP_WORDS = top_words(ARUTW_TEXT, 3)
+    # 3. get top words of ARUTW text file, contractions handled
+    ARUTW_TOP_WORDS = ARUTW_COUNTS.most_common(3)
 
     # 4. get IP address of local machine
     LOCAL_IP_ADDRESS = get_id_address()
 
-    # 5. print results
-    results = construct_summary(
+    # 5. build the summary
+    return construct_summary(
         IF_WORDS_COUNT,
         ARUTW_WORDS_COUNT,
         IF_TOP_WORDS,
         ARUTW_TOP_WORDS,
         LOCAL_IP_ADDRESS,
     )
+
+
+def _walk(directory: str, include: str) -> Iterator[str]:
+    # lazy and sorted, a large tree is not listed up front
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            if fnmatch(name, include):
+                yield os.path.join(root, name)
+
+
+def iter_input_files(inputs: List[str], include: str = "*.txt") -> Iterator[str]:
+    """
+    Expands files, globs and directories into the files to count.
+
+    Directories are walked recursively and only their files matching the
+    `include` pattern are kept; files and glob matches are kept as they
+    are. Each file comes once, in sorted order per input.
+
+    Args:
+        inputs (List[str]): The files, glob patterns (with ** for any
+            depth) or directories.
+        include (str): The pattern of the file names kept in directories.
+
+    Returns:
+        Iterator[str]: The paths to the files.
+    """
+    seen = set()
+    for pattern in inputs:
+        if os.path.exists(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                print(f"no file matches {pattern}", file=sys.stderr)
+        for match in matches:
+            if os.path.isdir(match):
+                files = _walk(match, include)
+            else:
+                files = [match]
+            for file_path in files:
+                if file_path not in seen:
+                    seen.add(file_path)
+                    yield file_path
+
+
+def file_stats(
+    file_path: str, n: int, contractions: bool, use_mmap: bool, cache_dir: str
+) -> dict:
+    """
+    Counts the words of one file for the batch output.
+
+    Args:
+        file_path (str): The path to the file.
+        n (int): The number of top words to keep.
+        contractions (bool): Expand contractions before counting the words.
+        use_mmap (bool): Count with count_words_mmap.
+        cache_dir (str): Count through count_files_cached in this folder, if
+            set.
+
+    Returns:
+        dict: One row of BATCH_FIELDS, with the error instead of the counts
+            when the file cannot be read or decoded.
+    """
+    started = time.perf_counter()
+    row = {field: None for field in BATCH_FIELDS}
+    row["path"] = file_path
+    try:
+        row["bytes"] = os.path.getsize(file_path)
+        if use_mmap:
+            row["words"], top = count_words_mmap(file_path, n, contractions)
+        elif cache_dir:
+            [(row["words"], counts)] = count_files_cached(
+                [file_path], contractions, cache_dir, workers=1
+            )
+            top = counts.most_common(n)
+        else:
+            row["words"], counts = count_words(file_path, contractions)
+            top = counts.most_common(n)
+        row["top_words"] = [{"word": word, "count": count} for word, count in top]
+    except (OSError, UnicodeDecodeError) as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - started, 6)
+    return row
+
+
+def _group_files(file_paths: Iterable[str]) -> Iterator[List[str]]:
+    # consecutive files, up to TASK_BYTES or TASK_FILES per group
+    group, group_bytes = [], 0
+    for file_path in file_paths:
+        try:
+            group_bytes += os.path.getsize(file_path)
+        except OSError:
+            pass  # reported by file_stats
+        group.append(file_path)
+        if group_bytes >= TASK_BYTES or len(group) >= TASK_FILES:
+            yield group
+            group, group_bytes = [], 0
+    if group:
+        yield group
+
+
+def _group_stats(file_paths: List[str], options: tuple) -> List[dict]:
+    return [file_stats(file_path, *options) for file_path in file_paths]
+
+
+def iter_file_stats(
+    file_paths: Iterable[str],
+    n: int = 3,
+    contractions: bool = False,
+    workers: int = None,
+    use_mmap: bool = False,
+    cache_dir: str = None,
+) -> Iterator[dict]:
+    """
+    Counts many files in a process pool, yielding each row once it is done.
+
+    Small files go to the workers in groups (see TASK_BYTES), and at most two
+    groups per worker are queued, so the input can be a lazy walk over a
+    large tree. Rows come in the order the groups finish.
+
+    Args:
+        file_paths (Iterable[str]): The paths to the files.
+        n (int): The number of top words to keep.
+        contractions (bool): Expand contractions before counting the words.
+        workers (int): The number of processes, the number of CPUs if None.
+        use_mmap (bool): Count with count_words_mmap.
+        cache_dir (str): Count through count_files_cached in this folder, if
+            set.
+
+    Returns:
+        Iterator[dict]: The rows of file_stats.
+    """
+    workers = workers or os.cpu_count() or 1
+    options = (n, contractions, use_mmap, cache_dir)
+    if workers == 1:
+        for file_path in file_paths:
+            yield file_stats(file_path, *options)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for group in _group_files(file_paths):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            pending.add(pool.submit(_group_stats, group, options))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def write_rows(rows: Iterable[dict], output_format: str, stream, fields: List[str]):
+    """
+    Writes the batch rows to a stream as they come.
+
+    JSON lines and CSV are flushed after every row, parquet after every
+    PARQUET_BATCH_ROWS rows (one row group). Parquet needs pyarrow.
+
+    Args:
+        rows (Iterable[dict]): The rows, see file_stats.
+        output_format (str): "jsonl", "csv" or "parquet".
+        stream: The output, binary for parquet and text otherwise.
+        fields (List[str]): The columns to write.
+    """
+    if output_format == "jsonl":
+        for row in rows:
+            stream.write(json.dumps({field: row[field] for field in fields}) + "\n")
+            stream.flush()
+    elif output_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            out = row
+            if row["top_words"] is not None:
+                out = dict(row, top_words=json.dumps(row["top_words"]))
+            writer.writerow(out)
+            stream.flush()
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("parquet output needs pyarrow: pip install pyarrow")
+
+        types = {
+            "path": pa.string(),
+            "bytes": pa.int64(),
+            "words": pa.int64(),
+            "top_words": pa.list_(
+                pa.struct([("word", pa.string()), ("count", pa.int64())])
+            ),
+            "seconds": pa.float64(),
+            "error": pa.string(),
+            "host": pa.string(),
+            "ip_address": pa.string(),
+        }
+        schema = pa.schema([(field, types[field]) for field in fields])
+        with pq.ParquetWriter(stream, schema) as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= PARQUET_BATCH_ROWS:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def run_report(data_path: str):
+    """
+    Counts IF.txt and AlwaysRememberUsThisWay.txt of `data_path`, prints the
+    summary and writes it to output/result.txt.
+
+    Args:
+        data_path (str): The folder that holds the two text files.
+    """
+    IF_FILE_PATH_1 = data_path + "/IF.txt"
+    ARUTW_FILE_PATH_2 = data_path + "/AlwaysRememberUsThisWay.txt"
+
+    FILE_PATHS = [IF_FILE_PATH_1, ARUTW_FILE_PATH_2]
+    # contractions are handled for the ARUTW top words only, not its count
+    CONTRACTIONS_BY_FILE = [False, True]
+    # replicas sharing this folder split the work, one of them writes the report
+    COORDINATION_DIR = os.environ.get("COORDINATION_DIR")
+    # counts of unchanged (or appended to) files are reused from here
+    CACHE_DIR = os.environ.get("CACHE_DIR", f"{data_path}/output/cache")
+
+    # 0-5. stream, sanitize and count the words of the text files (in parallel
+    # when they are large, or across replicas, or from the cache) and build
+    # the summary
+    if COORDINATION_DIR:
+        results, merged = count_files_distributed(
+            FILE_PATHS, CONTRACTIONS_BY_FILE, COORDINATION_DIR, build_summary
+        )
+    else:
+        results = build_summary(
+            count_files_cached(FILE_PATHS, CONTRACTIONS_BY_FILE, CACHE_DIR)
+        )
+        merged = True
     print(results)
 
-    # 6. print result to an output file
+    # 6. print result to an output file, only from the replica that merged
     # create folder if not exists
-    if not os.path.exists(f"{DATA_PATH}/output"):
-        os.makedirs(f"{DATA_PATH}/output")
-    with open(f"{DATA_PATH}/output/result.txt", "w") as f:
-        f.write(results)
+    if merged:
+        if not os.path.exists(f"{data_path}/output"):
+            os.makedirs(f"{data_path}/output")
+        _write_atomic(f"{data_path}/output/result.txt", results)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Counts the files of the inputs and writes one row per file.
+
+    Args:
+        args (argparse.Namespace): The parsed command line, see main.
+
+    Returns:
+        int: The exit code, 1 if a file could not be counted.
+    """
+    fields = BATCH_FIELDS + (SYSTEM_FIELDS if args.system_info else [])
+    system = {}
+    if args.system_info:
+        system = {"host": socket.gethostname(), "ip_address": get_id_address()}
+
+    started = time.perf_counter()
+    totals = {"files": 0, "words": 0, "errors": 0}
+
+    def tally(rows: Iterator[dict]) -> Iterator[dict]:
+        for row in rows:
+            totals["files"] += 1
+            totals["words"] += row["words"] or 0
+            totals["errors"] += row["error"] is not None
+            yield dict(row, **system)
+
+    rows = tally(
+        iter_file_stats(
+            iter_input_files(args.inputs, args.include),
+            args.top,
+            args.contractions,
+            args.workers,
+            args.mmap,
+            args.cache_dir,
+        )
+    )
+    binary = args.format == "parquet"
+    if args.output == "-":
+        output = nullcontext(sys.stdout.buffer if binary else sys.stdout)
+    elif binary:
+        output = open(args.output, "wb")
+    else:
+        # csv writes its own line endings
+        output = open(args.output, "w", newline="")
+    try:
+        with output as stream:
+            write_rows(rows, args.format, stream, fields)
+    except BrokenPipeError:
+        # the reader went away (e.g. | head), stop without a traceback
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+    print(
+        f"{totals['files']} files, {totals['words']} words, "
+        f"{totals['errors']} errors in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if totals["errors"] else 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Word counts of text files. Without inputs, counts IF.txt "
+        "and AlwaysRememberUsThisWay.txt of --data-path into a summary report; "
+        "with inputs, writes one row per file (path, bytes, words, top words).",
+    )
+    parser.add_argument(
+        "inputs", nargs="*", help="files, globs (** for any depth) or directories"
+    )
+    parser.add_argument(
+        "--data-path",
+        default=os.environ.get("DATA_PATH", "/home/data"),
+        help="folder of the summary report (default: $DATA_PATH or /home/data)",
+    )
+    parser.add_argument(
+        "--include",
+        default="*.txt",
+        help="file names kept when walking directories (default: *.txt)",
+    )
+    parser.add_argument(
+        "--format", choices=["jsonl", "csv", "parquet"], default="jsonl"
+    )
+    parser.add_argument("-o", "--output", default="-", help="file, or - for stdout")
+    parser.add_argument("--top", type=int, default=3, help="top words per file")
+    parser.add_argument("--contractions", action="store_true")
+    parser.add_argument(
+        "--workers", type=int, help="processes (default: the number of CPUs)"
+    )
+    parser.add_argument(
+        "--mmap", action="store_true", help="count on bytes (UTF-8 corpora)"
+    )
+    parser.add_argument("--cache-dir", help="reuse the counts of unchanged files")
+    parser.add_argument(
+        "--system-info",
+        action="store_true",
+        help="add the host name and IP address to every row",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.inputs:
+        run_report(args.data_path)
+        return 0
+    if args.mmap and args.cache_dir:
+        parser.error("--mmap and --cache-dir cannot be combined")
+    return run_batch(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Time of the weather pipeline under Spark execution profiles, as the data grows.
+
+Writes synthetic NCEI-format CSVs for the given numbers of stations (one
+row per day, with the missing-value sentinels), ingests them into a
+Parquet lake, then runs weather.pipeline.run on all of it in a fresh
+process (a new JVM) per profile:
+
+    notebook   the notebook's old session: .master("local"), Spark defaults
+               (200 shuffle partitions, Arrow off)
+    local-N    weather.session.create_session(cores=N): local[N], shuffle
+               partitions sized to the lake, AQE coalescing and skew joins,
+               Arrow for toPandas
+
+Every run prints the pipeline time and its tasks, then the time of toPandas
+of the cleaned rows without and with Arrow. All runs of a size must agree
+on the number of result rows.
+
+Usage:
+    uv run python bench_spark.py --stations 10 100 --cores 1 2 4 8
+    uv run python bench_spark.py --stations 500 --cores 8 --skip-notebook
+"""
+
+import argparse
+import csv
+import datetime
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pyspark.sql import SparkSession
+
+from weather.ingest import ingest
+from weather.pipeline import load_base, run
+from weather.session import create_session
+
+START_YEAR = 2015
+END_YEAR = 2024
+HEADER = [
+    "STATION",
+    "DATE",
+    "LATITUDE",
+    "LONGITUDE",
+    "ELEVATION",
+    "NAME",
+    "TEMP",
+    "TEMP_ATTRIBUTES",
+    "DEWP",
+    "DEWP_ATTRIBUTES",
+    "SLP",
+    "SLP_ATTRIBUTES",
+    "STP",
+    "STP_ATTRIBUTES",
+    "VISIB",
+    "VISIB_ATTRIBUTES",
+    "WDSP",
+    "WDSP_ATTRIBUTES",
+    "MXSPD",
+    "GUST",
+    "MAX",
+    "MAX_ATTRIBUTES",
+    "MIN",
+    "MIN_ATTRIBUTES",
+    "PRCP",
+    "PRCP_ATTRIBUTES",
+    "SNDP",
+    "FRSHTT",
+]
+FRSHTT_VALUES = ["000000", "000000", "000000", "010000", "100000", "010010"]
+
+
+def make_csvs(csv_dir: str, stations: int, seed: int = 1):
+    """Write year=YYYY/{station}.csv files for START_YEAR to END_YEAR."""
+    rnd = random.Random(seed)
+
+    def value(number: float, sentinel: float, missing: float, fmt: str) -> str:
+        return format(sentinel if rnd.random() < missing else number, fmt)
+
+    for index in range(stations):
+        station = f"7{index:010d}"
+        for year in range(START_YEAR, END_YEAR + 1):
+            os.makedirs(os.path.join(csv_dir, f"year={year}"), exist_ok=True)
+            path = os.path.join(csv_dir, f"year={year}", f"{station}.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+                writer.writerow(HEADER)
+                day = datetime.date(year, 1, 1)
+                while day.year == year:
+                    # a seasonal curve plus noise, in °F
+                    temp = 55 + 25 * math.sin((day.timetuple().tm_yday - 100) / 58)
+                    temp += rnd.uniform(-10, 10)
+                    writer.writerow(
+                        [
+                            station,
+                            day.isoformat(),
+                            "39.10333",
+                            "-84.41861",
+                            "149.4",
+                            f"SYNTHETIC {index}, XX US",
+                            value(temp, 9999.9, 0.01, "8.1f"),
+                            "24",
+                            value(temp - 8, 9999.9, 0.05, "8.1f"),
+                            "24",
+                            value(1015.2, 9999.9, 0.3, "6.1f"),
+                            "24",
+                            "999.9",
+                            "24",
+                            value(9.9, 999.9, 0.05, "5.1f"),
+                            "24",
+                            value(rnd.uniform(0, 15), 999.9, 0.05, "5.1f"),
+                            "24",
+                            value(rnd.uniform(5, 25), 999.9, 0.05, "5.1f"),
+                            value(rnd.uniform(10, 40), 999.9, 0.4, "5.1f"),
+                            value(temp + rnd.uniform(3, 12), 9999.9, 0.05, "8.1f"),
+                            rnd.choice(["*", " "]),
+                            value(temp - rnd.uniform(3, 12), 9999.9, 0.05, "8.1f"),
+                            rnd.choice(["*", " "]),
+                            value(
+                                rnd.choice([0, 0, 0, rnd.uniform(0, 2)]),
+                                99.99,
+                                0.1,
+                                "5.2f",
+                            ),
+                            rnd.choice("GIA"),
+                            value(rnd.uniform(0, 5), 999.9, 0.8, "5.1f"),
+                            rnd.choice(FRSHTT_VALUES),
+                        ]
+                    )
+                    day += datetime.timedelta(days=1)
+
+
+def session(profile: str, cores: int, lake_dir: str) -> SparkSession:
+    if profile == "notebook":
+        spark = (
+            SparkSession.builder.appName("NCEI_Weather_Bench")
+            .master("local")
+            .getOrCreate()
+        )
+        spark.sparkContext.setLogLevel("ERROR")
+        return spark
+    return create_session("NCEI_Weather_Bench", cores, [lake_dir])
+
+
+def to_pandas_seconds(spark: SparkSession, lake_dir: str, arrow: bool) -> float:
+    spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", str(arrow).lower())
+    started = time.perf_counter()
+    load_base(spark, None, None, None, "lake", lake_dir).toPandas()
+    return time.perf_counter() - started
+
+
+def run_profile(profile: str, cores: int, lake_dir: str):
+    spark = session(profile, cores, lake_dir)
+    try:
+        partitions = spark.conf.get("spark.sql.shuffle.partitions")
+        results, timings = run(spark, None, None, None, lake_dir=lake_dir)
+        total = timings[-1]
+        rows = sum(len(rows) for rows in results.values())
+        plain = to_pandas_seconds(spark, lake_dir, False)
+        arrow = to_pandas_seconds(spark, lake_dir, True)
+    finally:
+        spark.stop()
+    label = profile if profile == "notebook" else f"local-{cores}"
+    print(
+        f"{label:<9} partitions={partitions:>4}  rows={rows}  "
+        f"pipeline={total.seconds:6.2f}s  tasks={total.tasks:>5}  "
+        f"toPandas={plain:6.2f}s  arrow={arrow:6.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--cores", type=int, nargs="+", default=[os.cpu_count()])
+    parser.add_argument("--skip-notebook", action="store_true")
+    parser.add_argument("--profile", choices=["notebook", "local"])
+    parser.add_argument("--lake-dir")
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args.profile, args.cores[0], args.lake_dir)
+        sys.exit(0)
+
+    tmp_dir = tempfile.mkdtemp(prefix="bench_spark_")
+    try:
+        for stations in args.stations:
+            csv_dir = os.path.join(tmp_dir, f"csv_{stations}")
+            lake_dir = os.path.join(tmp_dir, f"lake_{stations}")
+            make_csvs(csv_dir, stations)
+            spark = create_session("NCEI_Weather_Bench", input_paths=[csv_dir])
+            try:
+                ingest(spark, csv_dir, lake_dir)
+            finally:
+                spark.stop()
+            print(f"\nstations={stations} years={START_YEAR}-{END_YEAR}")
+            runs = [("local", cores) for cores in args.cores]
+            if not args.skip_notebook:
+                runs.insert(0, ("notebook", 1))
+            for profile, cores in runs:
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__)]
+                    + ["--profile", profile, "--cores", str(cores)]
+                    + ["--lake-dir", lake_dir],
+                    check=True,
+                )
+            shutil.rmtree(csv_dir)
+            shutil.rmtree(lake_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,266 @@
+"""
+Tests of weather.download against a local stand-in for the NCEI server.
+
+FixtureServer serves files from a dict on 127.0.0.1 (port 0, HTTP/1.1
+keep-alive), answers conditional requests with 304 and 404s anything it
+does not know. Scripted responses (errors, short bodies, dropped
+connections) are queued per path and played before the normal answer.
+
+Run:
+    uv run python -m unittest discover -s tests
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from weather import download
+
+STATION = "72429793812"
+YEAR = 2020
+BODY = b'"STATION","DATE","TEMP"\n"72429793812","2020-01-01","   33.1"\n'
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+@dataclass
+class Scripted:
+    """One response played instead of the normal answer.
+
+    content_length overrides the Content-Length header (a lie when it does
+    not match body), drop closes the connection after the response without
+    telling the client.
+    """
+
+    status: int
+    body: bytes = b""
+    headers: dict = field(default_factory=dict)
+    content_length: int | None = None
+    drop: bool = False
+
+
+class FixtureServer:
+    """NCEI stand-in: files[path] = (body, etag), script[path] = [Scripted]."""
+
+    def __init__(self):
+        self.files = {}
+        self.script = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with fixture._lock:
+                    fixture.requests.append((self.path, dict(self.headers)))
+                    queued = fixture.script.get(self.path)
+                    scripted = queued.pop(0) if queued else None
+                if scripted is not None:
+                    self._send(
+                        scripted.status,
+                        scripted.body,
+                        scripted.headers,
+                        scripted.content_length,
+                    )
+                    # close without a Connection: close header
+                    self.close_connection = scripted.drop or (
+                        scripted.content_length is not None
+                    )
+                    return
+                if self.path not in fixture.files:
+                    self._send(404, b"not found")
+                    return
+                body, etag = fixture.files[self.path]
+                headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED}
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", headers)
+                else:
+                    self._send(200, body, headers)
+
+            def _send(self, status, body, headers=None, content_length=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                length = len(body) if content_length is None else content_length
+                self.send_header("Content-Length", str(length))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def path_of(self, station: str = STATION, year: int = YEAR) -> str:
+        return f"/{year}/{station}.csv"
+
+    def requests_to(self, path: str) -> list[dict]:
+        return [headers for p, headers in self.requests if p == path]
+
+
+class DownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FixtureServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.path = self.server.path_of()
+        self.server.files[self.path] = (BODY, ETAG)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output_dir = tmp.name
+        self.local_path = os.path.join(
+            self.output_dir, download.file_key(STATION, YEAR)
+        )
+
+    def download(self, **kwargs) -> download.Result:
+        options = {"workers": 2, "retries": 2, "backoff": 0.01, "timeout": 5}
+        options.update(kwargs)
+        results = download.download_weather_data(
+            [STATION],
+            YEAR,
+            YEAR,
+            self.output_dir,
+            base_url=self.server.base_url,
+            **options,
+        )
+        self.assertEqual(len(results), 1)
+        return results[0]
+
+    def manifest(self) -> dict:
+        manifest_path = os.path.join(self.output_dir, download.MANIFEST_NAME)
+        with open(manifest_path) as f:
+            return json.load(f)["files"]
+
+    def read_local(self) -> bytes:
+        with open(self.local_path, "rb") as f:
+            return f.read()
+
+    def test_first_download(self):
+        result = self.download()
+        self.assertEqual(result.status, "downloaded")
+        self.assertEqual(self.read_local(), BODY)
+        entry = self.manifest()[download.file_key(STATION, YEAR)]
+        self.assertEqual(entry["etag"], ETAG)
+        self.assertEqual(entry["last_modified"], LAST_MODIFIED)
+        self.assertEqual(entry["size"], len(BODY))
+        self.assertEqual(entry["sha256"], download.sha256_file(self.local_path))
+        self.assertFalse(os.path.exists(self.local_path + ".part"))
+
+    def test_rerun_is_revalidated_with_304(self):
+        self.download()
+        result = self.download()
+        self.assertEqual(result.status, "not_modified")
+        self.assertEqual(self.read_local(), BODY)
+        first, second = self.server.requests_to(self.path)
+        self.assertNotIn("If-None-Match", first)
+        self.assertEqual(second["If-None-Match"], ETAG)
+        self.assertEqual(second["If-Modified-Since"], LAST_MODIFIED)
+
+    def test_short_body_is_retried(self):
+        # Content-Length promises more than is sent, then the socket closes
+        self.server.script[self.path] = [
+            Scripted(200, BODY[:10], {"ETag": ETAG}, content_length=len(BODY))
+        ]
+        result = self.download()
+        self.assertEqual(result.status, "downloaded")
+        self.assertEqual(self.read_local(), BODY)
+        self.assertEqual(len(self.server.requests_to(self.path)), 2)
+
+    def test_short_body_keeps_the_previous_copy(self):
+        self.download()
+        self.server.files[self.path] = (BODY + b"new row\n", '"v2"')
+        self.server.script[self.path] = [
+            Scripted(200, b"partial", {"ETag": '"v2"'}, content_length=100)
+        ]
+        result = self.download(retries=0)
+        self.assertEqual(result.status, "failed")
+        self.assertIn("IncompleteRead", result.error)
+        # the truncated body never replaces the verified copy
+        self.assertEqual(self.read_local(), BODY)
+        self.assertFalse(os.path.exists(self.local_path + ".part"))
+        self.assertEqual(
+            self.manifest()[download.file_key(STATION, YEAR)]["etag"], ETAG
+        )
+
+    def test_corrupted_copy_and_stale_part_are_replaced(self):
+        self.download()
+        with open(self.local_path, "r+b") as f:
+            f.write(b"X")
+        with open(self.local_path + ".part", "wb") as f:
+            f.write(b"left by an interrupted run")
+        result = self.download()
+        self.assertEqual(result.status, "downloaded")
+        self.assertEqual(self.read_local(), BODY)
+        self.assertFalse(os.path.exists(self.local_path + ".part"))
+        # the edited file fails its checksum, so no conditional request
+        self.assertNotIn("If-None-Match", self.server.requests_to(self.path)[-1])
+
+    def test_503_is_retried_after_retry_after(self):
+        self.server.script[self.path] = [Scripted(503, headers={"Retry-After": "1"})]
+        started = time.monotonic()
+        result = self.download()
+        self.assertEqual(result.status, "downloaded")
+        self.assertGreaterEqual(time.monotonic() - started, 1.0)
+        self.assertEqual(len(self.server.requests_to(self.path)), 2)
+
+    def test_503_gives_up_after_the_retries(self):
+        self.server.script[self.path] = [Scripted(503) for _ in range(3)]
+        result = self.download(retries=2)
+        self.assertEqual(result.status, "failed")
+        self.assertEqual(result.error, "HTTP 503 Service Unavailable")
+        self.assertEqual(len(self.server.requests_to(self.path)), 3)
+        self.assertFalse(os.path.exists(self.local_path))
+
+    def test_dropped_keep_alive_connection_is_reopened(self):
+        other = self.server.path_of(year=YEAR + 1)
+        self.server.files[other] = (BODY, ETAG)
+        # served fine, then the server closes the idle kept-alive socket
+        self.server.script[self.path] = [Scripted(200, BODY, {"ETag": ETAG}, drop=True)]
+        pool = download.ConnectionPool(timeout=5)
+        self.addCleanup(pool.close)
+        first = download.fetch(
+            pool, self.server.base_url + self.path, self.local_path, retries=0
+        )
+        second = download.fetch(
+            pool,
+            self.server.base_url + other,
+            os.path.join(self.output_dir, download.file_key(STATION, YEAR + 1)),
+            retries=0,
+        )
+        # not counted as a failed attempt, even with no retries left
+        self.assertEqual(first[0], "downloaded")
+        self.assertEqual(second[0], "downloaded")
+
+    def test_404_is_reported_missing(self):
+        del self.server.files[self.path]
+        result = self.download()
+        self.assertEqual(result.status, "missing")
+        self.assertIsNone(result.error)
+        self.assertFalse(os.path.exists(self.local_path))
+        # a station without data that year is not retried
+        self.assertEqual(len(self.server.requests_to(self.path)), 1)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(download.print_results([result]), {"missing": 1})
+        self.assertIn("does not exist (404)", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+"""NCEI Global Summary of the Day: download, ingest and analytics."""
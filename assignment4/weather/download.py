@@ -0,0 +1,384 @@
+"""
+Parallel, resumable download of NCEI Global Summary of the Day CSVs.
+
+Files are saved as `{output_dir}/year=YYYY/{station}.csv`, the layout the
+notebook reads with `basePath`. Station-years are fetched by a bounded
+thread pool, and each thread keeps one connection per host alive.
+
+`{output_dir}/_manifest.json` records the ETag, Last-Modified, size and
+sha256 of every downloaded file. On the next run, a file that still matches
+its checksum is revalidated with a conditional request, so an unchanged
+file costs a 304 and no body. A file that is missing, truncated or edited
+is downloaded again. Spark skips files starting with `_`, so the manifest
+can stay in the data folder.
+
+Failed requests (connection errors, 429 and 5xx) are retried with
+exponential backoff and jitter. A 404 means the station has no data for
+that year (e.g. Florida 2016) and is not retried.
+
+Usage:
+    uv run python -m weather.download --stations 72429793812 99495199999 \\
+        --start-year 2015 --end-year 2024 --output-dir data/
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from rich import print
+
+BASE_URL = os.environ.get(
+    "NCEI_BASE_URL",
+    "https://www.ncei.noaa.gov/data/global-summary-of-the-day/access",
+)
+# concurrent requests, and so kept-alive connections per host
+WORKERS = 8
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+# retries after the first attempt, the delay doubles from BACKOFF seconds
+MAX_RETRIES = 4
+BACKOFF = 0.5
+TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+# transient server answers; anything else (e.g. 403) fails right away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# seconds between manifest saves while downloads are running
+SAVE_INTERVAL = 1.0
+
+
+@dataclass
+class Result:
+    """Outcome of one station-year.
+
+    status is "downloaded", "not_modified", "missing" (404) or "failed".
+    """
+
+    station: str
+    year: int
+    path: str
+    status: str
+    entry: dict | None = None
+    error: str | None = None
+
+
+class ConnectionPool:
+    """One kept-alive HTTP(S) connection per thread and host.
+
+    The pool is bounded by the threads using it, so a ThreadPoolExecutor
+    of N workers opens at most N connections to the NCEI host.
+    """
+
+    def __init__(self, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = []
+
+    def get(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        connections = self._local.__dict__.setdefault("connections", {})
+        conn = connections.get((scheme, netloc))
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            connections[(scheme, netloc)] = conn
+            with self._lock:
+                self._opened.append(conn)
+        return conn
+
+    def discard(self, scheme: str, netloc: str):
+        conn = self._local.__dict__.get("connections", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+
+
+def file_url(station: str, year: int, base_url: str = BASE_URL) -> str:
+    return f"{base_url.rstrip('/')}/{year}/{station}.csv"
+
+
+def file_key(station: str, year: int) -> str:
+    """Path of a station-year under the output folder, the manifest key."""
+    return f"year={year}/{station}.csv"
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_verified(path: str, entry: dict | None) -> bool:
+    """Whether path holds exactly the file recorded in its manifest entry."""
+    if not entry or not os.path.exists(path):
+        return False
+    if os.path.getsize(path) != entry["size"]:
+        return False
+    return sha256_file(path) == entry["sha256"]
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict):
+    """Write the manifest through a temporary file, so it is never torn."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _save_body(response: http.client.HTTPResponse, path: str, url: str) -> dict:
+    """Stream a 200 response to path and return its manifest entry."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    with open(part_path, "wb") as f:
+        while chunk := response.read(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    # read(amt) just stops when the server drops the connection mid-body
+    expected = response.getheader("Content-Length")
+    if expected is not None and size != int(expected):
+        raise http.client.IncompleteRead(b"", int(expected) - size)
+    # the old copy is only replaced by a complete file
+    os.replace(part_path, path)
+    return {
+        "url": url,
+        "etag": response.getheader("ETag"),
+        "last_modified": response.getheader("Last-Modified"),
+        "size": size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+def fetch(
+    pool: ConnectionPool,
+    url: str,
+    path: str,
+    entry: dict | None = None,
+    retries: int = MAX_RETRIES,
+    backoff: float = BACKOFF,
+) -> tuple[str, dict | None, str | None]:
+    """
+    GET url into path, conditionally when entry describes the local copy.
+
+    Args:
+        pool (ConnectionPool): Connections of the calling thread.
+        url (str): The file to download.
+        path (str): Where to save it.
+        entry (dict): Manifest entry of a verified local copy, or None.
+        retries (int): Retries of connection errors and RETRY_STATUSES.
+        backoff (float): First retry delay in seconds, doubled each retry.
+
+    Returns:
+        tuple: (status, manifest entry, error message)
+    """
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    headers = {"Accept-Encoding": "identity"}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    attempt = 0
+    while True:
+        delay = backoff * 2**attempt * random.uniform(0.5, 1.5)
+        conn = pool.get(parts.scheme, parts.netloc)
+        reused = conn.sock is not None
+        try:
+            conn.request("GET", target, headers=headers)
+            response = conn.getresponse()
+            if response.status == 200:
+                return "downloaded", _save_body(response, path, url), None
+            response.read()
+            if response.status == 304 and entry:
+                return "not_modified", entry, None
+            if response.status == 404:
+                return "missing", None, None
+            error = f"HTTP {response.status} {response.reason}"
+            if response.status not in RETRY_STATUSES:
+                return "failed", None, error
+            retry_after = response.getheader("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+        except (OSError, http.client.HTTPException) as e:
+            pool.discard(parts.scheme, parts.netloc)
+            if reused and isinstance(e, (ConnectionError, http.client.BadStatusLine)):
+                # the server closed the idle kept-alive socket, not a failure
+                continue
+            error = f"{type(e).__name__}: {e}"
+        if attempt >= retries:
+            if os.path.exists(path + ".part"):
+                os.remove(path + ".part")
+            return "failed", None, error
+        attempt += 1
+        time.sleep(delay)
+
+
+def _download_one(
+    pool: ConnectionPool,
+    station: str,
+    year: int,
+    output_dir: str,
+    entry: dict | None,
+    base_url: str,
+    retries: int,
+    backoff: float,
+) -> Result:
+    path = os.path.join(output_dir, file_key(station, year))
+    if not is_verified(path, entry):
+        # no usable local copy, ask for the whole file
+        entry = None
+    status, entry, error = fetch(
+        pool, file_url(station, year, base_url), path, entry, retries, backoff
+    )
+    return Result(station, year, path, status, entry, error)
+
+
+def download_weather_data(
+    stations: list[str],
+    start_year: int,
+    end_year: int,
+    output_dir: str = "data/",
+    workers: int = WORKERS,
+    base_url: str = BASE_URL,
+    retries: int = MAX_RETRIES,
+    backoff: float = BACKOFF,
+    timeout: float = TIMEOUT,
+) -> list[Result]:
+    """
+    Downloads weather data for the given stations and years into
+    `{output_dir}/year=YYYY/{station}.csv`, resuming from the manifest.
+
+    Args:
+        stations (list): NCEI station codes, e.g. "72429793812".
+        start_year (int): The first year to download.
+        end_year (int): The last year to download (inclusive).
+        output_dir (str): The data folder, the manifest is kept in it.
+        workers (int): Concurrent requests.
+        base_url (str): Root of the per-year NCEI folders.
+        retries (int): Retries of a failed request.
+        backoff (float): First retry delay in seconds.
+        timeout (float): Socket timeout in seconds.
+
+    Returns:
+        list: One Result per station-year, in station then year order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    files = manifest["files"]
+    jobs = [(s, y) for s in stations for y in range(start_year, end_year + 1)]
+    results = {}
+
+    pool = ConnectionPool(timeout)
+    dirty = False
+    saved_at = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _download_one,
+                    pool,
+                    station,
+                    year,
+                    output_dir,
+                    files.get(file_key(station, year)),
+                    base_url,
+                    retries,
+                    backoff,
+                )
+                for station, year in jobs
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results[(result.station, result.year)] = result
+                if result.status == "downloaded":
+                    files[file_key(result.station, result.year)] = result.entry
+                    dirty = True
+                if dirty and time.monotonic() - saved_at >= SAVE_INTERVAL:
+                    save_manifest(manifest_path, manifest)
+                    dirty, saved_at = False, time.monotonic()
+    finally:
+        # keep what finished, even when interrupted
+        if dirty:
+            save_manifest(manifest_path, manifest)
+        pool.close()
+    return [results[job] for job in jobs if job in results]
+
+
+def print_results(results: list[Result]) -> dict:
+    """Print one line per station-year and return the count per status."""
+    counts = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+        if r.status == "downloaded":
+            print(f"[green](*)[/green] {r.station} {r.year} downloaded to {r.path}")
+        elif r.status == "not_modified":
+            print(f"[green](*)[/green] {r.station} {r.year} is up to date")
+        elif r.status == "missing":
+            print(f"[yellow](-)[/yellow] {r.station} {r.year} does not exist (404)")
+        else:
+            print(f"[red](!)[/red] {r.station} {r.year} failed: {r.error}")
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--stations", nargs="+", required=True)
+    parser.add_argument("--start-year", type=int, required=True)
+    parser.add_argument("--end-year", type=int, required=True)
+    parser.add_argument("--output-dir", default="data/")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = download_weather_data(
+        args.stations,
+        args.start_year,
+        args.end_year,
+        args.output_dir,
+        workers=args.workers,
+        base_url=args.base_url,
+        retries=args.retries,
+    )
+    counts = print_results(results)
+    print(f"{counts} in {time.perf_counter() - started:.1f}s")
+    return 1 if counts.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
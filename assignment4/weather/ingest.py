@@ -0,0 +1,251 @@
+"""
+Ingest the downloaded NCEI CSVs into a typed, partitioned Parquet lake.
+
+The CSVs are read once with the schema documented in README.md, instead
+of `inferSchema=True` (an extra pass over every file, and types that can
+differ from file to file). The 9999.9 / 99.99 / 999.9 missing-value
+sentinels are replaced by null here, so readers of the lake get clean
+columns without rebuilding the cleanup in every session.
+
+The lake is partitioned by `year` and `STATION`, one file per partition
+sorted by DATE. A filter on year or STATION only opens the matching
+folders, and the Parquet min/max statistics let other filters (e.g. on
+DATE) skip row groups. Only the columns a query uses are read.
+Re-ingesting some stations or years only replaces their partitions.
+
+Usage:
+    uv run python -m weather.ingest --csv-dir data/ --lake-dir lake/
+    uv run python -m weather.ingest --stations 72429793812 --start-year 2024
+"""
+
+import argparse
+import time
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    DateType,
+    DoubleType,
+    IntegerType,
+    LongType,
+    StringType,
+    StructField,
+    StructType,
+)
+from rich import print
+
+from .session import create_session
+
+CSV_DIR = "data/"
+LAKE_DIR = "lake/"
+# the columns of the NCEI CSVs, in file order (see README.md)
+CSV_SCHEMA = StructType(
+    [
+        StructField("STATION", LongType(), True),
+        StructField("DATE", DateType(), True),
+        StructField("LATITUDE", DoubleType(), True),
+        StructField("LONGITUDE", DoubleType(), True),
+        StructField("ELEVATION", DoubleType(), True),
+        StructField("NAME", StringType(), True),
+        StructField("TEMP", DoubleType(), True),
+        StructField("TEMP_ATTRIBUTES", IntegerType(), True),
+        StructField("DEWP", DoubleType(), True),
+        StructField("DEWP_ATTRIBUTES", IntegerType(), True),
+        StructField("SLP", DoubleType(), True),
+        StructField("SLP_ATTRIBUTES", IntegerType(), True),
+        StructField("STP", DoubleType(), True),
+        StructField("STP_ATTRIBUTES", IntegerType(), True),
+        StructField("VISIB", DoubleType(), True),
+        StructField("VISIB_ATTRIBUTES", IntegerType(), True),
+        StructField("WDSP", DoubleType(), True),
+        StructField("WDSP_ATTRIBUTES", IntegerType(), True),
+        StructField("MXSPD", DoubleType(), True),
+        StructField("GUST", DoubleType(), True),
+        StructField("MAX", DoubleType(), True),
+        StructField("MAX_ATTRIBUTES", StringType(), True),
+        StructField("MIN", DoubleType(), True),
+        StructField("MIN_ATTRIBUTES", StringType(), True),
+        StructField("PRCP", DoubleType(), True),
+        StructField("PRCP_ATTRIBUTES", StringType(), True),
+        StructField("SNDP", DoubleType(), True),
+        StructField("FRSHTT", IntegerType(), True),
+    ]
+)
+PARTITION_COLUMNS = ["year", "STATION"]
+# the lake holds the CSV columns plus the year partition column
+LAKE_SCHEMA = StructType(CSV_SCHEMA.fields + [StructField("year", IntegerType())])
+# values NCEI writes for "missing", per column
+NULL_9999 = [9999.9]
+NULL_99 = [99.99]
+NULL_999 = [999.9, 999.0]
+NULL_SENTINELS = {
+    **{name: NULL_9999 for name in ["TEMP", "DEWP", "SLP", "STP", "MAX", "MIN"]},
+    **{name: NULL_99 for name in ["PRCP"]},
+    **{name: NULL_999 for name in ["SNDP", "VISIB", "WDSP", "MXSPD", "GUST"]},
+}
+
+
+def csv_glob(
+    csv_dir: str,
+    stations: list[str] | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+) -> str:
+    """
+    Glob of the downloaded CSVs to ingest. Alternatives in braces may match
+    nothing, as NCEI has no file for some station-years (e.g. Florida 2016).
+    """
+    if start_year is None and end_year is None:
+        years = "*"
+    else:
+        # open ends are filled from what NCEI publishes (1929 to now)
+        first = start_year if start_year is not None else 1929
+        last = end_year if end_year is not None else time.localtime().tm_year
+        years = "{" + ",".join(str(y) for y in range(first, last + 1)) + "}"
+    names = "{" + ",".join(stations) + "}" if stations else "*"
+    return f"{csv_dir.rstrip('/')}/year={years}/{names}.csv"
+
+
+def clean(df: DataFrame) -> DataFrame:
+    """Replace the missing-value sentinels (see NULL_SENTINELS) with null."""
+    return df.select(
+        *[
+            F.when(F.col(name).isin(NULL_SENTINELS[name]), None)
+            .otherwise(F.col(name))
+            .alias(name)
+            if name in NULL_SENTINELS
+            else F.col(name)
+            for name in df.columns
+        ]
+    )
+
+
+def read_csv(spark: SparkSession, paths: str | list[str]) -> DataFrame:
+    """
+    Reads NCEI CSVs with CSV_SCHEMA, adding the year of DATE.
+
+    Args:
+        spark (SparkSession): The session to read with.
+        paths (str | list): CSV files or glob patterns.
+
+    Returns:
+        DataFrame: The raw rows, sentinels included.
+    """
+    return (
+        spark.read.option("header", True)
+        # fail on a renamed or reordered column instead of mislabelling it
+        .option("enforceSchema", False)
+        .option("mode", "FAILFAST")
+        .schema(CSV_SCHEMA)
+        .csv(paths)
+        .withColumn("year", F.year("DATE"))
+    )
+
+
+def ingest(
+    spark: SparkSession,
+    csv_dir: str = CSV_DIR,
+    lake_dir: str = LAKE_DIR,
+    stations: list[str] | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+    compression: str = "zstd",
+):
+    """
+    Converts the downloaded CSVs into the Parquet lake, replacing only
+    the year/STATION partitions that are ingested again.
+
+    Args:
+        spark (SparkSession): The session to run the conversion with.
+        csv_dir (str): The download folder, `year=YYYY/{station}.csv`.
+        lake_dir (str): The Parquet lake to write.
+        stations (list): Station codes to ingest, all when None.
+        start_year (int): The first year to ingest, from the oldest if None.
+        end_year (int): The last year to ingest, up to the newest if None.
+        compression (str): Parquet codec.
+    """
+    df = clean(read_csv(spark, csv_glob(csv_dir, stations, start_year, end_year)))
+    (
+        df.repartition(*PARTITION_COLUMNS)
+        # sorted files make tight DATE min/max statistics per row group
+        .sortWithinPartitions("DATE")
+        .write.mode("overwrite")
+        .option("partitionOverwriteMode", "dynamic")
+        .option("compression", compression)
+        .partitionBy(*PARTITION_COLUMNS)
+        .parquet(lake_dir)
+    )
+
+
+def read_lake(
+    spark: SparkSession,
+    lake_dir: str = LAKE_DIR,
+    stations: list[str] | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+) -> DataFrame:
+    """
+    Reads the cleaned rows from the lake. Station and year bounds are
+    partition filters, so only the matching folders are listed and read.
+
+    Args:
+        spark (SparkSession): The session to read with.
+        lake_dir (str): The Parquet lake written by ingest.
+        stations (list): Station codes to keep, all when None.
+        start_year (int): The first year to keep, or None.
+        end_year (int): The last year to keep (inclusive), or None.
+
+    Returns:
+        DataFrame: Rows with LAKE_SCHEMA columns.
+    """
+    # the schema keeps the partition columns typed as documented, the
+    # select puts STATION back first (partition columns are read last)
+    df = spark.read.schema(LAKE_SCHEMA).parquet(lake_dir)
+    df = df.select(*LAKE_SCHEMA.fieldNames())
+    if stations:
+        df = df.filter(F.col("STATION").isin([int(s) for s in stations]))
+    if start_year is not None:
+        df = df.filter(F.col("year") >= start_year)
+    if end_year is not None:
+        df = df.filter(F.col("year") <= end_year)
+    return df
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--csv-dir", default=CSV_DIR)
+    parser.add_argument("--lake-dir", default=LAKE_DIR)
+    parser.add_argument("--stations", nargs="+")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--cores", type=int, help="local[N] cores, all by default")
+    args = parser.parse_args(argv)
+
+    spark = create_session("NCEI_Weather_Ingest", args.cores, [args.csv_dir])
+    try:
+        started = time.perf_counter()
+        ingest(
+            spark,
+            args.csv_dir,
+            args.lake_dir,
+            args.stations,
+            args.start_year,
+            args.end_year,
+            args.compression,
+        )
+        rows = read_lake(
+            spark, args.lake_dir, args.stations, args.start_year, args.end_year
+        ).count()
+        print(
+            f"[green](*)[/green] {rows} rows ingested into {args.lake_dir} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Per-station metrics of every report, computed in one pass over the rows.
+
+monthly_metrics scans the cleaned rows once and groups them by station,
+year and month. Every value a report needs comes from conditional
+aggregates of that single scan:
+- day counts and null counts per column
+- max/min with the date they occurred
+- PRCP sum and count
+- TEMP mean, median, mode and standard deviation
+- FRSHTT flag counts
+- the lowest wind chills
+
+yearly_metrics rolls the small monthly result up to station and year. It
+only uses mergeable aggregates (sums, minimum of (value, DATE) structs,
+sorted slices), so it never goes back to the rows.
+
+FRSHTT is read as the integer it is in the lake (e.g. 010000 is 10000). The
+flag of digit i is floor(FRSHTT / 10^(5 - i)) % 10, instead of casting it to
+a string and matching "%1%".
+"""
+
+from dataclasses import dataclass
+
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame
+from pyspark.sql import functions as F
+
+# FRSHTT digits, from the left
+FRSHTT_FLAGS = ["FOG", "RAIN", "SNOW", "HAIL", "THUNDER", "TORNADO"]
+# columns whose missing values are counted
+NULL_COLUMNS = ["TEMP", "WDSP", "GUST", "MAX", "MIN", "PRCP"]
+# days colder than this with more wind than WIND_CHILL_MIN_WDSP get a wind chill
+WIND_CHILL_MAX_TEMP = 50
+WIND_CHILL_MIN_WDSP = 3
+WIND_CHILL_TOP = 10
+MONTH_KEYS = ["STATION", "NAME", "year", "month"]
+YEAR_KEYS = ["STATION", "NAME", "year"]
+
+
+@dataclass
+class Metrics:
+    """The monthly and yearly metric tables the reports read."""
+
+    monthly: DataFrame
+    yearly: DataFrame
+
+    def persist(self, storage_level: StorageLevel) -> "Metrics":
+        self.monthly.persist(storage_level)
+        self.yearly.persist(storage_level)
+        return self
+
+    def unpersist(self):
+        self.yearly.unpersist()
+        self.monthly.unpersist()
+
+
+def frshtt_flag(name: str) -> Column:
+    """Whether the FRSHTT digit of flag name is 1."""
+    power = 10 ** (len(FRSHTT_FLAGS) - 1 - FRSHTT_FLAGS.index(name))
+    return F.floor(F.col("FRSHTT") / power) % 10 == 1
+
+
+def wind_chill() -> Column:
+    """Wind chill of TEMP (°F) and WDSP, null outside its valid range."""
+    # wind_chill = 35.74 + 0.6215 × T − 35.75 × V^0.16 + 0.4275 × T × V^0.16
+    # with T = TEMP and V = WDSP
+    wind = F.col("WDSP") ** 0.16
+    value = (
+        35.74 + 0.6215 * F.col("TEMP") - 35.75 * wind + 0.4275 * F.col("TEMP") * wind
+    )
+    valid = (F.col("TEMP") < WIND_CHILL_MAX_TEMP) & (
+        F.col("WDSP") > WIND_CHILL_MIN_WDSP
+    )
+    return F.when(valid, value)
+
+
+def _lowest(values: Column) -> Column:
+    """The WIND_CHILL_TOP smallest structs of an array, smallest first."""
+    return F.slice(F.array_sort(values), 1, WIND_CHILL_TOP)
+
+
+def monthly_metrics(base: DataFrame) -> DataFrame:
+    """
+    Aggregates the cleaned rows by station, year and month in one pass.
+
+    Args:
+        base (DataFrame): Cleaned rows with STATION, NAME, DATE, year,
+            month and the measure columns.
+
+    Returns:
+        DataFrame: One row per station-month, see the module docstring.
+    """
+    return base.groupBy(*MONTH_KEYS).agg(
+        F.count("*").alias("DAYS"),
+        *[F.count_if(F.col(c).isNull()).alias(f"{c}_NULLS") for c in NULL_COLUMNS],
+        # (-MAX, DATE): the smallest is the hottest day, the earliest on ties
+        F.min(
+            F.when(
+                F.col("MAX").isNotNull(),
+                F.struct((-F.col("MAX")).alias("NEG_MAX"), "DATE"),
+            )
+        ).alias("HOTTEST"),
+        F.min(F.when(F.col("MIN").isNotNull(), F.struct("MIN", "DATE"))).alias(
+            "COLDEST"
+        ),
+        F.max("MAX").alias("MAX_TEMP"),
+        F.sum("PRCP").alias("PRCP_SUM"),
+        F.count("PRCP").alias("PRCP_DAYS"),
+        F.round(F.mean("TEMP"), 2).alias("Mean_TEMP"),
+        F.round(F.percentile_approx("TEMP", 0.5), 2).alias("Median_TEMP"),
+        # the smallest of tied values, so reruns agree
+        F.mode("TEMP", deterministic=True).alias("Mode_TEMP"),
+        F.round(F.stddev("TEMP"), 2).alias("StdDev_TEMP"),
+        F.count_if(F.col("FRSHTT") > 0).alias("EXTREME_DAYS"),
+        *[F.count_if(frshtt_flag(flag)).alias(f"{flag}_DAYS") for flag in FRSHTT_FLAGS],
+        _lowest(
+            F.collect_list(
+                F.when(
+                    wind_chill().isNotNull(),
+                    F.struct(wind_chill().alias("WIND_CHILL"), "DATE", "TEMP", "WDSP"),
+                )
+            )
+        ).alias("WIND_CHILLS"),
+    )
+
+
+def yearly_metrics(monthly: DataFrame) -> DataFrame:
+    """
+    Rolls the monthly metrics up to station and year, without the rows.
+
+    Args:
+        monthly (DataFrame): The result of monthly_metrics.
+
+    Returns:
+        DataFrame: One row per station-year.
+    """
+    return monthly.groupBy(*YEAR_KEYS).agg(
+        F.sum("DAYS").alias("DAYS"),
+        *[F.sum(f"{c}_NULLS").alias(f"{c}_NULLS") for c in NULL_COLUMNS],
+        F.min("HOTTEST").alias("HOTTEST"),
+        F.min("COLDEST").alias("COLDEST"),
+        F.min(F.when(F.col("month") == 3, F.col("COLDEST"))).alias("COLDEST_MARCH"),
+        F.sum("PRCP_SUM").alias("PRCP_SUM"),
+        F.sum("PRCP_DAYS").alias("PRCP_DAYS"),
+        F.sum("EXTREME_DAYS").alias("EXTREME_DAYS"),
+        *[F.sum(f"{flag}_DAYS").alias(f"{flag}_DAYS") for flag in FRSHTT_FLAGS],
+        _lowest(F.flatten(F.collect_list("WIND_CHILLS"))).alias("WIND_CHILLS"),
+    )
+
+
+def compute_metrics(base: DataFrame, partitions: int | None = None) -> Metrics:
+    """
+    The monthly metrics of base and their yearly roll-up (lazy).
+
+    Args:
+        base (DataFrame): Cleaned rows, see monthly_metrics.
+        partitions (int): Coalesce the tables to this many partitions. Use it
+            before persisting them in sessions not made by create_session
+            (or with adaptive=False): AQE only shrinks a cached plan with
+            spark.sql.optimizer.canChangeCachedPlanOutputPartitioning on,
+            otherwise they keep spark.sql.shuffle.partitions tiny partitions.
+
+    Returns:
+        Metrics: The monthly and yearly tables.
+    """
+    monthly = monthly_metrics(base)
+    if partitions:
+        monthly = monthly.coalesce(partitions)
+    yearly = yearly_metrics(monthly)
+    if partitions:
+        yearly = yearly.coalesce(partitions)
+    return Metrics(monthly, yearly)
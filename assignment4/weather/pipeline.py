@@ -0,0 +1,384 @@
+"""
+One entry point for the weather analytics: load once, run every report.
+
+The rows of the chosen stations and years are read from the Parquet lake
+(or the CSVs), cleaned and reduced to the columns the reports use. One
+pass of conditional aggregates turns them into the monthly and yearly
+metric tables (see metrics.py). These are persisted at the chosen storage
+level. Filling them is the only scan of the source. The report jobs are
+then submitted together from a thread pool, and each selects from the
+small cached tables.
+
+With --compare, the reports are first run the way the notebook cells run
+them: each on a fresh inferSchema read of the CSVs, cleaned again, one
+after the other. The timing report lists the wall time, jobs, stages and
+tasks of every report in both runs. Stages served from the cache or from
+an earlier shuffle are skipped by Spark and not counted.
+
+Usage:
+    uv run python -m weather.pipeline --stations 72429793812 99495199999 \\
+        --start-year 2015 --end-year 2024
+    uv run python -m weather.pipeline --reports hottest_day gust_missing --compare
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, Row, SparkSession
+from pyspark.sql import functions as F
+from rich import print
+from rich.table import Table
+
+from .ingest import CSV_DIR, LAKE_DIR, clean, csv_glob, read_csv, read_lake
+from .metrics import Metrics, compute_metrics
+from .reports import REPORTS
+from .session import create_session
+
+STATIONS = ["72429793812", "99495199999"]
+START_YEAR = 2015
+END_YEAR = 2024
+# the columns the metrics read, the others are not scanned
+BASE_COLUMNS = [
+    "STATION",
+    "NAME",
+    "DATE",
+    "year",
+    "TEMP",
+    "WDSP",
+    "GUST",
+    "MAX",
+    "MIN",
+    "PRCP",
+    "FRSHTT",
+]
+STORAGE_LEVELS = [
+    "MEMORY_ONLY",
+    "MEMORY_AND_DISK",
+    "MEMORY_AND_DISK_DESER",
+    "DISK_ONLY",
+    "OFF_HEAP",
+]
+# off-heap memory reserved by main for --storage-level OFF_HEAP
+OFF_HEAP_SIZE = "512m"
+
+
+@dataclass
+class Timing:
+    """Wall time of a step and the Spark work it ran."""
+
+    name: str
+    seconds: float
+    jobs: int
+    stages: int
+    tasks: int
+
+
+def _job_stats(spark: SparkSession, group: str) -> tuple[int, int, int]:
+    """Jobs, executed stages and completed tasks of a job group."""
+    tracker = spark.sparkContext.statusTracker()
+    job_ids = tracker.getJobIdsForGroup(group)
+    stages = tasks = 0
+    for job_id in job_ids:
+        job = tracker.getJobInfo(job_id)
+        for stage_id in job.stageIds if job else []:
+            stage = tracker.getStageInfo(stage_id)
+            # skipped stages (outputs reused) have no completed task
+            if stage and stage.numCompletedTasks:
+                stages += 1
+                tasks += stage.numCompletedTasks
+    return len(job_ids), stages, tasks
+
+
+def _total(timings: list[Timing], started: float) -> Timing:
+    """Wall time since started, and the work of all timings."""
+    return Timing(
+        "total",
+        time.perf_counter() - started,
+        sum(timing.jobs for timing in timings),
+        sum(timing.stages for timing in timings),
+        sum(timing.tasks for timing in timings),
+    )
+
+
+def _timed(spark: SparkSession, prefix: str, name: str, action) -> tuple:
+    """Run action() in its own job group and return (result, Timing)."""
+    sc = spark.sparkContext
+    # unique per call, so reruns in one session are counted apart
+    group = f"{prefix}:{name}:{time.time_ns():x}"
+    # job groups are per thread, so concurrent reports do not mix
+    sc.setJobGroup(group, name)
+    try:
+        started = time.perf_counter()
+        result = action()
+        seconds = time.perf_counter() - started
+    finally:
+        sc.setLocalProperty("spark.jobGroup.id", None)
+    return result, Timing(name, seconds, *_job_stats(spark, group))
+
+
+def load_base(
+    spark: SparkSession,
+    stations: list[str] | None = None,
+    start_year: int | None = None,
+    end_year: int | None = None,
+    source: str = "lake",
+    lake_dir: str = LAKE_DIR,
+    csv_dir: str = CSV_DIR,
+) -> DataFrame:
+    """
+    Builds the cleaned rows all metrics are computed from.
+
+    Args:
+        spark (SparkSession): The session to read with.
+        stations (list): Station codes to keep, all when None.
+        start_year (int): The first year to keep, or None.
+        end_year (int): The last year to keep (inclusive), or None.
+        source (str): "lake" (weather.ingest output) or "csv" (downloads).
+        lake_dir (str): The Parquet lake.
+        csv_dir (str): The download folder.
+
+    Returns:
+        DataFrame: BASE_COLUMNS plus month.
+    """
+    if source == "lake":
+        df = read_lake(spark, lake_dir, stations, start_year, end_year)
+    else:
+        df = clean(read_csv(spark, csv_glob(csv_dir, stations, start_year, end_year)))
+    return df.select(*BASE_COLUMNS).withColumn("month", F.month("DATE"))
+
+
+def _materialize(metrics: Metrics) -> Metrics:
+    metrics.monthly.count()
+    metrics.yearly.count()
+    return metrics
+
+
+def _collect(name: str, metrics: Metrics) -> list[Row]:
+    return REPORTS[name](metrics).collect()
+
+
+def run(
+    spark: SparkSession,
+    stations: list[str] | None = STATIONS,
+    start_year: int | None = START_YEAR,
+    end_year: int | None = END_YEAR,
+    reports: list[str] | None = None,
+    source: str = "lake",
+    lake_dir: str = LAKE_DIR,
+    csv_dir: str = CSV_DIR,
+    storage_level: str = "MEMORY_AND_DISK",
+    workers: int | None = None,
+) -> tuple[dict[str, list[Row]], list[Timing]]:
+    """
+    Scans the data once into the metric tables, persists them, then runs
+    the reports concurrently over them.
+
+    Args:
+        spark (SparkSession): The session to run on.
+        stations (list): Station codes, all stations of the source if None.
+        start_year (int): The first year, or None.
+        end_year (int): The last year (inclusive), or None.
+        reports (list): Names from reports.REPORTS, all when None.
+        source (str): "lake" or "csv", see load_base.
+        lake_dir (str): The Parquet lake.
+        csv_dir (str): The download folder.
+        storage_level (str): A pyspark StorageLevel name for the metrics.
+            OFF_HEAP needs a session with off-heap memory, see
+            create_session(off_heap_size=...).
+        workers (int): Reports submitted at once, all of them if None.
+
+    Returns:
+        tuple: (rows per report name, timings of the load, each report
+            and the whole run)
+    """
+    # without off-heap memory Spark quietly writes every OFF_HEAP block to
+    # disk instead, so the run would measure DISK_ONLY
+    off_heap = spark.conf.get("spark.memory.offHeap.enabled", "false")
+    if storage_level == "OFF_HEAP" and off_heap != "true":
+        raise ValueError("OFF_HEAP needs spark.memory.offHeap.enabled and .size")
+    started = time.perf_counter()
+    names = list(reports or REPORTS)
+    base = load_base(spark, stations, start_year, end_year, source, lake_dir, csv_dir)
+    metrics = compute_metrics(base, spark.sparkContext.defaultParallelism)
+    metrics.persist(getattr(StorageLevel, storage_level))
+    try:
+        # one scan of the source fills the cache
+        _, load = _timed(spark, "pipeline", "load", partial(_materialize, metrics))
+        with ThreadPoolExecutor(max_workers=workers or len(names)) as executor:
+            futures = {
+                name: executor.submit(
+                    _timed,
+                    spark,
+                    "pipeline",
+                    name,
+                    partial(_collect, name, metrics),
+                )
+                for name in names
+            }
+            done = {name: future.result() for name, future in futures.items()}
+    finally:
+        metrics.unpersist()
+    results = {name: rows for name, (rows, _) in done.items()}
+    timings = [load] + [timing for _, timing in done.values()]
+    return results, timings + [_total(timings, started)]
+
+
+def run_cells(
+    spark: SparkSession,
+    stations: list[str] | None = STATIONS,
+    start_year: int | None = START_YEAR,
+    end_year: int | None = END_YEAR,
+    reports: list[str] | None = None,
+    csv_dir: str = CSV_DIR,
+) -> tuple[dict[str, list[Row]], list[Timing]]:
+    """
+    Runs the reports one by one as the notebook cells do, each on its own
+    inferSchema read of the CSVs and cleanup, with nothing cached. Each
+    report computes its metrics from its own scan.
+    Same arguments and result as run.
+    """
+    paths = csv_glob(csv_dir, stations, start_year, end_year)
+
+    def cell(name: str) -> list[Row]:
+        raw = spark.read.option("basePath", csv_dir).csv(
+            paths, header=True, inferSchema=True
+        )
+        base = clean(raw).withColumn("month", F.month("DATE"))
+        return _collect(name, compute_metrics(base))
+
+    started = time.perf_counter()
+    results, timings = {}, []
+    for name in reports or REPORTS:
+        rows, timing = _timed(spark, "cells", name, partial(cell, name))
+        results[name] = rows
+        timings.append(timing)
+    return results, timings + [_total(timings, started)]
+
+
+def print_timings(timings: list[Timing], baseline: list[Timing] | None = None):
+    """Print the timing report, next to the notebook-style run if given."""
+    runs = ([("cells", baseline)] if baseline else []) + [("pipeline", timings)]
+    table = Table(title="timings")
+    table.add_column("step", no_wrap=True)
+    for label, _ in runs:
+        table.add_column(f"{label} s", justify="right")
+        for column in ("jobs", "stages", "tasks"):
+            table.add_column(column, justify="right")
+    steps = [{timing.name: timing for timing in run} for _, run in runs]
+    # load (pipeline only), then the reports, then the totals
+    names = dict.fromkeys(
+        t.name for t in timings + (baseline or []) if t.name != "total"
+    )
+    for name in list(names) + ["total"]:
+        row = [name]
+        for by_name in steps:
+            timing = by_name.get(name)
+            row += (
+                [f"{timing.seconds:.2f}", str(timing.jobs), str(timing.stages)]
+                + [str(timing.tasks)]
+                if timing
+                else [""] * 4
+            )
+        table.add_row(*row)
+    print(table)
+
+
+def print_results(results: dict[str, list[Row]], limit: int = 20):
+    """Print up to limit rows of every report."""
+    for name, rows in results.items():
+        table = Table(title=f"{name} ({len(rows)} rows)")
+        for column in rows[0].__fields__ if rows else []:
+            table.add_column(column)
+        for row in rows[:limit]:
+            table.add_row(*[str(value) for value in row])
+        print(table)
+
+
+def differing_reports(
+    expected: dict[str, list[Row]], actual: dict[str, list[Row]]
+) -> list[str]:
+    """The reports whose rows are not the same in both runs."""
+    return [name for name, rows in expected.items() if actual.get(name) != rows]
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--stations", nargs="+", default=STATIONS)
+    parser.add_argument("--start-year", type=int, default=START_YEAR)
+    parser.add_argument("--end-year", type=int, default=END_YEAR)
+    parser.add_argument("--reports", nargs="+", choices=list(REPORTS))
+    parser.add_argument("--source", choices=["lake", "csv"], default="lake")
+    parser.add_argument("--lake-dir", default=LAKE_DIR)
+    parser.add_argument("--csv-dir", default=CSV_DIR)
+    parser.add_argument(
+        "--storage-level", choices=STORAGE_LEVELS, default="MEMORY_AND_DISK"
+    )
+    parser.add_argument(
+        "--off-heap-size",
+        default=OFF_HEAP_SIZE,
+        help="off-heap memory of --storage-level OFF_HEAP",
+    )
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--cores", type=int, help="local[N] cores, all by default")
+    parser.add_argument("--show", type=int, default=20, help="rows per report")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="first run the reports one by one, as the notebook cells do",
+    )
+    args = parser.parse_args(argv)
+
+    source_dir = args.lake_dir if args.source == "lake" else args.csv_dir
+    spark = create_session(
+        cores=args.cores,
+        input_paths=[source_dir],
+        off_heap_size=(
+            args.off_heap_size if args.storage_level == "OFF_HEAP" else None
+        ),
+    )
+    try:
+        cell_results, baseline = None, None
+        if args.compare:
+            cell_results, baseline = run_cells(
+                spark,
+                args.stations,
+                args.start_year,
+                args.end_year,
+                args.reports,
+                args.csv_dir,
+            )
+        results, timings = run(
+            spark,
+            args.stations,
+            args.start_year,
+            args.end_year,
+            args.reports,
+            args.source,
+            args.lake_dir,
+            args.csv_dir,
+            args.storage_level,
+            args.workers,
+        )
+        print_results(results, args.show)
+        print_timings(timings, baseline)
+        if cell_results is not None:
+            differing = differing_reports(cell_results, results)
+            for name in differing:
+                print(f"[red](!)[/red] {name} differs from the notebook cells")
+            if not differing:
+                print("[green](*)[/green] every report matches the notebook cells")
+            return 1 if differing else 0
+        return 0
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
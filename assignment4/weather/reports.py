@@ -0,0 +1,124 @@
+"""
+The notebook analyses, as functions of the shared metric tables.
+
+Every report takes the Metrics of the cleaned rows (see
+metrics.compute_metrics) and returns a DataFrame. No report reads the
+rows again: they select from the small monthly and yearly results. Reports
+cover all stations and years of the metrics. The notebook's single answers
+(e.g. Cincinnati 2020, Florida 2024) are rows of these results.
+"""
+
+from pyspark.sql import DataFrame, Window
+from pyspark.sql import functions as F
+
+from .metrics import FRSHTT_FLAGS, Metrics
+
+
+def hottest_day(metrics: Metrics) -> DataFrame:
+    """The hottest day (MAX) of each year, the earliest one on ties."""
+    by_year = Window.partitionBy("year").orderBy("HOTTEST", "STATION")
+    return (
+        metrics.yearly.filter(F.col("HOTTEST").isNotNull())
+        .withColumn("row_num", F.row_number().over(by_year))
+        .filter(F.col("row_num") == 1)
+        .select(
+            "STATION",
+            "NAME",
+            F.col("HOTTEST.DATE").alias("DATE"),
+            (-F.col("HOTTEST.NEG_MAX")).alias("MAX"),
+        )
+        .orderBy("DATE")
+    )
+
+
+def coldest_march_day(metrics: Metrics) -> DataFrame:
+    """The coldest day (MIN) of March across all years."""
+    return (
+        metrics.yearly.filter(F.col("COLDEST_MARCH").isNotNull())
+        .orderBy("COLDEST_MARCH", "STATION")
+        .select(
+            "STATION",
+            "NAME",
+            F.col("COLDEST_MARCH.DATE").alias("DATE"),
+            F.col("COLDEST_MARCH.MIN").alias("MIN"),
+        )
+        .limit(1)
+    )
+
+
+def wettest_year(metrics: Metrics) -> DataFrame:
+    """The year with the highest mean PRCP, per station."""
+    by_station = Window.partitionBy("STATION").orderBy(
+        F.col("PRCP_MEAN").desc(), "year"
+    )
+    return (
+        metrics.yearly.filter(F.col("PRCP_DAYS") > 0)
+        .withColumn("PRCP_MEAN", F.col("PRCP_SUM") / F.col("PRCP_DAYS"))
+        .withColumn("row_num", F.row_number().over(by_station))
+        .filter(F.col("row_num") == 1)
+        .select("STATION", "NAME", "year", F.round("PRCP_MEAN", 2).alias("MEAN_PRCP"))
+        .orderBy("STATION")
+    )
+
+
+def gust_missing(metrics: Metrics) -> DataFrame:
+    """Percentage of days without a GUST value, per station and year."""
+    return metrics.yearly.select(
+        "STATION",
+        "NAME",
+        "year",
+        F.round(F.col("GUST_NULLS") / F.col("DAYS") * 100, 2).alias("MISSING_GUST_PCT"),
+    ).orderBy("STATION", "year")
+
+
+def monthly_temp(metrics: Metrics) -> DataFrame:
+    """Mean, median, mode and standard deviation of TEMP per month."""
+    return metrics.monthly.select(
+        "STATION",
+        "year",
+        "month",
+        "Mean_TEMP",
+        "Median_TEMP",
+        "Mode_TEMP",
+        "StdDev_TEMP",
+    ).orderBy("STATION", "year", "month")
+
+
+def wind_chill(metrics: Metrics) -> DataFrame:
+    """The days with the lowest wind chill, per station and year."""
+    return (
+        metrics.yearly.select("STATION", "NAME", F.explode("WIND_CHILLS").alias("wc"))
+        .select("STATION", "NAME", "wc.DATE", "wc.TEMP", "wc.WDSP", "wc.WIND_CHILL")
+        .orderBy("STATION", "DATE")
+    )
+
+
+def extreme_days(metrics: Metrics) -> DataFrame:
+    """Days with any FRSHTT indicator set, and per indicator, per station."""
+    return (
+        metrics.yearly.groupBy("STATION", "NAME")
+        .agg(
+            F.sum("EXTREME_DAYS").alias("Extreme_Weather_Days"),
+            *[F.sum(f"{flag}_DAYS").alias(f"{flag}_DAYS") for flag in FRSHTT_FLAGS],
+        )
+        .orderBy("STATION")
+    )
+
+
+def monthly_max(metrics: Metrics) -> DataFrame:
+    """The highest MAX of each month, the data of the monthly max plot."""
+    return metrics.monthly.select("STATION", "year", "month", "MAX_TEMP").orderBy(
+        "STATION", "year", "month"
+    )
+
+
+REPORTS = {
+    "hottest_day": hottest_day,
+    "coldest_march_day": coldest_march_day,
+    "wettest_year": wettest_year,
+    "gust_missing": gust_missing,
+    "monthly_temp": monthly_temp,
+    "wind_chill": wind_chill,
+    "extreme_days": extreme_days,
+    "monthly_max": monthly_max,
+}
@@ -0,0 +1,100 @@
+"""
+SparkSession factory with a local multi-core execution profile.
+
+`.master("local")` runs every task on a single core, and the default 200
+shuffle partitions turn a few thousand rows per station into 200 tiny
+tasks per shuffle. create_session instead:
+- runs local[N], N being the cores to use (all of them by default)
+- sizes spark.sql.shuffle.partitions to the input, at least N
+- enables adaptive query execution with partition coalescing and
+  skew-join splitting, also on cached plans
+- uses Arrow to move data to pandas (toPandas), falling back to the
+  row-by-row path when pyarrow is missing
+- reserves off-heap memory when asked, which StorageLevel.OFF_HEAP needs
+"""
+
+import math
+import os
+
+from pyspark.sql import SparkSession
+
+APP_NAME = "NCEI_Weather_Analysis"
+# input bytes per shuffle partition when sizing spark.sql.shuffle.partitions
+PARTITION_BYTES = 64 * 1024 * 1024
+# the size AQE coalesces small shuffle partitions up to
+ADVISORY_PARTITION_BYTES = "16m"
+
+
+def input_bytes(*paths: str) -> int:
+    """Total size of the files under paths (files or folders)."""
+    total = 0
+    for path in paths:
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+        for root, _, files in os.walk(path):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def shuffle_partitions(size: int, cores: int) -> int:
+    """One partition per PARTITION_BYTES of input, a multiple of cores."""
+    waves = max(1, math.ceil(size / PARTITION_BYTES / cores))
+    return waves * cores
+
+
+def create_session(
+    app_name: str = APP_NAME,
+    cores: int | None = None,
+    input_paths: list[str] | None = None,
+    partitions: int | None = None,
+    adaptive: bool = True,
+    arrow: bool = True,
+    off_heap_size: str | None = None,
+    conf: dict | None = None,
+) -> SparkSession:
+    """
+    Creates (or returns the running) SparkSession with the local profile.
+
+    Args:
+        app_name (str): The Spark application name.
+        cores (int): Cores of local[N], all of them when None.
+        input_paths (list): Files or folders the session will read, used
+            to size the shuffle partitions.
+        partitions (int): spark.sql.shuffle.partitions, instead of sizing
+            it from input_paths.
+        adaptive (bool): Enable adaptive query execution.
+        arrow (bool): Use Arrow for toPandas and createDataFrame(pandas).
+        off_heap_size (str): Off-heap memory for persisting with
+            StorageLevel.OFF_HEAP (e.g. "512m"), disabled when None.
+        conf (dict): More Spark settings, applied last.
+
+    Returns:
+        SparkSession: The session, log level set to ERROR.
+    """
+    cores = cores or os.cpu_count() or 1
+    if partitions is None:
+        partitions = shuffle_partitions(input_bytes(*(input_paths or [])), cores)
+    settings = {
+        "spark.sql.shuffle.partitions": partitions,
+        "spark.sql.adaptive.enabled": adaptive,
+        "spark.sql.adaptive.coalescePartitions.enabled": adaptive,
+        "spark.sql.adaptive.advisoryPartitionSizeInBytes": ADVISORY_PARTITION_BYTES,
+        "spark.sql.adaptive.skewJoin.enabled": adaptive,
+        # let AQE coalesce the output of persisted DataFrames as well
+        "spark.sql.optimizer.canChangeCachedPlanOutputPartitioning": adaptive,
+        "spark.sql.execution.arrow.pyspark.enabled": arrow,
+        "spark.sql.execution.arrow.pyspark.fallback.enabled": True,
+    }
+    if off_heap_size:
+        settings["spark.memory.offHeap.enabled"] = True
+        settings["spark.memory.offHeap.size"] = off_heap_size
+    settings.update(conf or {})
+    builder = SparkSession.builder.appName(app_name).master(f"local[{cores}]")
+    for key, value in settings.items():
+        # Spark reads "true" / "false", not Python's True / False
+        builder = builder.config(
+            key, str(value).lower() if isinstance(value, bool) else value
+        )
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    return spark